@@ -1,113 +1,151 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import numpy as np
 import pandas as pd
-import json
 from pathlib import Path
 
+from elections.crosswalk import load_crosswalk
+from elections.export import export_records
+from elections.schema import PARTY_DTYPE, STATE_DTYPE, apply_schema, export_frame, to_key
+from elections.sql import BACKEND, connect, county_votes
+
 """
 US presidential election results by county: 2016-2020
 # Harvard/MIT: https://dataverse.harvard.edu/dataset.xhtml?persistentId=doi:10.7910/DVN/VOQCHQ
 This script reads and processes county-level results collected by [MIT's election lab](https://electionlab.mit.edu/data)
 """
 
-# Read raw data
-counties_src = (
-    pd.read_csv(
-        "data/raw/countypres_2000-2020.csv",
-        dtype={"county_fips": str, "year": str, "version": str},
+RAW_RESULTS = "data/raw/countypres_2000-2020.csv"
+
+if BACKEND == "duckdb":
+    # Filter, aggregate and pivot in one query over the raw file
+    with connect() as con:
+        counties_df = county_votes(con, RAW_RESULTS)
+else:
+    # Read raw data
+    counties_src = (
+        pd.read_csv(
+            RAW_RESULTS,
+            dtype={"county_fips": str, "year": str, "version": str},
+        )
+        # just major parties
+        .query('party.str.contains("DEMOCRAT|REPUBLICAN") and totalvotes>0')
+        # only county-level geographies (not federal precincts, overseas votes, etc.)
+        .dropna(subset="county_fips")
     )
-    # just major parties
-    .query('party.str.contains("DEMOCRAT|REPUBLICAN") and totalvotes>0')
-    # only county-level geographies (not federal precincts, overseas votes, etc.)
-    .dropna(subset="county_fips")
-)
 
-# Clean up candidate names
-counties_src["candidate"] = (
-    counties_src["candidate"]
-    .str.replace("JOSEPH R BIDEN JR", "JOE BIDEN")
-    .str.replace("J TRUMP", "TRUMP")
-)
+    # Typed keys and labels from here on; zero-padded strings only come back at export
+    counties_src["county_fips"] = to_key(counties_src["county_fips"])
+    counties_src["year"] = to_key(counties_src["year"])
+    counties_src["state_po"] = counties_src["state_po"].astype(STATE_DTYPE)
+    counties_src["party"] = counties_src["party"].astype(PARTY_DTYPE)
+
+    # Clean up candidate names
+    counties_src["candidate"] = (
+        counties_src["candidate"]
+        .str.replace("JOSEPH R BIDEN JR", "JOE BIDEN")
+        .str.replace("J TRUMP", "TRUMP")
+    )
 
-# Aggregate to deal with states lacking "total" category (early, provisional, election day, etc.)
-counties_agg_df = (
-    counties_src.groupby(
-        [
-            "year",
-            "state",
-            "state_po",
-            "county_name",
-            "county_fips",
-            "candidate",
-            "party",
-        ]
+    # Aggregate to deal with states lacking "total" category (early, provisional, election day, etc.)
+    counties_agg_df = (
+        counties_src.groupby(
+            [
+                "year",
+                "state",
+                "state_po",
+                "county_name",
+                "county_fips",
+                "candidate",
+                "party",
+            ],
+            observed=True,
+        )
+        .agg({"candidatevotes": "sum", "totalvotes": "mean"})
+        .reset_index()
     )
-    .agg({"candidatevotes": "sum", "totalvotes": "mean"})
-    .reset_index()
-)
 
-# Make sure the fips is a five-digit string
-counties_agg_df["county_fips"] = counties_agg_df["county_fips"].str.zfill(5)
-
-
-# Wide format
-counties_pivot = counties_agg_df.pivot(
-    columns=["party"],
-    values=["candidatevotes", "totalvotes"],
-    index=["county_fips", "county_name", "state_po", "year"],
-).reset_index().rename(columns={'county_fips':'fips'})
-
-
-# Cleaning up multi-index df
-counties_pivot.columns = [
-    "_".join(filter(None, col))
-    .strip()
-    .lower()
-    .replace("candidate", "")
-    .replace("totalvotes_democrat", "votes_all")
-    .replace("ocrat", "")
-    .replace("ublican", "")
-    for col in counties_pivot.columns
-]
-
-counties_df = counties_pivot.drop(["totalvotes_rep"], axis=1).copy()
-
-# Calculate share
-counties_df["dem_pct"] = round((counties_df["votes_dem"] / counties_df["votes_all"])*100,2)
-counties_df["rep_pct"] = round((counties_df["votes_rep"] / counties_df["votes_all"])*100,2)
-
-# Margin
-counties_df["margin"] = counties_df["rep_pct"] - counties_df["dem_pct"]
-
-# Function to name winner
-def calculate_winner(row):
-    if row["dem_pct"] > row["rep_pct"]:
-        return "dem"
-    elif row["dem_pct"] < row["rep_pct"]:
-        return "rep"
-    else:
-        return "tie"
-    
-    
-# Apply 'winner' function
-counties_df["winner"] = counties_df.apply(calculate_winner, axis=1)
-
-
-# Separate the data for 2016 and 2020
-df_2016 = counties_df[counties_df["year"] == "2016"].set_index(
-    ["fips", "county_name", "state_po"]
-)
-df_2020 = counties_df[counties_df["year"] == "2020"].set_index(
-    ["fips", "county_name", "state_po"]
+
+    # Wide format
+    counties_pivot = counties_agg_df.pivot(
+        columns=["party"],
+        values=["candidatevotes", "totalvotes"],
+        index=["county_fips", "county_name", "state_po", "year"],
+    ).reset_index().rename(columns={'county_fips':'fips'})
+
+
+    # Cleaning up multi-index df
+    counties_pivot.columns = [
+        "_".join(filter(None, col))
+        .strip()
+        .lower()
+        .replace("candidate", "")
+        .replace("totalvotes_democrat", "votes_all")
+        .replace("ocrat", "")
+        .replace("ublican", "")
+        for col in counties_pivot.columns
+    ]
+
+    counties_df = counties_pivot.drop(["totalvotes_rep"], axis=1).copy()
+
+def add_shares(df):
+    # Calculate share
+    df["dem_pct"] = round((df["votes_dem"] / df["votes_all"])*100,2)
+    df["rep_pct"] = round((df["votes_rep"] / df["votes_all"])*100,2)
+
+    # Margin
+    df["margin"] = df["rep_pct"] - df["dem_pct"]
+
+    # Name the winner
+    df["winner"] = np.select(
+        [df["dem_pct"] > df["rep_pct"], df["dem_pct"] < df["rep_pct"]],
+        ["dem", "rep"],
+        "tie",
+    )
+    return apply_schema(df)
+
+
+def current_codes(df):
+    """
+    Rows still coded with a county's code from before it was renamed or merged moved to the code in use
+    that year, so every year joins its census; merged pieces reported separately are summed.
+    """
+    df = df.copy()
+    recoded = load_crosswalk().recode(df["fips"], df["year"])
+    kept = recoded == df["fips"].to_numpy()
+    df["fips"] = recoded
+    pieces = df.duplicated(["year", "fips"], keep=False)
+    if not pieces.any():
+        return df
+    # The county that kept its code names the merged row
+    merged = (
+        df[pieces]
+        .iloc[np.argsort(~kept[pieces], kind="stable")]
+        .groupby(["year", "fips"], as_index=False, observed=True)
+        .agg({"county_name": "first", "state_po": "first", "votes_dem": "sum", "votes_rep": "sum", "votes_all": "sum"})
+    )
+    return pd.concat([df[~pieces], add_shares(merged)], ignore_index=True)[df.columns]
+
+
+counties_df = current_codes(add_shares(counties_df))
+
+
+# Separate the data for 2016 and 2020, carrying 2016's votes into 2020's county codes
+# so renamed, merged and split counties still line up
+df_2016 = add_shares(
+    load_crosswalk().project_frame(
+        counties_df[counties_df["year"] == 2016], ["votes_dem", "votes_rep", "votes_all"], 2016, 2020
+    )
 )
+df_2020 = counties_df[counties_df["year"] == 2020]
 
 # Merge the two years on fips
-change_df = df_2016[["dem_pct", "rep_pct", 'margin', 'winner']].merge(
-    df_2020[["dem_pct", "rep_pct", 'margin', 'winner']],
-    left_index=True,
-    right_index=True,
-    suffixes=("_2016", "_2020"),
+shares = ["fips", "dem_pct", "rep_pct", 'margin', 'winner']
+change_df = (
+    df_2020[["fips", "county_name", "state_po"]]
+    .merge(df_2016[shares], on="fips")
+    .merge(df_2020[shares], on="fips", suffixes=("_2016", "_2020"))
 )
 
 
@@ -116,32 +154,25 @@ change_df["dem_pct_diff"] = change_df["dem_pct_2020"] - change_df["dem_pct_2016"
 change_df["rep_pct_diff"] = change_df["rep_pct_2020"] - change_df["rep_pct_2016"]
 change_df["margin_diff"] = change_df["margin_2020"] - change_df["margin_2016"]
 
-# Function to name winner
-def determine_flip(row):
-    if row["winner_2016"] == row["winner_2020"]:
-        return False
-    else:
-        return True
-
-# Apply 'winner' function
-change_df["flipped"] = change_df.apply(determine_flip, axis=1)
-
-# Reset index to have fips as a column again
-change_df = change_df.reset_index()
+# Flag counties whose winner changed
+change_df["flipped"] = change_df["winner_2016"] != change_df["winner_2020"]
 
 # Load 2024 county results scraped from Dave Leip and normalize to this schema
 results_2024_path = Path("data/processed/presidential_county_results_2024.json")
 if results_2024_path.exists():
     results_2024 = pd.read_json(results_2024_path)
-    # Normalize fields: pad FIPS, convert proportions to percentages (0-100), compute margin
-    results_2024["fips"] = results_2024["fips"].astype(str).str.zfill(5)
+    # Normalize fields: convert proportions to percentages (0-100), compute margin
     results_2024["county_name"] = results_2024["county_name"].astype(str)
-    results_2024["state_po"] = results_2024["state_po"].astype(str)
-    results_2024["year"] = results_2024["year"].astype(str)
     # dem_pct/rep_pct in scraper are 0-1; convert to 0-100
     results_2024["dem_pct"] = (results_2024["dem_pct"].astype(float) * 100).round(2)
     results_2024["rep_pct"] = (results_2024["rep_pct"].astype(float) * 100).round(2)
     results_2024["margin"] = (results_2024["rep_pct"] - results_2024["dem_pct"]).round(2)
+    # Winner from the shares, as add_shares names it for the other years; the scrape calls ties for a party
+    results_2024["winner"] = np.select(
+        [results_2024["dem_pct"] > results_2024["rep_pct"], results_2024["dem_pct"] < results_2024["rep_pct"]],
+        ["dem", "rep"],
+        "tie",
+    )
 
     # Ensure column order compatibility
     results_2024 = results_2024[
@@ -160,25 +191,21 @@ if results_2024_path.exists():
         ]
     ]
 
-    all_counties_df = pd.concat([counties_df, results_2024], ignore_index=True)
+    all_counties_df = pd.concat([counties_df, current_codes(apply_schema(results_2024))], ignore_index=True)
 else:
     all_counties_df = counties_df.copy()
 
 # Exports
 # Change from 2016 to 2020
-change_df.round(2).to_json(
-    "data/processed/presidential_county_change_2016_2020.json", indent=4, orient="records"
-)
+export_records(export_frame(change_df).round(2), "data/processed/presidential_county_change_2016_2020.json")
 # Results and share by county and candidate - all elections (2000-2024 when available)
-all_counties_df.round(2).to_json(
-    "data/processed/presidential_county_results.json", indent=4, orient="records"
-)
+export_records(export_frame(all_counties_df).round(2), "data/processed/presidential_county_results.json")
 
 # If 2024 is included, also aggregate county results to state totals for 2024
-if (all_counties_df["year"] == "2024").any():
-    df2024 = all_counties_df[all_counties_df["year"] == "2024"].copy()
+if (all_counties_df["year"] == 2024).any():
+    df2024 = all_counties_df[all_counties_df["year"] == 2024].copy()
     state_agg = (
-        df2024.groupby(["state_po", "year"], as_index=False)
+        df2024.groupby(["state_po", "year"], as_index=False, observed=True)
         .agg({
             "votes_dem": "sum",
             "votes_rep": "sum",
@@ -187,7 +214,11 @@ if (all_counties_df["year"] == "2024").any():
     )
     state_agg["dem_pct"] = (state_agg["votes_dem"] / state_agg["votes_all"] * 100).round(2)
     state_agg["rep_pct"] = (state_agg["votes_rep"] / state_agg["votes_all"] * 100).round(2)
-    state_agg["winner"] = state_agg.apply(lambda r: "dem" if r["dem_pct"] > r["rep_pct"] else ("rep" if r["rep_pct"] > r["dem_pct"] else "tie"), axis=1)
+    state_agg["winner"] = np.select(
+        [state_agg["dem_pct"] > state_agg["rep_pct"], state_agg["dem_pct"] < state_agg["rep_pct"]],
+        ["dem", "rep"],
+        "tie",
+    )
 
     # Align columns roughly with existing state schema keys
     state_records = []
@@ -204,10 +235,8 @@ if (all_counties_df["year"] == "2024").any():
             "rep_pct": float(r["rep_pct"]),
             "ind_pct": 0.0,
             "other_pct": 0.0,
-            "state": r["state_po"],
-            "state_name": r["state_po"],
+            "state": str(r["state_po"]),
+            "state_name": str(r["state_po"]),
         })
 
-    pd.DataFrame(state_records).to_json(
-        "data/processed/presidential_election_results_by_state_2024.json", indent=4, orient="records"
-    )
\ No newline at end of file
+    export_records(pd.DataFrame(state_records), "data/processed/presidential_election_results_by_state_2024.json")
\ No newline at end of file
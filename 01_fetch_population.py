@@ -2,6 +2,8 @@ import os
 import requests
 import pandas as pd
 
+from elections.export import export_records
+
 # Retrieve API key from environment variable
 api_key = os.getenv("CENSUS_API_KEY")
 
@@ -60,8 +62,8 @@ population_data_2010 = fetch_census_data("2010", endpoints["2010"], api_key)
 population_data_2020 = fetch_census_data("2020", endpoints["2020"], api_key)
 
 # Save the population data for each decennial year to JSON files
-population_data_2000.round(2).to_json("data/processed/county_population_census_2000.json", orient="records", indent=4)
-population_data_2010.round(2).to_json("data/processed/county_population_census_2010.json", orient="records", indent=4)
-population_data_2020.round(2).to_json("data/processed/county_population_census_2020.json", orient="records", indent=4)
+export_records(population_data_2000.round(2), "data/processed/county_population_census_2000.json")
+export_records(population_data_2010.round(2), "data/processed/county_population_census_2010.json")
+export_records(population_data_2020.round(2), "data/processed/county_population_census_2020.json")
 
 print("Population data including White alone percentage saved to JSON files.")
\ No newline at end of file
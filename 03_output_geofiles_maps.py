@@ -1,19 +1,19 @@
-import us
-import numpy as np
-import pandas as pd
 import geopandas as gpd
 import matplotlib.pyplot as plt
+import numpy as np
 from matplotlib.colors import ListedColormap, BoundaryNorm
-import matplotlib.font_manager as fm
+
+from elections.classify import classify, winner_share_breaks
+from elections.data import load_county_results
+from elections.geowrite import BackgroundWriter, write_geojson
+from elections.render_cache import RenderCache
+from elections.schema import export_frame, to_key
 
 # Set Roboto as the default font
 plt.rcParams["font.family"] = "Roboto"
 
-# Read counties and party change dataframe
-county_results_src = pd.read_json('data/processed/presidential_county_results_with_population.json', dtype={'fips': str})
-
-# Filter for CONUS
-county_results_df = county_results_src.query('~state_po.isin(["HI","AK"])').copy()
+# Read county results for CONUS
+county_results_df = load_county_results(conus=True)
 
 # Load county geojson with limited columns and lower case
 counties_src = gpd.read_file(
@@ -24,6 +24,7 @@ counties_src.columns = counties_src.columns.str.lower()
 
 cols_keep = ['fips', 'name', 'st_abbrev', 'geometry']
 counties_gdf = counties_src[cols_keep].copy()
+counties_gdf['fips'] = to_key(counties_gdf['fips'])
 
 # Reproject to Albers Equal Area for consistency (CONUS Albers: EPSG:5070)
 albers_epsg = "EPSG:5070"
@@ -38,6 +39,10 @@ states = gpd.read_file("https://stilesdata.com/gis/usa_states_esri_simple.json")
 # Note: dem_pct/rep_pct are stored as 0–100 percentages in the data
 common_breaks = [50, 55, 60, 65, 70, 80, 100]
 
+# Set to "jenks", "fisher" or "quantile" to derive the breaks from every year's winning shares instead,
+# one legend for all years (see elections/classify.py; breaks are cached by the data they came from)
+breaks_method = None
+
 # Slightly lighter ramps to avoid overly dark maps
 rep_ramp = [
     "#ffe5de",  # <=50%
@@ -58,102 +63,115 @@ dem_ramp = [
     "#0a3f6d"   # 80%+
 ]
 
+if breaks_method:
+    common_breaks = winner_share_breaks(county_results_df, breaks_method, k=len(rep_ramp))
+
 # Create custom colormaps
 blues_cmap = ListedColormap(dem_ramp)
 reds_cmap = ListedColormap(rep_ramp)
 
 years = sorted(county_results_df.year.unique())
 
-# Loop through each year to generate and save maps
-for year in years:
-    df = county_results_df.query(f'year == {year}')
-
-    # Merge with geography
-    gdf = counties_gdf.merge(df, on='fips')
-
-    # Initialize plot
-    fig, ax = plt.subplots(1, 1, figsize=(12, 8))
-
-    # Plot Democratic wins
-    gdf_dem = gdf.query('winner == "dem"')
-    gdf_dem.plot(
-        ax=ax,
-        column="dem_pct",
-        cmap=blues_cmap,
-        linewidth=0.1,
-        edgecolor='white',
-        scheme="User_Defined",
-        classification_kwds=dict(bins=common_breaks),
-        legend=False
-    )
-
-    # Plot Republican wins
-    gdf_rep = gdf.query('winner == "rep"')
-    gdf_rep.plot(
-        ax=ax,
-        column="rep_pct",
-        cmap=reds_cmap,
-        linewidth=0.1,
-        edgecolor='white',
-        scheme="User_Defined",
-        classification_kwds=dict(bins=common_breaks),
-        legend=False
-    )
-
-    # Plot state boundaries
-    states.boundary.plot(ax=ax, linewidth=0.5, color="white")
-
-    # Customize axes
-    ax.axis("off")
-    # Figure-level title (left-aligned) and small source line bottom-left
-    fig.suptitle(
-        f'US presidential election results, by county, in {year}',
-        x=0.01, y=0.97, ha='left', va='top', fontsize=15, fontweight='bold'
-    )
-    fig.text(0.01, 0.02, 'Map: Matt Stiles | Data sources: MIT Election Lab / Dave Leip',
-             ha='left', va='bottom', fontsize=9, color='#666666')
-    # Tighten left/right margins; add a bit more space below colorbars
-    fig.subplots_adjust(top=0.88, bottom=0.08, left=0.01, right=0.99)
-
-    # Place colorbars at the top, under the title
-    cbar_width = 0.20
-    cbar_y = 0.92
-    cbar_ax = fig.add_axes([0.25, cbar_y, cbar_width, 0.015])  # Republican colorbar position
-    cbar_ax2 = fig.add_axes([0.60, cbar_y, cbar_width, 0.015])  # Democratic colorbar position
-
-    tickBreaks=[50, 55, 60, 65, 70, 80]
-    tickLabels=['50%', '55%', '60%', '65%', '70%', '80%+']
-
-    # Republican colorbar
-    cbar = fig.colorbar(
-        plt.cm.ScalarMappable(cmap=reds_cmap, norm=BoundaryNorm(common_breaks, reds_cmap.N)),
-        cax=cbar_ax, orientation='horizontal', ticks=tickBreaks
-    )
-    cbar.set_label('Republican %', fontsize=10)
-    cbar.ax.set_xticklabels(tickLabels, fontsize=8)
-    # Remove colorbar outline and spines
-    cbar.outline.set_visible(False)
-    for spine in cbar_ax.spines.values():
-        spine.set_visible(False)
-
-    # Democratic colorbar
-    cbar2 = fig.colorbar(
-        plt.cm.ScalarMappable(cmap=blues_cmap, norm=BoundaryNorm(common_breaks, blues_cmap.N)),
-        cax=cbar_ax2, orientation='horizontal', ticks=tickBreaks
-    )
-    cbar2.set_label('Democratic %', fontsize=10)
-    cbar2.ax.set_xticklabels(tickLabels, fontsize=8)
-    # Remove colorbar outline and spines
-    cbar2.outline.set_visible(False)
-    for spine in cbar_ax2.spines.values():
-        spine.set_visible(False)
-
-    # Remove any default axes margins and save with minimal padding
-    ax.margins(0)
-    plt.savefig(f'visuals/presidential_results_{year}.png', bbox_inches='tight', pad_inches=0.1)
-    plt.close()
-
-    gdf.to_file(f'data/geo/presidential_election_{year}.geojson', driver="GeoJSON")
-    states.to_file(f'data/geo/states.geojson', driver="GeoJSON")
+# Skip years whose rows, boundaries and styling are unchanged since their map and geo files were written
+cache = RenderCache(__file__)
+style = {'breaks': common_breaks, 'dem_ramp': dem_ramp, 'rep_ramp': rep_ramp}
+boundaries = cache.key(states.geometry)
+
+# PNG encoding and the GeoJSON and GeoParquet writes run in the background while the next year draws; leaving the block waits
+# for them (recording finished years in the render cache) even if a year fails
+with BackgroundWriter() as writer:
+    # Loop through each year to generate and save maps
+    for year in years:
+        df = county_results_df[county_results_df['year'] == year]
+
+        # Merge with geography
+        gdf = counties_gdf.merge(df, on='fips')
+
+        map_path = f'visuals/presidential_results_{year}.png'
+        geojson_path = f'data/geo/presidential_election_{year}.geojson'
+        geoparquet_path = f'data/geo/presidential_election_{year}.parquet'
+        key = cache.key(boundaries, gdf, style, {'year': year, 'figsize': (12, 8), 'pad_inches': 0.1})
+        if cache.fresh(key, map_path, geojson_path, geoparquet_path):
+            continue
+
+        # Initialize plot
+        fig, ax = plt.subplots(1, 1, figsize=(12, 8))
+
+        # Plot Democratic wins; a county without a share has no class (classify gives -1) and is left unfilled
+        gdf_dem = gdf[(gdf['winner'] == 'dem') & gdf['dem_pct'].notna()]
+        gdf_dem.plot(
+            ax=ax,
+            color=np.asarray(dem_ramp)[classify(gdf_dem["dem_pct"], common_breaks)],
+            linewidth=0.1,
+            edgecolor='white',
+        )
+
+        # Plot Republican wins
+        gdf_rep = gdf[(gdf['winner'] == 'rep') & gdf['rep_pct'].notna()]
+        gdf_rep.plot(
+            ax=ax,
+            color=np.asarray(rep_ramp)[classify(gdf_rep["rep_pct"], common_breaks)],
+            linewidth=0.1,
+            edgecolor='white',
+        )
+
+        # Plot state boundaries
+        states.boundary.plot(ax=ax, linewidth=0.5, color="white")
+
+        # Customize axes
+        ax.axis("off")
+        # Figure-level title (left-aligned) and small source line bottom-left
+        fig.suptitle(
+            f'US presidential election results, by county, in {year}',
+            x=0.01, y=0.97, ha='left', va='top', fontsize=15, fontweight='bold'
+        )
+        fig.text(0.01, 0.02, 'Map: Matt Stiles | Data sources: MIT Election Lab / Dave Leip',
+                 ha='left', va='bottom', fontsize=9, color='#666666')
+        # Tighten left/right margins; add a bit more space below colorbars
+        fig.subplots_adjust(top=0.88, bottom=0.08, left=0.01, right=0.99)
+
+        # Place colorbars at the top, under the title
+        cbar_width = 0.20
+        cbar_y = 0.92
+        cbar_ax = fig.add_axes([0.25, cbar_y, cbar_width, 0.015])  # Republican colorbar position
+        cbar_ax2 = fig.add_axes([0.60, cbar_y, cbar_width, 0.015])  # Democratic colorbar position
+
+        tickBreaks = common_breaks[:-1]
+        tickLabels = [f'{b:.0f}%' for b in tickBreaks[:-1]] + [f'{tickBreaks[-1]:.0f}%+']
+
+        # Republican colorbar
+        cbar = fig.colorbar(
+            plt.cm.ScalarMappable(cmap=reds_cmap, norm=BoundaryNorm(common_breaks, reds_cmap.N)),
+            cax=cbar_ax, orientation='horizontal', ticks=tickBreaks
+        )
+        cbar.set_label('Republican %', fontsize=10)
+        cbar.ax.set_xticklabels(tickLabels, fontsize=8)
+        # Remove colorbar outline and spines
+        cbar.outline.set_visible(False)
+        for spine in cbar_ax.spines.values():
+            spine.set_visible(False)
+
+        # Democratic colorbar
+        cbar2 = fig.colorbar(
+            plt.cm.ScalarMappable(cmap=blues_cmap, norm=BoundaryNorm(common_breaks, blues_cmap.N)),
+            cax=cbar_ax2, orientation='horizontal', ticks=tickBreaks
+        )
+        cbar2.set_label('Democratic %', fontsize=10)
+        cbar2.ax.set_xticklabels(tickLabels, fontsize=8)
+        # Remove colorbar outline and spines
+        cbar2.outline.set_visible(False)
+        for spine in cbar_ax2.spines.values():
+            spine.set_visible(False)
+
+        # Remove any default axes margins and save with minimal padding
+        ax.margins(0)
+        png = writer.savefig(fig, map_path, bbox_inches='tight', pad_inches=0.1)
+        geojson = writer.write_geojson(export_frame(gdf), geojson_path)
+        # Columnar copy through Arrow, keeping the typed columns (integer keys, categoricals)
+        geoparquet = writer.write_geoparquet(gdf, geoparquet_path)
+        # Recorded only once every file is on disk
+        writer.on_done(cache.record, [png, geojson, geoparquet], key, map_path, geojson_path, geoparquet_path)
+
+write_geojson(states, 'data/geo/states.geojson')
 
 print("Maps generated successfully.")
@@ -1,7 +1,12 @@
+import argparse
+import os
+
 import pandas as pd
 
-# Load the merged election data with population
-election_data = pd.read_json("data/processed/presidential_county_results_with_population.json")
+from elections.bootstrap import bootstrap_metrics
+from elections.data import load_county_results
+from elections.export import export_records
+from elections.sql import BACKEND, connect, election_metrics
 
 # Function to calculate metrics for each election year
 def calculate_election_metrics(election_data):
@@ -46,7 +51,7 @@ def calculate_election_metrics(election_data):
 
         # Store the results for the year with rounded values
         results.append({
-            "year": year,
+            "year": int(year),
             "num_r_counties": round(num_r_counties, 2),
             "num_d_counties": round(num_d_counties, 2),
             "share_r_counties": round(share_r_counties, 2),
@@ -61,10 +66,43 @@ def calculate_election_metrics(election_data):
 
     return pd.DataFrame(results)
 
-# Calculate the metrics
-election_metrics = calculate_election_metrics(election_data)
 
-# Save the results
-election_metrics.to_json("data/processed/election_metrics_by_year.json", orient="records", indent=4)
+def main():
+    parser = argparse.ArgumentParser(description="Yearly county metrics by winning party.")
+    parser.add_argument(
+        "--bootstrap", type=int, metavar="B", default=int(os.environ.get("ELECTIONS_BOOTSTRAP", 0)),
+        help="also write confidence intervals from B resamples of the counties (default: ELECTIONS_BOOTSTRAP or off)",
+    )
+    parser.add_argument("--processes", type=int, default=None, help="spread the resamples over this many processes")
+    args = parser.parse_args()
+
+    # Calculate the metrics
+    if BACKEND == "duckdb":
+        # One grouped query over the Parquet store
+        with connect() as con:
+            metrics = election_metrics(con)
+    else:
+        # Load the merged election data with population
+        election_data = load_county_results(
+            columns=["votes_dem", "votes_rep", "population", "white_alone_pct"]
+        )
+        metrics = calculate_election_metrics(election_data)
+
+    # Save the results
+    export_records(metrics, "data/processed/election_metrics_by_year.json")
+
+    # Confidence intervals for each metric and year, from resampling the counties
+    if args.bootstrap:
+        if BACKEND == "duckdb":
+            election_data = load_county_results(
+                columns=["votes_dem", "votes_rep", "population", "white_alone_pct"]
+            )
+        intervals = bootstrap_metrics(election_data, resamples=args.bootstrap, processes=args.processes)
+        export_records(intervals.round(4), "data/processed/election_metrics_bootstrap.json")
+
+    print("Election metrics calculated and saved successfully.")
+
 
-print("Election metrics calculated and saved successfully.")
+# The bootstrap's worker processes import this script; under the spawn start method they must not run it again
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
 import geopandas as gpd
-import pandas as pd
 import matplotlib.pyplot as plt
 import cartopy.crs as ccrs
 import numpy as np
 from matplotlib.lines import Line2D
 
+from elections.data import load_county_results
+from elections.dorling import cached_layout, points_to_data
+from elections.render_cache import RenderCache
+from elections.schema import to_key
+
 plt.rcParams["font.family"] = "Roboto"
 
 # Define Albers Equal Area projection
@@ -17,12 +21,13 @@ albo = ccrs.AlbersEqualArea(
 )
 
 # Load the election data
-election_data = pd.read_json("data/processed/presidential_county_results_with_population.json", dtype={'fips': str}).query('~state_po.isin(["HI","AK"])')
+election_data = load_county_results(columns=["votes_dem", "votes_rep", "winner"], conus=True)
 
 # Load county and state geojson files with only necessary columns
 counties_src = gpd.read_file("https://stilesdata.com/gis/usa_counties_demos_generations.geojson").rename(columns={'ID': 'fips'})
 counties_src.columns = counties_src.columns.str.lower()
 counties_gdf = counties_src[['fips', 'name', 'st_abbrev', 'geometry']].copy()
+counties_gdf['fips'] = to_key(counties_gdf['fips'])
 
 # Reproject counties and filter out Alaska and Hawaii
 counties_gdf = counties_gdf.to_crs(albo.proj4_init).query('~st_abbrev.isin(["AK", "HI"])').copy()
@@ -55,11 +60,34 @@ def nice_round(value):
     else:
         return round(value, -3)
 
+# Spread circles apart so none overlap (a Dorling layout); False draws them at the county centroids
+dorling = True
+
+# Colors and output resolution
+rep_color = '#c52622'
+dem_color = '#5194c3'
+dpi = 300
+
+# Skip years whose rows, boundaries and styling are unchanged since their map was written
+cache = RenderCache(__file__)
+style = {'min_radius': min_radius, 'max_radius': max_radius, 'colors': [rep_color, dem_color], 'dorling': dorling}
+boundaries = cache.key(counties_gdf.geometry, states.geometry)
+
 # Loop through election years
 years = sorted(election_geo.year.unique())
 for year in years:
     election_year_data = election_geo[election_geo['year'] == year].copy()
 
+    map_path = f"visuals/pres_county_symbols_{year}.png"
+    key = cache.key(
+        boundaries,
+        election_year_data[['fips', 'votes_dem', 'votes_rep', 'winner', 'geometry']],
+        style,
+        {'year': year, 'figsize': (15, 10), 'dpi': dpi},
+    )
+    if cache.fresh(key, map_path):
+        continue
+
     # Calculate winner_votes based on party
     election_year_data['winner_votes'] = election_year_data.apply(
         lambda x: x['votes_dem'] if x['winner'] == 'dem' else x['votes_rep'], axis=1
@@ -95,12 +123,19 @@ for year in years:
     counties_gdf.boundary.plot(ax=ax, linewidth=0.05, color='grey')
     states.plot(ax=ax, linewidth=2, edgecolor='white', color='#e9e9e9')
 
-    # Plot proportional symbols at centroids
+    # Marker sizes are areas in points; convert their radii to map units at this figure's scale for the layout
+    if dorling:
+        radii = np.sqrt(election_year_data['radius'].to_numpy()) / 2 * points_to_data(ax)
+        x, y = cached_layout('county_symbols', year, centroids.x, centroids.y, radii, scale=max_radius)
+    else:
+        x, y = centroids.x, centroids.y
+
+    # Plot proportional symbols at their laid-out positions
     ax.scatter(
-        centroids.x,
-        centroids.y,
+        x,
+        y,
         s=election_year_data['radius'],
-        color=election_year_data.apply(lambda x: '#c52622' if x['winner'] == 'rep' else '#5194c3', axis=1),
+        color=election_year_data.apply(lambda x: rep_color if x['winner'] == 'rep' else dem_color, axis=1),
         alpha=0.7,
         transform=albo,
     )
@@ -128,5 +163,6 @@ for year in years:
     plt.axis('off')
 
     # Save the figure
-    plt.savefig(f"visuals/pres_county_symbols_{year}.png", dpi=300, bbox_inches='tight')
-    plt.close()
\ No newline at end of file
+    plt.savefig(map_path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+    cache.record(key, map_path)
\ No newline at end of file
@@ -1,19 +1,16 @@
-import pandas as pd
 import altair as alt
-import plotly.express as px
 import altair_stiles as altstiles
 
+from elections.data import load_county_results
+
 alt.themes.register("stiles", altstiles.theme)
 alt.themes.enable("stiles")
 alt.data_transformers.disable_max_rows()
 
 # Load the dataset
-with open("data/processed/presidential_county_results_with_population.json", "r") as file:
-    election_data = pd.read_json(file)
-
-# Convert necessary columns to appropriate data types
-election_data['year'] = election_data['year'].astype(str)
-election_data['white_alone_pct'] = pd.to_numeric(election_data['white_alone_pct'])
+election_data = load_county_results(
+    columns=["county_name", "state_po", "winner", "population", "white_alone_pct"]
+)
 
 # Loop through each year and save the scatter plot as a PNG
 years = sorted(election_data['year'].unique())
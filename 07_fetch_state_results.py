@@ -1,13 +1,10 @@
 import us
 import requests
-from io import StringIO
 import pandas as pd
 from bs4 import BeautifulSoup
-from collections import defaultdict
-import geopandas as gpd
-import matplotlib.pyplot as plt
-import cartopy.crs as ccrs
-import numpy as np
+
+from elections.data import write_state_store
+from elections.export import export_records
 
 state_postal = us.states.mapping('name', 'abbr')
 fips_name = us.states.mapping('fips', 'name')
@@ -82,4 +79,5 @@ election_df['state_name'] = election_df['state'].map(fips_name)
 
 # Optionally, save to a CSV file
 election_df.to_csv('data/processed/presidential_election_results_by_state.csv', index=False)
-election_df.to_json('data/processed/presidential_election_results_by_state.json', indent=4, orient='records')
\ No newline at end of file
+export_records(election_df, 'data/processed/presidential_election_results_by_state.json')
+write_state_store(election_df)
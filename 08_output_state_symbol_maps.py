@@ -1,16 +1,14 @@
-import us
-import math
-import requests
-from io import StringIO
-import pandas as pd
-from bs4 import BeautifulSoup
-from collections import defaultdict
 import geopandas as gpd
 import matplotlib.pyplot as plt
 import cartopy.crs as ccrs
 import numpy as np
 from matplotlib.lines import Line2D
 
+from elections.electoral import load_electoral_college
+from elections.dorling import cached_layout, points_to_data
+from elections.render_cache import RenderCache
+from elections.schema import to_key
+
 plt.rc('font', family='Roboto')
 
 # Define Albers Equal Area projection
@@ -25,13 +23,14 @@ albo = ccrs.AlbersEqualArea(
 # Load state geometries and filter out Hawaii and Alaska
 states_gdf = gpd.read_file("https://stilesdata.com/gis/usa_states_esri_simple.json").rename(columns={'STATE_FIPS': 'fips'})
 states_gdf = states_gdf[~states_gdf['STATE_NAME'].isin(["Hawaii", "Alaska"])].copy()
+states_gdf['fips'] = to_key(states_gdf['fips'])
 states_gdf['STATE_NAME'] = states_gdf['STATE_NAME'].str.lower()  # Ensure lowercase for merge consistency
 
 # Reproject to Albers Equal Area
 states_gdf = states_gdf.to_crs(albo.proj4_init)
 
-election_src = pd.read_json('data/processed/presidential_election_results_by_state.json', dtype={'fips': str, 'year': str})
-election_df = election_src.query('year >= "1924" and year != "1970"').copy()
+# State results from 1924 on, with the winner and winner votes from the electoral college table
+election_df = load_electoral_college()
 
 # Prepare election data and ensure lowercase state names
 election_df['state_name'] = election_df['state_name'].str.lower()
@@ -39,29 +38,44 @@ election_df['state_name'] = election_df['state_name'].str.lower()
 # Merge election data with state geometries
 election_geo = states_gdf.merge(election_df, left_on='fips', right_on='fips', how='inner')
 
+# Third-party winners (La Follette, Thurmond, Wallace) are drawn in gray
+winner_colors = {'dem': '#5194c3', 'rep': '#c52622', 'other': '#999999', 'tie': '#999999'}
+
 # Set min and max radius for symbols
 min_radius = 50
 max_radius = 2000
 
+# Spread circles apart so none overlap (a Dorling layout); False draws them at the state centroids
+dorling = True
+
+dpi = 300
+
+# Skip years whose rows, boundaries and styling are unchanged since their map was written
+cache = RenderCache(__file__)
+style = {'min_radius': min_radius, 'max_radius': max_radius, 'colors': winner_colors, 'dorling': dorling}
+boundaries = cache.key(states_gdf.geometry)
+
 # Loop through each year
 years = sorted(election_geo['year'].unique())
 for year in years:
     try:
         # Filter data for the current year
-        election_year_data = election_geo[election_geo['year'] == f'{year}'].copy()
+        election_year_data = election_geo[election_geo['year'] == year].copy()
 
         # Check if data exists for the year
         if election_year_data.empty:
             print(f"No data available for year {year}, skipping...")
             continue
 
-        # Calculate winner_votes and winner
-        election_year_data['winner_votes'] = election_year_data.apply(
-            lambda x: x['dem_votes'] if x['dem_pct'] > x['rep_pct'] else x['rep_votes'], axis=1
-        )
-        election_year_data['winner'] = election_year_data.apply(
-            lambda x: 'dem' if x['dem_pct'] > x['rep_pct'] else 'rep', axis=1
+        map_path = f"visuals/pres_state_symbols_{year}.png"
+        key = cache.key(
+            boundaries,
+            election_year_data[['fips', 'winner', 'winner_votes', 'geometry']],
+            style,
+            {'year': year, 'figsize': (15, 10), 'dpi': dpi},
         )
+        if cache.fresh(key, map_path):
+            continue
 
         # Normalize the radius
         min_votes = election_year_data['winner_votes'].min()
@@ -93,12 +107,19 @@ for year in years:
         # Fill the states with a light color and outline each state
         states_gdf.plot(ax=ax, linewidth=0.5, edgecolor='white', color='#e9e9e9')
 
-        # Plot proportional symbols at centroids
+        # Marker sizes are areas in points; convert their radii to map units at this figure's scale for the layout
+        if dorling:
+            radii = np.sqrt(election_year_data['radius'].to_numpy()) / 2 * points_to_data(ax)
+            x, y = cached_layout('state_symbols', year, centroids.x, centroids.y, radii, scale=max_radius)
+        else:
+            x, y = centroids.x, centroids.y
+
+        # Plot proportional symbols at their laid-out positions
         ax.scatter(
-            centroids.x,
-            centroids.y,
+            x,
+            y,
             s=election_year_data['radius'],
-            color=election_year_data.apply(lambda x: '#5194c3' if x['winner'] == 'dem' else '#c52622', axis=1),
+            color=election_year_data['winner'].map(winner_colors),
             alpha=.7,
             transform=albo,
         )
@@ -155,8 +176,9 @@ for year in years:
         legend.set_title("Winner votes", prop={'size': 12, 'weight': 'bold'})
 
         # Save the figure
-        plt.savefig(f"visuals/pres_state_symbols_{year}.png", dpi=300, bbox_inches='tight')
+        plt.savefig(map_path, dpi=dpi, bbox_inches='tight')
         plt.close()
+        cache.record(key, map_path)
     
     except Exception as e:
         print(f"Error processing year {year}: {e}")
\ No newline at end of file
@@ -1,24 +1,39 @@
 import geopandas as gpd
-import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
-from math import radians, cos, sin
+from math import radians
 from matplotlib.patches import FancyArrowPatch
 
+from elections.crosswalk import load_crosswalk
+from elections.data import load_county_results
+from elections.decompose import load_decomposition
+from elections.render_cache import RenderCache
+from elections.schema import to_key
+
 plt.rc('font', family='Roboto')
 
 albers_epsg = "EPSG:5070"  # CONUS Albers Equal Area
 
 # Load county-level results and compute 2020→2024 change
-results = pd.read_json("data/processed/presidential_county_results_with_population.json", dtype={'fips': str})
-results['year'] = results['year'].astype(str)
+results = load_county_results(years=[2020, 2024], columns=["votes_dem", "votes_rep", "votes_all", "dem_pct", "rep_pct"])
 
 cols = ['fips', 'dem_pct', 'rep_pct']
-df20 = results.query('year == "2020"')[cols].rename(columns={
+
+# Carry 2020 votes into 2024's county codes so renamed, merged and split counties still line up;
+# counties whose codes changed get their shares recomputed from the projected votes
+results_2020 = results.query('year == 2020')
+votes_2020 = load_crosswalk().project_frame(results_2020, ['votes_dem', 'votes_rep', 'votes_all'], 2020, 2024)
+votes_2020 = votes_2020.merge(results_2020[cols], on='fips', how='left')
+for party in ['dem', 'rep']:
+    votes_2020.loc[votes_2020['remapped'], f'{party}_pct'] = (
+        votes_2020[f'votes_{party}'] / votes_2020['votes_all'] * 100
+    ).round(2)
+
+df20 = votes_2020[cols].rename(columns={
     'dem_pct': 'dem_pct_2020',
     'rep_pct': 'rep_pct_2020'
 })
-df24 = results.query('year == "2024"')[cols].rename(columns={
+df24 = results.query('year == 2024')[cols].rename(columns={
     'dem_pct': 'dem_pct_2024',
     'rep_pct': 'rep_pct_2024'
 })
@@ -31,7 +46,8 @@ change_data['margin_diff'] = change_data['margin_2024'] - change_data['margin_20
 # Load county geojson with limited columns and reproject to Albers
 counties_src = gpd.read_file("https://stilesdata.com/gis/usa_counties_demos_generations.geojson")
 counties_src = counties_src.rename(columns={'ID': 'fips', 'ST_ABBREV': 'st_abbrev', 'NAME': 'name'})
-counties_src = counties_src[['fips', 'name', 'st_abbrev', 'geometry']]
+counties_src = counties_src[['fips', 'name', 'st_abbrev', 'geometry']].copy()
+counties_src['fips'] = to_key(counties_src['fips'])
 counties_gdf = counties_src.to_crs(albers_epsg).query('~st_abbrev.isin(["AK", "HI"])').copy()
 
 states_gdf = gpd.read_file("https://stilesdata.com/gis/usa_states_esri_simple.json").query('~STATE_NAME.isin(["Hawaii", "Alaska"])').to_crs(albers_epsg)
@@ -55,51 +71,80 @@ if min_diff != max_diff:
 else:
     change_geo['symbol_size'] = (min_symbol_size + max_symbol_size) / 2
 
+# Arrow colors: "direction" colors by party shift; "driver" by whether the change in votes came mostly from
+# turnout or from voters changing sides (elections/decompose.py)
+color_by = "direction"
+driver_colors = {'turnout': '#e0a33a', 'share': '#7a5aa6'}
+
 # Determine color and angle for party shifts
-change_geo['color'] = change_geo['margin_diff'].apply(lambda x: '#5194c3' if x < 0 else '#c52622')
+if color_by == "driver":
+    decomposition = load_decomposition().query('year_from == 2020 and year_to == 2024')[['fips', 'driver']]
+    change_geo = change_geo.merge(decomposition, on='fips', how='left')
+    change_geo['color'] = change_geo['driver'].astype(str).map(driver_colors).fillna('#999999')
+else:
+    change_geo['color'] = change_geo['margin_diff'].apply(lambda x: '#5194c3' if x < 0 else '#c52622')
 change_geo['angle'] = change_geo['margin_diff'].apply(lambda x: radians(135) if x < 0 else radians(45))
 
-# Plotting
-fig, ax = plt.subplots(1, 1, figsize=(15, 10))
-
-# Fill counties with a light color and add state boundaries
-counties_gdf.plot(ax=ax, linewidth=0.2, edgecolor='#d1f1d1', color='#e9e9e9')
-states_gdf.plot(ax=ax, linewidth=1, edgecolor='white', facecolor='none')
-
-# Calculate centroids for symbol plotting
-centroids = change_geo.geometry.centroid
-x = centroids.x.values
-y = centroids.y.values
-dx = change_geo['symbol_size'] * np.cos(change_geo['angle'])
-dy = change_geo['symbol_size'] * np.sin(change_geo['angle'])
-colors = change_geo['color'].values
-
-# Plot arrows using quiver
-quiver = ax.quiver(x, y, dx, dy, color=colors, scale=scaling_factor, headwidth=3, headlength=4, headaxislength=3, minlength=0.1)
-
-# Add title
-plt.title("County-level shift in presidential vote share, 2020 to 2024\nArrows indicate shift direction; larger symbols represent greater shifts",
-          fontsize=14, fontweight='bold')
-plt.axis('off')
-
-# Custom legend positioned on the map
-legend_ax = fig.add_axes([0.25, 0.05, 0.1, 0.1])
-legend_ax.set_xlim(0, 2)
-legend_ax.set_ylim(0, 2)
-legend_ax.axis('off')
-
-# Define custom arrow properties with equal lengths and adjusted thickness
-arrow_props_republican = dict(arrowstyle="-|>", color="#c52622", linewidth=2, mutation_scale=15)
-arrow_props_democrat = dict(arrowstyle="-|>", color="#5194c3", linewidth=2, mutation_scale=15)
-
-# Add arrows and labels in the legend axes
-legend_ax.add_patch(FancyArrowPatch((0.3, 0.5), (0.1, 1), **arrow_props_democrat))  # Democratic arrow at 10:30
-legend_ax.add_patch(FancyArrowPatch((1.7, 0.5), (1.9, 1), **arrow_props_republican))  # Republican arrow at 1:30
-
-# Adjust text placement for separation and alignment
-legend_ax.text(0.3, 0.3, "More Democratic", color="#666666", fontsize=10, ha="center")
-legend_ax.text(1.7, 0.3, "More Republican", color="#666666", fontsize=10, ha="center")
-
-# Save the figure with the integrated legend
-plt.savefig("visuals/county_shift_2020_2024.png", dpi=300, bbox_inches='tight')
-plt.close(fig)
\ No newline at end of file
+map_path = "visuals/county_shift_2020_2024.png"
+dpi = 300
+
+# Skip the map if the shifts, boundaries and styling are unchanged since it was written
+cache = RenderCache(__file__)
+key = cache.key(
+    counties_gdf.geometry,
+    states_gdf.geometry,
+    change_geo[['fips', 'margin_diff', 'symbol_size', 'color', 'angle', 'geometry']],
+    {'min_symbol_size': min_symbol_size, 'max_symbol_size': max_symbol_size, 'scaling_factor': scaling_factor,
+     'color_by': color_by},
+    {'figsize': (15, 10), 'dpi': dpi},
+)
+if not cache.fresh(key, map_path):
+    # Plotting
+    fig, ax = plt.subplots(1, 1, figsize=(15, 10))
+
+    # Fill counties with a light color and add state boundaries
+    counties_gdf.plot(ax=ax, linewidth=0.2, edgecolor='#d1f1d1', color='#e9e9e9')
+    states_gdf.plot(ax=ax, linewidth=1, edgecolor='white', facecolor='none')
+
+    # Calculate centroids for symbol plotting
+    centroids = change_geo.geometry.centroid
+    x = centroids.x.values
+    y = centroids.y.values
+    dx = change_geo['symbol_size'] * np.cos(change_geo['angle'])
+    dy = change_geo['symbol_size'] * np.sin(change_geo['angle'])
+    colors = change_geo['color'].values
+
+    # Plot arrows using quiver
+    quiver = ax.quiver(x, y, dx, dy, color=colors, scale=scaling_factor, headwidth=3, headlength=4, headaxislength=3, minlength=0.1)
+
+    # Add title
+    plt.title("County-level shift in presidential vote share, 2020 to 2024\nArrows indicate shift direction; larger symbols represent greater shifts",
+              fontsize=14, fontweight='bold')
+    plt.axis('off')
+
+    # Custom legend positioned on the map
+    legend_ax = fig.add_axes([0.25, 0.05, 0.1, 0.1])
+    legend_ax.set_xlim(0, 2)
+    legend_ax.set_ylim(0, 2)
+    legend_ax.axis('off')
+
+    # Define custom arrow properties with equal lengths and adjusted thickness
+    arrow_colors = ("#666666", "#666666") if color_by == "driver" else ("#c52622", "#5194c3")
+    arrow_props_republican = dict(arrowstyle="-|>", color=arrow_colors[0], linewidth=2, mutation_scale=15)
+    arrow_props_democrat = dict(arrowstyle="-|>", color=arrow_colors[1], linewidth=2, mutation_scale=15)
+
+    # Add arrows and labels in the legend axes
+    legend_ax.add_patch(FancyArrowPatch((0.3, 0.5), (0.1, 1), **arrow_props_democrat))  # Democratic arrow at 10:30
+    legend_ax.add_patch(FancyArrowPatch((1.7, 0.5), (1.9, 1), **arrow_props_republican))  # Republican arrow at 1:30
+
+    # Adjust text placement for separation and alignment
+    legend_ax.text(0.3, 0.3, "More Democratic", color="#666666", fontsize=10, ha="center")
+    legend_ax.text(1.7, 0.3, "More Republican", color="#666666", fontsize=10, ha="center")
+    if color_by == "driver":
+        legend_ax.text(0.3, -0.1, "Mostly turnout", color=driver_colors['turnout'], fontsize=10, ha="center")
+        legend_ax.text(1.7, -0.1, "Mostly vote share", color=driver_colors['share'], fontsize=10, ha="center")
+
+    # Save the figure with the integrated legend
+    plt.savefig(map_path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    cache.record(key, map_path)
@@ -0,0 +1,117 @@
+import os
+
+import geopandas as gpd
+import matplotlib.pyplot as plt
+from matplotlib.colors import to_rgb
+from matplotlib.lines import Line2D
+
+from elections.data import load_county_results
+from elections.dots import cached_dots, rasterize
+from elections.render_cache import RenderCache
+from elections.schema import to_key
+
+plt.rc('font', family='Roboto')
+
+albers_epsg = "EPSG:5070"  # CONUS Albers Equal Area
+
+# One dot per this many votes for each party
+votes_per_dot = 100
+
+# Colors, dot opacity and output size
+rep_color = '#c52622'
+dem_color = '#5194c3'
+opacity = 0.7
+figsize = (15, 10)
+dpi = 300
+
+# Sample counties in parallel; points are cached per year under data/processed/dots
+processes = os.cpu_count()
+
+
+def main():
+    # Load the election data
+    election_data = load_county_results(columns=["votes_dem", "votes_rep"], conus=True)
+
+    # Load county and state geojson files with only necessary columns, reprojected to Albers
+    counties_src = gpd.read_file("https://stilesdata.com/gis/usa_counties_demos_generations.geojson")
+    counties_src = counties_src.rename(columns={'ID': 'fips', 'ST_ABBREV': 'st_abbrev', 'NAME': 'name'})
+    counties_src = counties_src[['fips', 'name', 'st_abbrev', 'geometry']].copy()
+    counties_src['fips'] = to_key(counties_src['fips'])
+    counties_gdf = counties_src.to_crs(albers_epsg).query('~st_abbrev.isin(["AK", "HI"])').copy()
+
+    states_gdf = gpd.read_file("https://stilesdata.com/gis/usa_states_esri_simple.json").query('~STATE_NAME.isin(["Hawaii", "Alaska"])').to_crs(albers_epsg)
+
+    # Merge election data with counties
+    election_geo = counties_gdf.merge(election_data, on='fips')
+
+    # Skip years whose rows, boundaries and styling are unchanged since their map was written
+    cache = RenderCache(__file__)
+    style = {'votes_per_dot': votes_per_dot, 'colors': [dem_color, rep_color], 'opacity': opacity}
+    boundaries = cache.key(counties_gdf.geometry, states_gdf.geometry)
+
+    # Loop through election years
+    years = sorted(election_geo.year.unique())
+    for year in years:
+        election_year_data = election_geo[election_geo['year'] == year]
+
+        map_path = f"visuals/county_dots_{year}.png"
+        key = cache.key(
+            boundaries,
+            election_year_data[['fips', 'votes_dem', 'votes_rep', 'geometry']],
+            style,
+            {'year': year, 'figsize': figsize, 'dpi': dpi},
+        )
+        if cache.fresh(key, map_path):
+            continue
+
+        x, y, party = cached_dots(
+            year,
+            election_year_data.geometry,
+            election_year_data['votes_dem'],
+            election_year_data['votes_rep'],
+            votes_per_dot,
+            processes=processes,
+        )
+
+        # Draw the figure at its output resolution so the raster's pixels map one-to-one onto the saved image
+        fig, ax = plt.subplots(1, 1, figsize=figsize, dpi=dpi)
+        states_gdf.plot(ax=ax, linewidth=0, color='#e9e9e9')
+        ax.set_axis_off()
+        ax.apply_aspect()
+        xmin, xmax = ax.get_xlim()
+        ymin, ymax = ax.get_ylim()
+        bbox = ax.get_window_extent()
+
+        # Bin the dots straight into an image instead of drawing millions of scatter markers
+        image = rasterize(
+            x, y, party,
+            (xmin, xmax, ymin, ymax),
+            round(bbox.width), round(bbox.height),
+            colors=[to_rgb(dem_color), to_rgb(rep_color)],
+            opacity=opacity,
+        )
+        ax.imshow(image, extent=(xmin, xmax, ymin, ymax), interpolation='nearest', zorder=2)
+        states_gdf.boundary.plot(ax=ax, linewidth=0.5, color='white', zorder=3)
+        ax.set_xlim(xmin, xmax)
+        ax.set_ylim(ymin, ymax)
+
+        # Add title
+        ax.set_title(f"Presidential election results in {year}, by county\nEach dot represents {votes_per_dot:,} votes",
+                     fontsize=14, fontweight='bold')
+
+        # Legend with one dot per party
+        legend_elements = [
+            Line2D([0], [0], marker='o', color='none', label=label, markerfacecolor=color, markeredgecolor='none', markersize=6)
+            for label, color in [('Democratic', dem_color), ('Republican', rep_color)]
+        ]
+        ax.legend(handles=legend_elements, frameon=False, loc="lower left", bbox_to_anchor=(0.05, 0.05))
+
+        # Save the figure
+        plt.savefig(map_path, dpi=dpi, bbox_inches='tight')
+        plt.close(fig)
+        cache.record(key, map_path)
+
+
+# Sampling workers import this script; under the spawn start method they must not run it again
+if __name__ == "__main__":
+    main()
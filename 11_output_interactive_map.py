@@ -0,0 +1,62 @@
+import os
+
+import geopandas as gpd
+
+from elections.data import load_county_results
+from elections.render_cache import RenderCache
+from elections.schema import to_key
+from elections.webmap import write_webmap
+
+albers_epsg = "EPSG:5070"  # CONUS Albers Equal Area
+
+# County results for CONUS, every year
+county_results_df = load_county_results(columns=["dem_pct", "rep_pct", "votes_all"], conus=True)
+
+# Load county and state boundaries, reprojected to Albers
+counties_src = gpd.read_file("https://stilesdata.com/gis/usa_counties_demos_generations.geojson")
+counties_src = counties_src.rename(columns={'ID': 'fips', 'ST_ABBREV': 'st_abbrev', 'NAME': 'name'})
+counties_gdf = counties_src[['fips', 'name', 'st_abbrev', 'geometry']].copy()
+counties_gdf['fips'] = to_key(counties_gdf['fips'])
+counties_gdf = counties_gdf.to_crs(albers_epsg).query('~st_abbrev.isin(["AK", "HI"])')
+counties_gdf = counties_gdf[counties_gdf['fips'].isin(county_results_df['fips'])].reset_index(drop=True)
+
+states_gdf = gpd.read_file("https://stilesdata.com/gis/usa_states_esri_simple.json").query(
+    '~STATE_NAME.isin(["Hawaii", "Alaska"])').to_crs(albers_epsg)
+
+# Simplification tolerance in meters; borders stay shared between neighbors
+tolerance = 500
+
+map_path = "visuals/presidential_results_interactive.html"
+title = "US presidential election results, by county"
+source = "Map: Matt Stiles | Data sources: MIT Election Lab / Dave Leip"
+
+# Skip the page if the rows, boundaries and options are unchanged since it was written
+cache = RenderCache(__file__)
+key = cache.key(
+    counties_gdf[['fips', 'name', 'st_abbrev', 'geometry']],
+    states_gdf.geometry,
+    county_results_df[['fips', 'year', 'dem_pct', 'rep_pct', 'votes_all']],
+    {'tolerance': tolerance, 'title': title, 'source': source},
+)
+if not cache.fresh(key, map_path):
+    labels = (counties_gdf['name'] + ", " + counties_gdf['st_abbrev']).tolist()
+    size = write_webmap(
+        map_path,
+        counties_gdf.geometry,
+        counties_gdf['fips'],
+        labels,
+        county_results_df,
+        outlines=states_gdf.geometry,
+        tolerance=tolerance,
+        title=title,
+        source=source,
+    )
+    cache.record(key, map_path)
+
+    # Against the per-year GeoJSON files written by 03_output_geofiles_maps.py
+    geojson_paths = [f"data/geo/presidential_election_{year}.geojson" for year in sorted(county_results_df.year.unique())]
+    geojson_size = sum(os.path.getsize(path) for path in geojson_paths if os.path.exists(path))
+    if geojson_size:
+        print(f"{map_path}: {size / 1e6:.1f} MB, {size / geojson_size:.1%} of the yearly GeoJSON files ({geojson_size / 1e6:.1f} MB)")
+    else:
+        print(f"{map_path}: {size / 1e6:.1f} MB")
@@ -0,0 +1 @@
+"""Shared code for the presidential election scripts."""
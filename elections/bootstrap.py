@@ -0,0 +1,100 @@
+"""
+Bootstrap confidence intervals for the yearly county metrics in 04_analyze_results.py.
+
+Each resample draws a year's counties with replacement. Rather than materializing the resampled rows, a chunk of
+resamples is turned into a (resamples, counties) matrix of how many times each county was drawn, and one matrix
+product with the per-county measures (counties won, population, white population, split by winner) gives every
+resample's sums at once. The metrics are ratios of those sums, so 10,000 resamples of every year take seconds.
+Chunks can be spread over processes.
+
+    python 04_analyze_results.py --bootstrap 10000 --processes 4
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+METRICS = [
+    "num_r_counties", "num_d_counties", "share_r_counties", "share_d_counties",
+    "pop_r_counties", "pop_d_counties", "share_r_population", "share_d_population",
+    "pct_white_r_counties", "pct_white_d_counties",
+]
+
+
+def county_measures(year_data):
+    """(counties, 7) measures whose sums give every metric: R and D wins, population and white population."""
+    # Ties go to the Democrat, as in calculate_election_metrics
+    won_r = (year_data["votes_rep"] > year_data["votes_dem"]).to_numpy("float64")
+    won_d = 1 - won_r
+    # Sums skip missing population, as pandas' sum does
+    population = np.nan_to_num(year_data["population"].to_numpy("float64"))
+    white = population * np.nan_to_num(year_data["white_alone_pct"].to_numpy("float64"))
+    return np.column_stack([won_r, won_d, population, population * won_r, population * won_d, white * won_r, white * won_d])
+
+
+def metrics_from_sums(sums):
+    """METRICS (..., 10) from summed county measures (..., 7)."""
+    num_r, num_d, population, pop_r, pop_d, white_r, white_d = np.moveaxis(sums, -1, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.stack(
+            [
+                num_r, num_d, num_r / (num_r + num_d), num_d / (num_r + num_d),
+                pop_r, pop_d, pop_r / population, pop_d / population,
+                white_r / pop_r, white_d / pop_d,
+            ],
+            axis=-1,
+        )
+
+
+def _resample_chunk(args):
+    measures, resamples, seed = args
+    n = len(measures)
+    rng = np.random.default_rng(seed)
+    draws = rng.integers(0, n, size=(resamples, n))
+    # Row r's draws land in columns r * n ... r * n + n - 1 of one flat bincount
+    draws += np.arange(resamples)[:, None] * n
+    counts = np.bincount(draws.ravel(), minlength=resamples * n).reshape(resamples, n)
+    return metrics_from_sums(counts @ measures)
+
+
+def bootstrap_metrics(election_data, resamples=10_000, confidence=0.95, chunk_size=1_000, processes=None, seed=0):
+    """
+    Percentile bootstrap intervals for every metric and year, resampling counties within each year.
+
+    Returns one row per year and metric with the point estimate (from the full sample), the bootstrap standard
+    error and the interval bounds.
+    """
+    years = sorted(election_data["year"].unique())
+    measures = {year: county_measures(election_data[election_data["year"] == year]) for year in years}
+
+    sizes = [chunk_size] * (resamples // chunk_size)
+    if resamples % chunk_size:
+        sizes.append(resamples % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(years) * len(sizes))
+    jobs = [(measures[year], size, seeds[i * len(sizes) + j]) for i, year in enumerate(years) for j, size in enumerate(sizes)]
+
+    if processes and processes > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            chunks = list(pool.map(_resample_chunk, jobs))
+    else:
+        chunks = [_resample_chunk(job) for job in jobs]
+
+    alpha = (1 - confidence) / 2
+    frames = []
+    for i, year in enumerate(years):
+        samples = np.concatenate(chunks[i * len(sizes) : (i + 1) * len(sizes)])
+        lower, upper = np.nanquantile(samples, [alpha, 1 - alpha], axis=0)
+        frames.append(
+            pd.DataFrame(
+                {
+                    "year": int(year),
+                    "metric": METRICS,
+                    "estimate": metrics_from_sums(measures[year].sum(axis=0)),
+                    "std_error": np.nanstd(samples, axis=0, ddof=1),
+                    "ci_lower": lower,
+                    "ci_upper": upper,
+                }
+            )
+        )
+    return pd.concat(frames, ignore_index=True)
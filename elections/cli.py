@@ -0,0 +1,170 @@
+"""
+Single entry point for the pipeline stages.
+
+    elections fetch                  # 00_fetch_2024, 01_fetch_population, 07_fetch_state_results
+    elections fetch states           # just the state scrape
+    elections process                # 00_process_results
+    elections merge                  # 02_apply_population_results
+    elections validate               # integrity checks on the merged results; fails on errors
+    elections analyze                # 04_analyze_results, electoral college tables, results cube, regressions, vote decomposition
+    elections render county-shift    # 09_map_county_shift; no step name renders every map
+    elections analyze --bootstrap 10000  # also confidence intervals for the yearly metrics
+    elections render --force         # redraw maps the render cache would skip
+    elections import-times           # startup cost of each stage's libraries
+
+Each stage runs its numbered scripts in order, in this process, with the working directory unchanged (run
+from the repository root, as with the scripts themselves). This module imports only the standard library,
+so a stage pays for geopandas, matplotlib, cartopy or altair only when one of its scripts imports them.
+"""
+
+import argparse
+import os
+import re
+import runpy
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# The numbered scripts live at the repository root, beside the package
+ROOT = Path(__file__).resolve().parent.parent
+
+# Stage -> step -> numbered script, or a module run as python -m
+STAGES = {
+    "fetch": {
+        "counties": "00_fetch_2024.py",
+        "population": "01_fetch_population.py",
+        "states": "07_fetch_state_results.py",
+    },
+    "process": {
+        "counties": "00_process_results.py",
+    },
+    "merge": {
+        "population": "02_apply_population_results.py",
+    },
+    "validate": {
+        "results": "elections.validate",
+    },
+    "analyze": {
+        "metrics": "04_analyze_results.py",
+        "electoral": "elections.electoral",
+        "cube": "elections.cube",
+        "regression": "elections.regression",
+        "decompose": "elections.decompose",
+    },
+    "render": {
+        "county-maps": "03_output_geofiles_maps.py",
+        "county-symbols": "05_output_county_symbol_maps.py",
+        "scatter": "06_population_scatter_parties.py",
+        "state-symbols": "08_output_state_symbol_maps.py",
+        "county-shift": "09_map_county_shift.py",
+        "county-dots": "10_output_county_dot_density_maps.py",
+        "interactive": "11_output_interactive_map.py",
+    },
+}
+
+# Third-party libraries each stage's scripts import, for import-times
+STAGE_IMPORTS = {
+    "fetch": ["requests", "bs4", "pandas", "us"],
+    "process": ["numpy", "pandas", "us"],
+    "merge": ["pandas", "pyarrow.parquet", "us"],
+    "validate": ["numpy", "pandas", "pyarrow.parquet", "scipy.sparse", "shapely"],
+    "analyze": ["pandas", "pyarrow.parquet", "scipy.sparse", "shapely", "us"],
+    "render": ["geopandas", "matplotlib.pyplot", "cartopy.crs", "altair"],
+}
+
+
+def run_step(target):
+    print(f"==> {target}", flush=True)
+    saved_argv = sys.argv
+    # Scripts and modules see a clean argv, as if run directly
+    sys.argv = [target]
+    try:
+        if target.endswith(".py"):
+            runpy.run_path(str(ROOT / target), run_name="__main__")
+        else:
+            runpy.run_module(target, run_name="__main__", alter_sys=True)
+    finally:
+        sys.argv = saved_argv
+
+
+def run_stage(stage, steps=None):
+    available = STAGES[stage]
+    for step in steps or available:
+        run_step(available[step])
+
+
+_IMPORTTIME = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| (\S.*)$")
+
+
+def import_time(modules):
+    """
+    Cumulative import time in ms of modules in a fresh interpreter, from python -X importtime.
+
+    Returns None if any of them is not installed.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode:
+        return None
+    # Only top-level lines (no indentation before the name) so nested imports aren't counted twice
+    return sum(int(m.group(1)) for m in map(_IMPORTTIME.match, proc.stderr.splitlines()) if m) / 1000
+
+
+def startup_time(args, repeat=3):
+    """Best-of wall time in ms to start an interpreter and run args."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *args], capture_output=True, check=True)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def print_import_times():
+    print(f"{'interpreter':<24}{startup_time(['-c', 'pass']):>10.0f} ms")
+    print(f"{'elections --help':<24}{startup_time(['-m', 'elections.cli', '--help']):>10.0f} ms")
+    for stage, modules in STAGE_IMPORTS.items():
+        ms = import_time(modules)
+        took = "not installed" if ms is None else f"{ms:.0f} ms"
+        print(f"{stage + ' imports':<24}{took:>13}  ({', '.join(modules)})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="elections", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    for stage, steps in STAGES.items():
+        sub = commands.add_parser(stage, help=", ".join(steps.values()))
+        sub.add_argument("steps", nargs="*", metavar="step", help=" | ".join(steps))
+        if stage == "render":
+            sub.add_argument("--force", action="store_true", help="redraw maps whose inputs are unchanged")
+        if stage == "validate":
+            sub.add_argument("--warn-only", action="store_true", help="report failed error checks without failing")
+        if stage == "analyze":
+            sub.add_argument("--bootstrap", type=int, metavar="B", help="confidence intervals from B resamples of counties")
+    commands.add_parser("import-times", help="time interpreter startup and each stage's imports")
+    args = parser.parse_args(argv)
+
+    if args.command == "import-times":
+        print_import_times()
+        return
+    unknown = [step for step in args.steps if step not in STAGES[args.command]]
+    if unknown:
+        parser.error(f"unknown {args.command} step(s): {', '.join(unknown)}; choose from {', '.join(STAGES[args.command])}")
+    if getattr(args, "force", False):
+        # Scripts see a clean argv, so the render cache takes the flag from the environment
+        os.environ["ELECTIONS_FORCE_RENDER"] = "1"
+    if getattr(args, "warn_only", False):
+        os.environ["ELECTIONS_VALIDATE"] = "warn"
+    if getattr(args, "bootstrap", None):
+        os.environ["ELECTIONS_BOOTSTRAP"] = str(args.bootstrap)
+    run_stage(args.command, args.steps)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+County FIPS crosswalk between vintages, so results from different years join on the same codes.
+
+County codes change: Virginia independent cities merge into their counties, counties are renamed (Shannon to
+Oglala Lakota, Wade Hampton to Kusilvak), Alaska's census areas split. A plain merge on fips across years drops
+those counties. The bundled table data/reference/county_fips_changes.csv lists each change with the year it took
+effect and the share of the old county assigned to each new code (1 for merges and renames, the share of the
+first census after the split for splits). Between any two election years the changes in between are composed
+into one sparse (old codes x new codes) weight matrix, and a county x year block of counts is carried into the
+later vintage with one sparse product. Counts (votes, population) project; shares have to be recomputed from
+the projected counts. Sources that kept using a renamed or merged county's old code are brought up to date
+with recode.
+
+Changes that aren't in the table (Connecticut's 2022 planning regions, for example) can be derived from two
+vintages' boundaries with overlay_changes, weighted by shared area or by the target vintage's population.
+
+    from elections.crosswalk import load_crosswalk
+    crosswalk = load_crosswalk()
+    votes_2016 = crosswalk.project_frame(df_2016, ["votes_dem", "votes_rep", "votes_all"], 2016, 2020)
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import shapely
+from scipy import sparse
+
+from elections.data import REFERENCE_DIR
+from elections.schema import to_key
+
+COUNTY_CHANGES_CSV = REFERENCE_DIR / "county_fips_changes.csv"
+
+
+class Crosswalk:
+    """Dated county code changes, composed into sparse weight matrices between any two years."""
+
+    def __init__(self, changes):
+        changes = changes.copy()
+        changes["old_fips"] = to_key(changes["old_fips"])
+        changes["new_fips"] = to_key(changes["new_fips"])
+        changes["effective"] = to_key(changes["effective"])
+        self.changes = changes[["old_fips", "new_fips", "effective", "weight"]].sort_values("effective")
+
+    def with_changes(self, changes):
+        """A crosswalk with extra changes (e.g. from overlay_changes) added to these."""
+        return Crosswalk(pd.concat([self.changes, changes], ignore_index=True))
+
+    def matrix(self, fips, source_year, target_year):
+        """
+        Weights carrying counts for the codes fips (in use in source_year) into target_year's codes.
+
+        Returns a sparse (len(fips), len(targets)) CSR matrix and the sorted target codes. Codes that did not
+        change map to themselves with weight 1. Projecting to an earlier year only works when none of the codes
+        changed in between: a merged county can't be split back without weights for its parts.
+        """
+        codes = np.asarray(fips, dtype=np.int64)
+        matrix = sparse.identity(len(codes), format="csr")
+        if target_year < source_year:
+            between = (self.changes["effective"] > target_year) & (self.changes["effective"] <= source_year)
+            if np.isin(self.changes.loc[between, "new_fips"], codes).any():
+                raise ValueError(f"can't project {source_year} codes back to {target_year} across code changes")
+            return matrix, codes
+        steps = self.changes[(self.changes["effective"] > source_year) & (self.changes["effective"] <= target_year)]
+        for _, step in steps.groupby("effective"):
+            old = step["old_fips"].to_numpy(np.int64)
+            affected = np.isin(codes, old)
+            if not affected.any():
+                continue
+            step = step[np.isin(old, codes)]
+            kept = np.flatnonzero(~affected)
+            new_codes = np.unique(np.concatenate([codes[kept], step["new_fips"].to_numpy(np.int64)]))
+
+            # Unchanged codes keep weight 1 to themselves; changed codes spread over their successors
+            position = {code: i for i, code in enumerate(codes)}
+            rows = np.concatenate([kept, [position[code] for code in step["old_fips"]]])
+            targets = np.concatenate([codes[kept], step["new_fips"].to_numpy(np.int64)])
+            weights = np.concatenate([np.ones(len(kept)), step["weight"].to_numpy("float64")])
+            cols = np.searchsorted(new_codes, targets)
+            step_matrix = sparse.csr_matrix((weights, (rows, cols)), shape=(len(codes), len(new_codes)))
+            matrix = matrix @ step_matrix
+            codes = new_codes
+        return matrix.tocsr(), codes
+
+    def recode(self, fips, years):
+        """
+        fips with codes still in use after they changed replaced by the code in effect in each row's year.
+
+        Sources don't all switch codes when a change takes effect (the 2024 scrape still codes Oglala Lakota
+        County as Shannon County's 46113). Only renames and merges are followed: a split county's votes can't
+        be put under one of its parts, so those codes are returned unchanged, as are codes that never changed.
+        """
+        codes = np.asarray(fips, dtype=np.int64).copy()
+        years = np.asarray(years, dtype=np.int64)
+        changes = self.changes
+        whole = changes[~changes["old_fips"].duplicated(keep=False) & np.isclose(changes["weight"], 1)]
+        # self.changes is in effective order, so a code changed twice ends at the latest one in effect
+        for old, new, effective in whole[["old_fips", "new_fips", "effective"]].itertuples(index=False):
+            codes[(codes == old) & (years >= effective)] = new
+        return codes.astype(np.int32)
+
+    def project(self, fips, values, source_year, target_year):
+        """
+        values (one row per code in fips, any number of columns) re-expressed in target_year's codes.
+
+        Returns the target codes, the projected values and a flag for each target code that did not simply
+        keep its own counts (it received counts from a changed code); shares for those have to be recomputed.
+        """
+        fips = np.asarray(fips, dtype=np.int64)
+        unique, inverse = np.unique(fips, return_inverse=True)
+        values = np.asarray(values, dtype="float64")
+        # Duplicate codes are summed before projecting
+        summed = np.zeros((len(unique),) + values.shape[1:])
+        np.add.at(summed, inverse, values)
+        matrix, targets = self.matrix(unique, source_year, target_year)
+
+        incoming = matrix.T.tocsr()
+        sources = np.diff(incoming.indptr)
+        first = incoming.indices[incoming.indptr[:-1].clip(max=max(incoming.nnz - 1, 0))]
+        kept = (sources == 1) & (unique[first] == targets) & np.isclose(incoming.max(axis=1).toarray().ravel(), 1)
+        return targets, incoming @ np.nan_to_num(summed), ~kept
+
+    def project_frame(self, df, columns, source_year, target_year):
+        """df's count columns, keyed by fips, in target_year's codes, with the remapped flag from project."""
+        targets, values, remapped = self.project(df["fips"], df[columns].to_numpy("float64"), source_year, target_year)
+        projected = pd.DataFrame(values, columns=columns)
+        projected.insert(0, "fips", targets.astype("int32"))
+        projected["remapped"] = remapped
+        return projected
+
+
+@lru_cache(maxsize=4)
+def load_crosswalk(path=COUNTY_CHANGES_CSV):
+    return Crosswalk(pd.read_csv(path, dtype={"old_fips": str, "new_fips": str}))
+
+
+def overlay_changes(source, target, effective, target_population=None, min_share=0.001):
+    """
+    Changes from source's counties to target's, derived from their boundaries.
+
+    source and target are GeoDataFrames with a fips column in the same equal-area projection. Each source
+    county is spread over the target counties it overlaps in proportion to the shared area or, given
+    target_population (indexed by target fips), to the target population in the shared area, assuming it is
+    spread evenly over each target county. Overlaps under min_share of a county are treated as boundary noise.
+    Counties that map whole onto the same code are left out, as unchanged.
+    """
+    source_geoms = source.geometry.to_numpy()
+    target_geoms = target.geometry.to_numpy()
+    tree = shapely.STRtree(target_geoms)
+    s, t = tree.query(source_geoms, predicate="intersects")
+    shared = shapely.area(shapely.intersection(source_geoms[s], target_geoms[t]))
+    if target_population is not None:
+        density = target_population.reindex(target["fips"]).to_numpy("float64") / shapely.area(target_geoms)
+        shared = shared * density[t]
+    pieces = pd.DataFrame(
+        {"old_fips": source["fips"].to_numpy()[s], "new_fips": target["fips"].to_numpy()[t], "weight": shared}
+    )
+    pieces["weight"] /= pieces.groupby("old_fips")["weight"].transform("sum")
+    pieces = pieces[pieces["weight"] >= min_share].copy()
+    pieces["weight"] /= pieces.groupby("old_fips")["weight"].transform("sum")
+
+    unchanged = pieces[(pieces["old_fips"] == pieces["new_fips"]) & np.isclose(pieces["weight"], 1)]["old_fips"]
+    pieces = pieces[~pieces["old_fips"].isin(unchanged)]
+    pieces.insert(2, "effective", effective)
+    return pieces.reset_index(drop=True)
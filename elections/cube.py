@@ -0,0 +1,251 @@
+"""
+Precomputed rollup of the county results over geography levels and years.
+
+Every county, state, Census region and the nation has a row, every election year a column, and each cell holds
+additive measures (votes by party, population, white non-Hispanic population, counties and the population of
+counties won by each party) plus the shares, margins and population-weighted percentages derived from them.
+The cube is built from the merged county file in one vectorized pass: each county's measures are added to its
+own, its state's, its region's and the national row with a single scatter-add. Lookups go through dict
+indexes into a dense array, so any cell, row or year slice costs the same whatever the size of the cube.
+
+Changing one county touches four rows: the difference between its new and old measures is added to the county,
+its state, its region and the nation, and only those cells' derived metrics are recomputed. The cube is saved
+as Parquet, one row per (level, geo, year), and rebuilt when the merged county file changes.
+
+    from elections.cube import load_cube
+    cube = load_cube()
+    cube.value("state", "PA", 2024, "margin")
+    cube.get("region", "Midwest", 2020)
+    cube.slice("county", year=2024, metrics=["margin", "votes_all"])
+    cube.update_county(42049, 2024, votes_dem=70000, votes_rep=72000, votes_all=144000)
+"""
+
+import numpy as np
+import pandas as pd
+
+from elections.data import COUNTY_RESULTS_JSON, PROCESSED_DIR, _is_stale, load_county_results
+from elections.regions import CENSUS_REGIONS, REGIONS
+from elections.schema import COUNTY_FIPS_WIDTH, STATE_PO
+
+CUBE_PATH = PROCESSED_DIR / "results_cube.parquet"
+
+LEVELS = ["county", "state", "region", "nation"]
+NATION = "US"
+
+# Summed up the hierarchy
+MEASURES = [
+    "votes_dem", "votes_rep", "votes_all", "population", "white_population",
+    "counties", "counties_dem", "counties_rep", "pop_dem_counties", "pop_rep_counties",
+]
+# Recomputed from the measures of the same cell
+DERIVED = [
+    "dem_pct", "rep_pct", "margin", "white_alone_pct",
+    "share_dem_counties", "share_rep_counties", "share_dem_population", "share_rep_population",
+]
+METRICS = MEASURES + DERIVED
+
+_INPUT_COLUMNS = ["state_po", "votes_dem", "votes_rep", "votes_all", "population", "white_alone_pct"]
+
+
+def county_measures(df):
+    """(rows, len(MEASURES)) additive measures of county result rows (a frame or dict of arrays); missing counts are zero."""
+    dem, rep, total, population, white_pct = (
+        np.nan_to_num(np.asarray(df[name], dtype="float64"))
+        for name in ["votes_dem", "votes_rep", "votes_all", "population", "white_alone_pct"]
+    )
+    # Counties are won on votes with ties going Democratic, as in 04_analyze_results.py, so the county and
+    # population shares agree with its metrics
+    won_rep = (rep > dem).astype("float64")
+    won_dem = 1 - won_rep
+    return np.column_stack(
+        [
+            dem, rep, total, population, population * white_pct / 100,
+            np.ones(len(dem)), won_dem, won_rep, population * won_dem, population * won_rep,
+        ]
+    )
+
+
+def derive(measures):
+    """DERIVED metrics (..., len(DERIVED)) from MEASURES (..., len(MEASURES)); undefined ratios are NaN."""
+    m = dict(zip(MEASURES, np.moveaxis(measures, -1, 0)))
+
+    def ratio(a, b, scale=1.0):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(b > 0, a / b * scale, np.nan)
+
+    dem_pct = ratio(m["votes_dem"], m["votes_all"], 100)
+    rep_pct = ratio(m["votes_rep"], m["votes_all"], 100)
+    return np.stack(
+        [
+            dem_pct,
+            rep_pct,
+            rep_pct - dem_pct,
+            ratio(m["white_population"], m["population"], 100),
+            ratio(m["counties_dem"], m["counties"]),
+            ratio(m["counties_rep"], m["counties"]),
+            ratio(m["pop_dem_counties"], m["population"]),
+            ratio(m["pop_rep_counties"], m["population"]),
+        ],
+        axis=-1,
+    )
+
+
+class ResultsCube:
+    """Dense (geo, year, metric) array with dict indexes for each axis."""
+
+    def __init__(self, levels, geos, years, values, county_parents):
+        self.levels = np.asarray(levels)
+        self.geos = list(geos)
+        self.years = [int(year) for year in years]
+        # values[row, year, metric], metrics in METRICS order
+        self.values = values
+        # county_parents[county row] = rows of its state, region and the nation
+        self.county_parents = county_parents
+        self.row = {(level, geo): i for i, (level, geo) in enumerate(zip(self.levels, self.geos))}
+        self.column = {year: j for j, year in enumerate(self.years)}
+        self.metric = {name: k for k, name in enumerate(METRICS)}
+        self.level_rows = {level: np.flatnonzero(self.levels == level) for level in LEVELS}
+
+    @classmethod
+    def build(cls, df=None):
+        """Build from county results (fips, year, state_po, votes, population, white_alone_pct)."""
+        if df is None:
+            df = load_county_results(columns=_INPUT_COLUMNS)
+        df = df[df["state_po"].notna()]
+
+        counties = np.unique(df["fips"].to_numpy())
+        states = [state for state in STATE_PO if state in set(df["state_po"].astype(str))]
+        levels = ["county"] * len(counties) + ["state"] * len(states) + ["region"] * len(REGIONS) + ["nation"]
+        geos = [int(fips) for fips in counties] + states + REGIONS + [NATION]
+        years = np.unique(df["year"].to_numpy())
+
+        # Row of each county, and of its state, region and the nation, by county row
+        county_row = np.searchsorted(counties, df["fips"].to_numpy())
+        state_of = df["state_po"].astype(str).to_numpy()
+        state_row = len(counties) + np.searchsorted(states, state_of)
+        region_row = len(counties) + len(states) + np.array([REGIONS.index(CENSUS_REGIONS[s]) for s in state_of], dtype=np.int64)
+        nation_row = np.full(len(df), len(geos) - 1)
+        year_col = np.searchsorted(years, df["year"].to_numpy())
+
+        # Every county result lands in four rows with one scatter-add
+        measures = county_measures(df)
+        cells = np.zeros((len(geos), len(years), len(MEASURES)))
+        np.add.at(
+            cells,
+            (np.concatenate([county_row, state_row, region_row, nation_row]), np.tile(year_col, 4)),
+            np.tile(measures, (4, 1)),
+        )
+        values = np.concatenate([cells, derive(cells)], axis=-1)
+
+        parents = np.zeros((len(counties), 3), dtype=np.int64)
+        parents[county_row] = np.column_stack([state_row, region_row, nation_row])
+        return cls(levels, geos, years, values, parents)
+
+    def _key(self, level, geo):
+        return (level, int(geo)) if level == "county" else (level, NATION if level == "nation" else str(geo))
+
+    def value(self, level, geo, year, metric):
+        return float(self.values[self.row[self._key(level, geo)], self.column[int(year)], self.metric[metric]])
+
+    def get(self, level, geo, year):
+        """Every metric of one cell, as a dict."""
+        cell = self.values[self.row[self._key(level, geo)], self.column[int(year)]]
+        return dict(zip(METRICS, cell.tolist()))
+
+    def slice(self, level, year=None, metrics=None):
+        """Frame of one level's rows (all years, or one), with geo, year and the requested metrics."""
+        rows = self.level_rows[level]
+        columns = [self.column[int(year)]] if year is not None else list(range(len(self.years)))
+        metrics = list(metrics) if metrics is not None else METRICS
+        block = self.values[np.ix_(rows, columns, [self.metric[name] for name in metrics])]
+        frame = pd.DataFrame(block.reshape(-1, len(metrics)), columns=metrics)
+        frame.insert(0, "year", np.tile(np.asarray(self.years, dtype="int32")[columns], len(rows)))
+        geos = [self.geos[i] for i in rows]
+        frame.insert(0, "geo", np.repeat(np.asarray(geos, dtype="int32" if level == "county" else object), len(columns)))
+        return frame
+
+    def update_county(self, fips, year, **fields):
+        """
+        Replace one county's results for a year and roll the change up to its state, region and the nation.
+
+        fields are any of votes_dem, votes_rep, votes_all, population and white_alone_pct; the rest keep their
+        current values. The county and year must already be in the cube.
+        """
+        row = self.row[("county", int(fips))]
+        col = self.column[int(year)]
+        old = self.values[row, col, : len(MEASURES)].copy()
+        current = dict(zip(MEASURES, old))
+        population = current["population"]
+        record = {
+            "votes_dem": current["votes_dem"],
+            "votes_rep": current["votes_rep"],
+            "votes_all": current["votes_all"],
+            "population": population,
+            "white_alone_pct": current["white_population"] / population * 100 if population else 0.0,
+        }
+        record.update(fields)
+        new = county_measures({name: [value] for name, value in record.items()})[0]
+
+        rows = np.concatenate([[row], self.county_parents[row]])
+        self.values[rows, col, : len(MEASURES)] += new - old
+        self.values[rows, col, len(MEASURES) :] = derive(self.values[rows, col, : len(MEASURES)])
+
+    def to_frame(self):
+        """Long table, one row per (level, geo, year), with exported geo labels (zero-padded county FIPS)."""
+        n_years = len(self.years)
+        labels = [str(geo).zfill(COUNTY_FIPS_WIDTH) if level == "county" else geo for level, geo in zip(self.levels, self.geos)]
+        # Each county's state is kept so a loaded cube knows where to roll updates up to
+        state_of = {row: geo for (level, geo), row in self.row.items() if level == "state"}
+        states = [None] * len(self.geos)
+        for i in self.level_rows["state"]:
+            states[i] = self.geos[i]
+        for i, parents in zip(self.level_rows["county"], self.county_parents):
+            states[i] = state_of[parents[0]]
+        frame = pd.DataFrame(self.values.reshape(-1, len(METRICS)), columns=METRICS)
+        frame.insert(0, "year", np.tile(np.asarray(self.years, dtype="int32"), len(self.geos)))
+        frame.insert(0, "state_po", np.repeat(np.asarray(states, dtype=object), n_years))
+        frame.insert(0, "geo", np.repeat(labels, n_years))
+        frame.insert(0, "level", pd.Categorical(np.repeat(self.levels, n_years), categories=LEVELS))
+        return frame
+
+    def save(self, path=CUBE_PATH):
+        self.to_frame().to_parquet(path, index=False)
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Inverse of to_frame; rows must be grouped by geo with the years in the same order for each."""
+        years = pd.unique(frame["year"])
+        keys = frame.iloc[:: len(years)]
+        levels = keys["level"].astype(str).to_numpy()
+        geos = [int(geo) if level == "county" else geo for level, geo in zip(levels, keys["geo"])]
+        values = frame[METRICS].to_numpy("float64").reshape(len(keys), len(years), len(METRICS))
+
+        row = {(level, geo): i for i, (level, geo) in enumerate(zip(levels, geos))}
+        county_states = keys["state_po"].to_numpy()[levels == "county"]
+        parents = np.array(
+            [[row[("state", s)], row[("region", CENSUS_REGIONS[s])], row[("nation", NATION)]] for s in county_states],
+            dtype=np.int64,
+        ).reshape(-1, 3)
+        return cls(levels, geos, years, values, parents)
+
+
+def build_cube(path=CUBE_PATH):
+    cube = ResultsCube.build()
+    cube.save(path)
+    return cube
+
+
+def load_cube(path=CUBE_PATH):
+    """Load the saved cube, rebuilding it if the merged county results are newer."""
+    if _is_stale(path, COUNTY_RESULTS_JSON):
+        return build_cube(path)
+    return ResultsCube.from_frame(pd.read_parquet(path))
+
+
+def main():
+    cube = build_cube()
+    print(f"Results cube saved to {CUBE_PATH}: {len(cube.geos)} geographies x {len(cube.years)} years x {len(METRICS)} metrics")
+
+
+if __name__ == "__main__":
+    main()
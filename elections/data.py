@@ -0,0 +1,184 @@
+"""
+Loaders for the processed county and state results.
+
+The JSON exports in data/processed stay the published format, but the scripts and notebooks
+read from year-partitioned Parquet copies so a request only touches the columns and rows it asks for.
+The Parquet stores are (re)built from the JSON on first use whenever they are missing or stale,
+and every distinct slice is memoized for the life of the process. Frames come back in the canonical
+schema from elections.schema (int32 FIPS and year, categorical labels, float32 shares).
+"""
+
+import gc
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+import us
+
+from elections.schema import STATE_PO, apply_schema
+
+DATA_DIR = Path(os.environ.get("ELECTIONS_DATA_DIR", "data"))
+PROCESSED_DIR = DATA_DIR / "processed"
+
+COUNTY_RESULTS_JSON = PROCESSED_DIR / "presidential_county_results_with_population.json"
+COUNTY_RESULTS_STORE = PROCESSED_DIR / "presidential_county_results_with_population.parquet"
+STATE_RESULTS_JSON = PROCESSED_DIR / "presidential_election_results_by_state.json"
+STATE_RESULTS_STORE = PROCESSED_DIR / "presidential_election_results_by_state.parquet"
+# Reference tables ship with the repository rather than the (relocatable) data directory
+REFERENCE_DIR = Path(__file__).resolve().parent.parent / "data" / "reference"
+ELECTORAL_VOTES_CSV = REFERENCE_DIR / "electoral_votes_by_census.csv"
+
+# States left off the CONUS maps
+NON_CONUS = ("AK", "HI")
+
+_state_fips_to_abbr = {int(fips): abbr for fips, abbr in us.states.mapping("fips", "abbr").items() if fips}
+_state_fips_to_abbr[11] = "DC"
+
+
+def state_results_schema(df):
+    """Canonical schema for the statewide results, with the postal code derived from the state FIPS."""
+    df = df.copy()
+    df["state_po"] = pd.to_numeric(df["fips"]).map(_state_fips_to_abbr)
+    return apply_schema(df)
+
+
+def write_county_store(df, path=COUNTY_RESULTS_STORE):
+    """Write county results as a Parquet dataset partitioned by year, sorted by state and FIPS."""
+    df = apply_schema(df).sort_values(["year", "state_po", "fips"])
+    df.to_parquet(
+        path,
+        partition_cols=["year"],
+        index=False,
+        existing_data_behavior="delete_matching",
+        row_group_size=512,
+    )
+    # Collect the writer's reference cycles now; left for shutdown, pyarrow can abort the interpreter
+    gc.collect()
+    _read_county_results.cache_clear()
+
+
+def write_state_store(df, path=STATE_RESULTS_STORE):
+    df = state_results_schema(df).sort_values(["year", "fips"])
+    df.to_parquet(path, index=False, row_group_size=512)
+    _read_state_results.cache_clear()
+
+
+def _is_stale(store, source):
+    if not Path(store).exists():
+        return True
+    return Path(source).exists() and Path(source).stat().st_mtime > Path(store).stat().st_mtime
+
+
+def _ensure_county_store():
+    if _is_stale(COUNTY_RESULTS_STORE, COUNTY_RESULTS_JSON):
+        write_county_store(pd.read_json(COUNTY_RESULTS_JSON, dtype={"fips": str}))
+
+
+def _ensure_state_store():
+    if _is_stale(STATE_RESULTS_STORE, STATE_RESULTS_JSON):
+        write_state_store(pd.read_json(STATE_RESULTS_JSON, dtype={"fips": str}))
+
+
+def _as_key(values, cast=str):
+    # Normalize list-like filters into a hashable, order-independent cache key
+    if values is None:
+        return None
+    if isinstance(values, (str, int)):
+        values = [values]
+    return tuple(sorted(cast(v) for v in values))
+
+
+def _filters(years, states, state_col):
+    filters = []
+    if years is not None:
+        filters.append(("year", "in", list(years)))
+    if states is not None:
+        filters.append((state_col, "in", list(states)))
+    return filters or None
+
+
+@lru_cache(maxsize=64)
+def _read_county_results(years, states, columns):
+    _ensure_county_store()
+    if columns is not None:
+        # Keys are always returned so slices can be joined back together
+        columns = list(dict.fromkeys(["fips", "year", *columns]))
+    table = pq.read_table(
+        COUNTY_RESULTS_STORE,
+        columns=columns,
+        filters=_filters(years, states, "state_po"),
+    )
+    # The partition key comes back as a category; apply_schema restores the int32 year
+    df = apply_schema(table.to_pandas())
+    return df.sort_values(["year", "fips"]).reset_index(drop=True)
+
+
+@lru_cache(maxsize=64)
+def _read_state_results(years, states, columns):
+    _ensure_state_store()
+    if columns is not None:
+        columns = list(dict.fromkeys(["fips", "year", *columns]))
+    table = pq.read_table(
+        STATE_RESULTS_STORE,
+        columns=columns,
+        filters=_filters(years, states, "state_po"),
+    )
+    return apply_schema(table.to_pandas()).reset_index(drop=True)
+
+
+def load_county_results(years=None, states=None, columns=None, conus=False):
+    """
+    County results with population, filtered at read time.
+
+    years: election years (str or int), states: postal codes, columns: fields besides fips/year.
+    conus=True drops Alaska and Hawaii, as the maps do.
+    """
+    years = _as_key(years, int)
+    states = _as_key(states)
+    if conus:
+        states = tuple(s for s in states or STATE_PO if s not in NON_CONUS)
+    columns = tuple(columns) if columns is not None else None
+    return _read_county_results(years, states, columns).copy()
+
+
+def load_state_results(years=None, states=None, columns=None):
+    """
+    Statewide results from the Leip scrape, with a state_po column added for filtering.
+
+    states accepts postal codes, e.g. ["PA", "WI"].
+    """
+    columns = tuple(columns) if columns is not None else None
+    return _read_state_results(_as_key(years, int), _as_key(states), columns).copy()
+
+
+def apportionment_census(year):
+    """Census whose House apportionment set the electoral votes for an election year."""
+    census = (int(year) - 2) // 10 * 10
+    # Congress never reapportioned after the 1920 census
+    return 1910 if census == 1920 else census
+
+
+@lru_cache(maxsize=1)
+def _read_electoral_votes():
+    return apply_schema(pd.read_csv(ELECTORAL_VOTES_CSV))
+
+
+def load_electoral_votes(years=None):
+    """
+    Electoral votes by state for each election year, from the bundled apportionment table.
+
+    Alaska and Hawaii are listed under the 1950 census with the 3 electors each cast in 1960,
+    so they are dropped for earlier elections. DC votes from 1964.
+    """
+    years = _as_key(years, int) if years is not None else range(1912, 2029, 4)
+    table = _read_electoral_votes()
+    frames = []
+    for year in years:
+        ev = table[table["census"] == apportionment_census(year)].copy()
+        if year < 1960:
+            ev = ev[~ev["state_po"].isin(["AK", "HI"])]
+        ev.insert(0, "year", year)
+        frames.append(ev)
+    return apply_schema(pd.concat(frames, ignore_index=True))
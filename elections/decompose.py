@@ -0,0 +1,210 @@
+"""
+Turnout-versus-share decomposition of each county's change in Democratic and Republican votes, election to election.
+
+A party's votes are total votes times its share, V = T * s, so between two elections
+
+    change in V = mean(s) * change in T  +  mean(T) * change in s
+                  (turnout)                 (share)
+
+with the means taken over the two years. The split is exact and symmetric (it doesn't depend on which year is
+the base). The turnout part is further split the same way into population growth and participation (votes
+per resident), T = P * r. Net components are Republican minus Democratic, so they add up to the change in the
+Republican vote lead: net share is the lead gained or lost from the change in margin at the two years' average
+turnout, and net turnout the lead gained or lost from more or fewer voters at the average margin.
+turnout_weight is the turnout part's share of both parties' gross change, and driver labels each county by
+whichever part is larger: "turnout" where turnout moved the votes, "share" where voters changed sides.
+
+Every year's counts are first carried into the latest year's county codes (elections.crosswalk), so the
+results form one county x year matrix per count, and every consecutive pair of years is decomposed in one
+array computation over its columns. County components roll up to states and the nation by summing.
+
+The county table is cached in data/processed/county_vote_decomposition.parquet and rebuilt when the merged
+county file changes; python -m elections.decompose also writes the state and national rollups to
+data/processed/vote_decomposition_rollups.json.
+
+    python -m elections.decompose
+    from elections.decompose import load_decomposition, rollup
+    counties = load_decomposition()
+    counties.query("year_to == 2024")[["fips", "net_turnout", "net_share", "driver"]]
+    rollup(counties)
+"""
+
+import numpy as np
+import pandas as pd
+
+from elections.crosswalk import load_crosswalk
+from elections.data import COUNTY_RESULTS_JSON, PROCESSED_DIR, _is_stale, load_county_results
+from elections.export import export_records
+from elections.schema import STATE_PO, export_frame
+
+DECOMPOSITION_PATH = PROCESSED_DIR / "county_vote_decomposition.parquet"
+ROLLUPS_JSON = PROCESSED_DIR / "vote_decomposition_rollups.json"
+
+COUNTS = ["votes_dem", "votes_rep", "votes_all", "population"]
+# Additive components, in votes; rolled up by summing
+COMPONENTS = [
+    "dem_change", "dem_turnout", "dem_share",
+    "rep_change", "rep_turnout", "rep_share",
+    "net_change", "net_turnout", "net_share",
+    "turnout_change", "turnout_population", "turnout_participation",
+]
+DRIVERS = ["turnout", "share"]
+NATION = "US"
+
+
+def county_matrices(df, target_year=None):
+    """
+    (counties, years) matrices of COUNTS in target_year's county codes (the latest year by default).
+
+    Returns the county codes, the years and a dict of matrices; a count a county has no result for is NaN.
+    """
+    years = np.sort(df["year"].unique())
+    target_year = int(years[-1]) if target_year is None else target_year
+    crosswalk = load_crosswalk()
+    projected = []
+    for year in years:
+        rows = df[df["year"] == year]
+        counts = rows[COUNTS].to_numpy("float64")
+        # Projected alongside the counts so a county without a count stays NaN rather than zero
+        present = (~np.isnan(counts)).astype("float64")
+        codes, values, _ = crosswalk.project(rows["fips"], np.hstack([counts, present]), int(year), target_year)
+        projected.append((codes, values))
+
+    fips = np.unique(np.concatenate([codes for codes, _ in projected]))
+    stacked = np.full((len(fips), len(years), 2 * len(COUNTS)), np.nan)
+    for col, (codes, values) in enumerate(projected):
+        stacked[np.searchsorted(fips, codes), col] = values
+    counts, present = stacked[..., : len(COUNTS)], stacked[..., len(COUNTS) :]
+    counts = np.where(present > 0, counts, np.nan)
+    return fips.astype(np.int32), years.astype(np.int32), dict(zip(COUNTS, np.moveaxis(counts, -1, 0)))
+
+
+def decompose_matrices(matrices):
+    """
+    COMPONENTS for every consecutive pair of years, each a (counties, years - 1) array, from county_matrices.
+    """
+    dem, rep, total, population = (matrices[name] for name in COUNTS)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dem_share = np.where(total > 0, dem / total, np.nan)
+        rep_share = np.where(total > 0, rep / total, np.nan)
+        participation = np.where(population > 0, total / population, np.nan)
+
+    def change(m):
+        return m[:, 1:] - m[:, :-1]
+
+    def split(a, b):
+        """Exact split of the change in a * b: (mean(b) * change in a, mean(a) * change in b)."""
+        return (b[:, :-1] + b[:, 1:]) / 2 * change(a), (a[:, :-1] + a[:, 1:]) / 2 * change(b)
+
+    dem_turnout, dem_by_share = split(total, dem_share)
+    rep_turnout, rep_by_share = split(total, rep_share)
+    turnout_population, turnout_participation = split(population, participation)
+    return {
+        "dem_change": change(dem),
+        "dem_turnout": dem_turnout,
+        "dem_share": dem_by_share,
+        "rep_change": change(rep),
+        "rep_turnout": rep_turnout,
+        "rep_share": rep_by_share,
+        "net_change": change(rep - dem),
+        "net_turnout": rep_turnout - dem_turnout,
+        "net_share": rep_by_share - dem_by_share,
+        "turnout_change": change(total),
+        "turnout_population": turnout_population,
+        "turnout_participation": turnout_participation,
+    }
+
+
+def _with_shares(table):
+    """Adds turnout_weight and driver from the party components."""
+    turnout = table["dem_turnout"].abs() + table["rep_turnout"].abs()
+    share = table["dem_share"].abs() + table["rep_share"].abs()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        table["turnout_weight"] = np.where(turnout + share > 0, turnout / (turnout + share), np.nan)
+    weight = table["turnout_weight"]
+    driver = np.where(weight.isna(), None, np.where(weight > 0.5, "turnout", "share"))
+    table["driver"] = pd.Categorical(driver, categories=DRIVERS)
+    return table
+
+
+def decompose(df=None):
+    """
+    One row per county and consecutive pair of years it has results for: fips (in the latest year's codes),
+    state_po, year_from, year_to, COMPONENTS (in votes), turnout_weight and driver.
+    """
+    if df is None:
+        df = load_county_results(columns=["state_po"] + COUNTS)
+    fips, years, matrices = county_matrices(df)
+    components = decompose_matrices(matrices)
+
+    # A county's state from its code's state FIPS, as listed in the results
+    state_of = pd.Series(df["state_po"].astype(str).to_numpy(), index=df["fips"].to_numpy() // 1000)
+    state_of = state_of[~state_of.index.duplicated()]
+    n_pairs = len(years) - 1
+    table = pd.DataFrame(
+        {
+            "fips": np.repeat(fips, n_pairs),
+            "state_po": pd.Categorical(
+                np.repeat(state_of.reindex(fips // 1000).to_numpy(), n_pairs), categories=STATE_PO
+            ),
+            "year_from": np.tile(years[:-1], len(fips)),
+            "year_to": np.tile(years[1:], len(fips)),
+            **{name: components[name].ravel() for name in COMPONENTS},
+        }
+    )
+    table = table[table["dem_change"].notna() & table["rep_change"].notna()].reset_index(drop=True)
+    return _with_shares(table)
+
+
+def rollup(counties):
+    """
+    COMPONENTS summed over each state's counties and the nation's, per pair of years: geography (state postal
+    code or US), year_from, year_to, COMPONENTS, counties, turnout_weight and driver. Population terms sum the
+    counties that have population in both years.
+    """
+    pairs = counties[["year_from", "year_to"]].drop_duplicates().sort_values("year_from").to_numpy()
+    pair_index = np.searchsorted(pairs[:, 0], counties["year_from"].to_numpy())
+    state_index = counties["state_po"].cat.codes.to_numpy()
+    geos = list(STATE_PO) + [NATION]
+
+    sums = np.zeros((len(geos), len(pairs), len(COMPONENTS) + 1))
+    values = np.column_stack([np.nan_to_num(counties[COMPONENTS].to_numpy("float64")), np.ones(len(counties))])
+    known = state_index >= 0
+    np.add.at(sums, (state_index[known], pair_index[known]), values[known])
+    np.add.at(sums[-1], pair_index, values)
+
+    table = pd.DataFrame(sums.reshape(-1, sums.shape[-1]), columns=COMPONENTS + ["counties"])
+    table.insert(0, "year_to", np.tile(pairs[:, 1], len(geos)).astype("int32"))
+    table.insert(0, "year_from", np.tile(pairs[:, 0], len(geos)).astype("int32"))
+    table.insert(0, "geography", np.repeat(geos, len(pairs)))
+    table["counties"] = table["counties"].astype("int32")
+    table = table[table["counties"] > 0].reset_index(drop=True)
+    return _with_shares(table)
+
+
+def build_decomposition(path=DECOMPOSITION_PATH):
+    table = decompose()
+    table.to_parquet(path, index=False)
+    return table
+
+
+def load_decomposition(path=DECOMPOSITION_PATH):
+    """The county table, rebuilt first if the merged county results are newer."""
+    if _is_stale(path, COUNTY_RESULTS_JSON):
+        return build_decomposition(path)
+    return pd.read_parquet(path)
+
+
+def main():
+    counties = build_decomposition()
+    rollups = rollup(counties)
+    # Components to whole votes
+    export_records(export_frame(rollups).round({**dict.fromkeys(COMPONENTS, 0), "turnout_weight": 4}), ROLLUPS_JSON)
+    print(f"{len(counties):,} county changes saved to {DECOMPOSITION_PATH}, state and national rollups to {ROLLUPS_JSON}")
+    national = rollups[rollups["geography"] == NATION].set_index(["year_from", "year_to"])
+    print((national[["net_change", "net_turnout", "net_share", "turnout_change"]] / 1000).round(1).to_string())
+    print("(thousands of votes; net is Republican minus Democratic)")
+
+
+if __name__ == "__main__":
+    main()
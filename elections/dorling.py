@@ -0,0 +1,113 @@
+"""
+Dorling layout for the proportional symbol maps: nudge circles apart until none overlap.
+
+Circles start at their centroids. Each iteration finds every overlapping pair with a KD-tree query, pushes each
+pair apart along the line between their centers (the smaller circle moves further), and, for the first few
+iterations, pulls circles that overlap nothing back toward their centroids. All pairs are resolved in one
+vectorized step, so the 3,100 county circles settle in about a tenth of a second.
+
+Scatter markers are sized in points, so the maps convert their radii to data units with points_to_data before
+laying them out. Layouts are cached per map, year and radius scale under data/processed/layouts and reused until
+the circles they were computed from change.
+
+    from elections.dorling import cached_layout, points_to_data
+    radii = np.sqrt(sizes) / 2 * points_to_data(ax)
+    x, y = cached_layout("county_symbols", year, centroids.x, centroids.y, radii, scale=max_radius)
+    ax.scatter(x, y, s=sizes)
+"""
+
+import os
+import tempfile
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from elections.data import PROCESSED_DIR
+from elections.render_cache import fingerprint
+
+LAYOUT_DIR = PROCESSED_DIR / "layouts"
+
+
+def dorling_layout(x, y, radii, padding=0.0, attraction=0.1, settle=50, max_iter=500, tol=1e-3):
+    """
+    Positions for circles of the given radii, near (x, y), that do not overlap.
+
+    padding is extra space kept between circles, attraction the share of the distance back to its centroid a
+    free circle moves per iteration. The pull fades to nothing over the first settle iterations; left on, it
+    drags circles back into their neighbors and the layout never settles. Stops once no pair overlaps by more
+    than tol times the mean radius, or after max_iter iterations. Returns the new x and y arrays.
+    """
+    origin = np.column_stack([np.asarray(x, dtype="float64"), np.asarray(y, dtype="float64")])
+    radii = np.asarray(radii, dtype="float64")
+    pos = origin.copy()
+    n = len(pos)
+    if n < 2:
+        return pos[:, 0], pos[:, 1]
+    reach = 2 * radii.max() + padding
+    slack = tol * radii.mean()
+    area = radii**2
+    # Circles stacked on one centroid need a direction to separate in; fixed so layouts are reproducible
+    jitter = np.random.default_rng(0).standard_normal((n, 2)) * slack
+
+    for iteration in range(max_iter):
+        pairs = cKDTree(pos).query_pairs(reach, output_type="ndarray")
+        i, j = pairs[:, 0], pairs[:, 1]
+        delta = pos[j] - pos[i]
+        dist = np.hypot(delta[:, 0], delta[:, 1])
+        overlap = radii[i] + radii[j] + padding - dist
+        hit = overlap > slack
+        if not hit.any():
+            break
+        i, j, delta, dist, overlap = i[hit], j[hit], delta[hit], dist[hit], overlap[hit]
+        stacked = dist == 0
+        delta[stacked] = jitter[j[stacked]] - jitter[i[stacked]]
+        dist[stacked] = np.hypot(delta[stacked, 0], delta[stacked, 1])
+        unit = delta / dist[:, None]
+
+        # Each circle of a pair moves by the other's share of their combined area
+        share_i = area[j] / (area[i] + area[j])
+        push_i = unit * (overlap * share_i)[:, None]
+        push_j = unit * (overlap * (1 - share_i))[:, None]
+        move = np.empty_like(pos)
+        for axis in range(2):
+            move[:, axis] = np.bincount(j, push_j[:, axis], minlength=n) - np.bincount(i, push_i[:, axis], minlength=n)
+
+        free = np.ones(n, dtype=bool)
+        free[i] = free[j] = False
+        pos += move
+        pull = attraction * max(0.0, 1 - iteration / settle)
+        pos[free] += pull * (origin[free] - pos[free])
+
+    return pos[:, 0], pos[:, 1]
+
+
+def points_to_data(ax):
+    """Data units per typographic point on ax, for sizing scatter markers (whose s is in points squared)."""
+    ax.apply_aspect()
+    bbox = ax.get_window_extent()
+    (x0, x1), (y0, y1) = ax.get_xlim(), ax.get_ylim()
+    per_pixel = max(abs(x1 - x0) / bbox.width, abs(y1 - y0) / bbox.height)
+    return per_pixel * ax.figure.dpi / 72
+
+
+def cached_layout(name, year, x, y, radii, scale, directory=LAYOUT_DIR, **options):
+    """
+    dorling_layout for one map and year, cached by radius scale (the map's maximum symbol size).
+
+    The cached layout is reused while the centroids, radii and options match those it was computed from.
+    """
+    x, y, radii = (np.asarray(values, dtype="float64") for values in (x, y, radii))
+    key = fingerprint(x, y, radii, options)
+    path = directory / f"{name}_{year}_r{scale:g}.npz"
+    if path.exists():
+        with np.load(path) as cached:
+            if str(cached["key"]) == key:
+                return cached["x"], cached["y"]
+
+    new_x, new_y = dorling_layout(x, y, radii, **options)
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".npz")
+    with os.fdopen(fd, "wb") as f:
+        np.savez(f, key=key, x=new_x, y=new_y)
+    os.replace(tmp, path)
+    return new_x, new_y
@@ -0,0 +1,160 @@
+"""
+Dot-density points for the county vote maps: one dot per N votes for each party, placed at random in the county.
+
+Every county polygon is cut into triangles (a constrained Delaunay triangulation, so concave counties and holes
+are respected). Each dot picks a triangle with probability proportional to its area, then a uniform point inside
+it, so the sampling needs no rejection loop and runs as a handful of array operations over all counties at once.
+Counties are split into chunks that can be sampled in separate processes. Points are cached per year under
+data/processed/dots and reused until the geometries, vote counts or votes per dot change.
+
+The maps draw the dots by binning them straight into an RGBA raster (rasterize) and showing it with imshow,
+rather than handing millions of markers to scatter.
+
+    from elections.dots import cached_dots, rasterize
+    x, y, party = cached_dots(year, counties.geometry, counties["votes_dem"], counties["votes_rep"], 100)
+    image = rasterize(x, y, party, extent, width, height, colors=[dem_rgb, rep_rgb])
+    ax.imshow(image, extent=extent, interpolation="nearest")
+"""
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import shapely
+
+from elections.data import PROCESSED_DIR
+from elections.render_cache import fingerprint
+
+DOTS_DIR = PROCESSED_DIR / "dots"
+
+# Party codes in the party array
+DEM, REP = 0, 1
+
+
+def _triangulate(geometries):
+    """Triangle corners (T, 3, 2), the index of the geometry each triangle covers and the triangle areas."""
+    triangles, owner = shapely.get_parts(shapely.constrained_delaunay_triangles(geometries), return_index=True)
+    # Each triangle's exterior ring holds its three corners plus the closing point
+    corners = shapely.get_coordinates(shapely.get_exterior_ring(triangles)).reshape(-1, 4, 2)[:, :3]
+    ab = corners[:, 1] - corners[:, 0]
+    ac = corners[:, 2] - corners[:, 0]
+    area = np.abs(ab[:, 0] * ac[:, 1] - ab[:, 1] * ac[:, 0]) / 2
+    return corners, owner, area
+
+
+def sample_points(geometries, counts, seed=0):
+    """
+    counts[i] points drawn uniformly inside geometries[i], for every i at once.
+
+    Returns x, y and the index of the geometry each point belongs to. Geometries with no area get no points.
+    """
+    geometries = np.asarray(geometries, dtype=object)
+    counts = np.asarray(counts, dtype=np.int64)
+    n = len(geometries)
+    corners, owner, area = _triangulate(geometries)
+    total = np.bincount(owner, area, minlength=n)
+    counts = np.where(total > 0, counts, 0)
+
+    # Each triangle's key is its geometry's index plus the cumulative area share up to and including it,
+    # so one searchsorted over all counties maps (index + uniform draw) to a triangle of that county
+    cumulative = np.cumsum(area)
+    starts = np.searchsorted(owner, np.arange(n))
+    before = np.concatenate([[0.0], cumulative])[starts]
+    share = (cumulative - before[owner]) / np.where(total > 0, total, 1)[owner]
+    last = np.r_[owner[1:] != owner[:-1], True]
+    share[last] = 1.0
+    keys = owner + share
+
+    rng = np.random.default_rng(seed)
+    index = np.repeat(np.arange(n), counts)
+    triangle = np.searchsorted(keys, index + rng.random(len(index)), side="right")
+    triangle = np.minimum(triangle, len(keys) - 1)
+
+    # Uniform point in a triangle: reflect draws that land in the far half of the parallelogram
+    r = rng.random((len(index), 2))
+    flip = r.sum(axis=1) > 1
+    r[flip] = 1 - r[flip]
+    a = corners[triangle, 0]
+    points = a + r[:, :1] * (corners[triangle, 1] - a) + r[:, 1:] * (corners[triangle, 2] - a)
+    return points[:, 0], points[:, 1], index
+
+
+def _sample_chunk(args):
+    geometries, dem, rep, seed = args
+    x, y, index = sample_points(np.concatenate([geometries, geometries]), np.concatenate([dem, rep]), seed)
+    party = (index >= len(geometries)).astype(np.uint8)
+    return x.astype(np.float32), y.astype(np.float32), party
+
+
+def dot_density(geometries, votes_dem, votes_rep, votes_per_dot, processes=None, chunk_size=500, seed=0):
+    """
+    One dot per votes_per_dot votes for each party, inside its county.
+
+    Vote counts are rounded to the nearest whole dot. Counties are sampled in chunks of chunk_size, spread over
+    processes when more than one is given. Returns float32 x and y and a uint8 party code (DEM or REP) per dot.
+    """
+    geometries = np.asarray(geometries, dtype=object)
+    dem = np.rint(np.asarray(votes_dem, dtype="float64") / votes_per_dot).astype(np.int64)
+    rep = np.rint(np.asarray(votes_rep, dtype="float64") / votes_per_dot).astype(np.int64)
+
+    bounds = range(0, len(geometries), chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(bounds))
+    jobs = [(geometries[i : i + chunk_size], dem[i : i + chunk_size], rep[i : i + chunk_size], s) for i, s in zip(bounds, seeds)]
+
+    if processes and processes > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            chunks = list(pool.map(_sample_chunk, jobs))
+    else:
+        chunks = [_sample_chunk(job) for job in jobs]
+    if not chunks:
+        return np.empty(0, np.float32), np.empty(0, np.float32), np.empty(0, np.uint8)
+    x, y, party = (np.concatenate(parts) for parts in zip(*chunks))
+    return x, y, party
+
+
+def cached_dots(year, geometries, votes_dem, votes_rep, votes_per_dot, directory=DOTS_DIR, processes=None, **options):
+    """
+    dot_density for one year, cached by votes per dot.
+
+    The cached points are reused while the geometries, vote counts and options (chunk_size, seed) match those
+    they were drawn from. processes isn't part of the key: each chunk has its own seed, so the points don't
+    depend on how many processes drew them.
+    """
+    votes_dem, votes_rep = (np.asarray(votes, dtype="float64") for votes in (votes_dem, votes_rep))
+    wkb = shapely.to_wkb(np.asarray(geometries, dtype=object))
+    lengths = np.array([len(b) for b in wkb], dtype=np.int64)
+    key = fingerprint(b"".join(wkb), lengths, votes_dem, votes_rep, options)
+    path = directory / f"county_dots_{year}_{votes_per_dot:g}.npz"
+    if path.exists():
+        with np.load(path) as cached:
+            if str(cached["key"]) == key:
+                return cached["x"], cached["y"], cached["party"]
+
+    x, y, party = dot_density(geometries, votes_dem, votes_rep, votes_per_dot, processes=processes, **options)
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".npz")
+    with os.fdopen(fd, "wb") as f:
+        np.savez(f, key=key, x=x, y=y, party=party)
+    os.replace(tmp, path)
+    return x, y, party
+
+
+def rasterize(x, y, party, extent, width, height, colors, opacity=0.7):
+    """
+    RGBA image (height, width, 4) of the dots, binned to pixels over extent (xmin, xmax, ymin, ymax).
+
+    colors are the RGB triples (0-1) for DEM and REP. A pixel takes the mix of its dots' colors, and each dot
+    adds opacity the way overlapping translucent markers would. Dots outside extent are dropped.
+    """
+    xmin, xmax, ymin, ymax = extent
+    col = np.floor((np.asarray(x, dtype="float64") - xmin) / (xmax - xmin) * width).astype(np.int64)
+    row = np.floor((ymax - np.asarray(y, dtype="float64")) / (ymax - ymin) * height).astype(np.int64)
+    inside = (col >= 0) & (col < width) & (row >= 0) & (row < height)
+    cell = (row[inside] * width + col[inside]) * 2 + np.asarray(party)[inside]
+    counts = np.bincount(cell, minlength=width * height * 2).reshape(height, width, 2).astype(np.float32)
+
+    dots = counts.sum(axis=2, keepdims=True)
+    mix = counts @ np.asarray(colors, dtype=np.float32) / np.maximum(dots, 1)
+    alpha = 1 - (1 - opacity) ** dots
+    return np.concatenate([mix, alpha], axis=2)
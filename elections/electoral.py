@@ -0,0 +1,131 @@
+"""
+Electoral college totals for every election in the state results, 1924-2024.
+
+Each state's result is joined to the electoral votes from the bundled apportionment table, the statewide
+plurality winner takes all of the state's electors, and the national popular vote and electoral vote are
+rolled up per year in one grouped pass. Electors are allocated by statewide plurality, so faithless
+electors, unpledged slates and Maine's and Nebraska's district electors are not reflected.
+
+The state and national tables are cached as Parquet and rebuilt when the state results or the
+apportionment table change.
+
+    python -m elections.electoral
+"""
+
+import numpy as np
+import pandas as pd
+
+from elections.data import (
+    ELECTORAL_VOTES_CSV,
+    PROCESSED_DIR,
+    STATE_RESULTS_JSON,
+    _is_stale,
+    load_electoral_votes,
+    load_state_results,
+)
+from elections.export import export_records
+from elections.schema import STATE_FIPS_WIDTH, WINNER_DTYPE, export_frame
+
+FIRST_YEAR = 1924
+
+STATE_TABLE = PROCESSED_DIR / "electoral_college_by_state.parquet"
+NATIONAL_TABLE = PROCESSED_DIR / "electoral_college_by_year.parquet"
+
+STATE_COLUMNS = [
+    "year", "fips", "state_po", "state_name", "electoral_votes",
+    "total_votes", "dem_votes", "rep_votes", "ind_votes", "dem_pct", "rep_pct", "ind_pct",
+    "winner", "winner_votes", "margin", "national_margin", "relative_margin",
+    "dem_ev", "rep_ev", "other_ev",
+]
+
+
+def compute_electoral_college(results, electoral_votes):
+    """
+    Return (states, national) frames from state results and per-year electoral votes.
+
+    margin is Republican minus Democratic share in points; relative_margin is the state's margin minus the
+    national popular-vote margin, positive where the state leaned more Republican than the country.
+    """
+    states = results.merge(
+        electoral_votes[["year", "state_po", "electoral_votes"]], on=["year", "state_po"], how="inner"
+    )
+
+    votes = states[["dem_votes", "rep_votes", "ind_votes"]].to_numpy()
+    top = votes.max(axis=1)
+    # A tie for first place leaves the state's electors unassigned
+    tied = (votes == top[:, None]).sum(axis=1) > 1
+    states["winner"] = pd.Categorical(
+        np.where(tied, "tie", np.array(["dem", "rep", "other"])[votes.argmax(axis=1)]), dtype=WINNER_DTYPE
+    )
+    states["winner_votes"] = np.where(tied, 0, top)
+    states["margin"] = (states["rep_pct"] - states["dem_pct"]).round(2).astype("float32")
+
+    for party in ["dem", "rep", "other"]:
+        states[f"{party}_ev"] = np.where(states["winner"] == party, states["electoral_votes"], 0)
+
+    national = (
+        states.groupby("year", as_index=False)
+        .agg(
+            total_votes=("total_votes", "sum"),
+            dem_votes=("dem_votes", "sum"),
+            rep_votes=("rep_votes", "sum"),
+            ind_votes=("ind_votes", "sum"),
+            electoral_votes=("electoral_votes", "sum"),
+            dem_ev=("dem_ev", "sum"),
+            rep_ev=("rep_ev", "sum"),
+            other_ev=("other_ev", "sum"),
+        )
+    )
+    for party in ["dem", "rep", "ind"]:
+        national[f"{party}_pct"] = (national[f"{party}_votes"] / national["total_votes"] * 100).round(2).astype("float32")
+    national["margin"] = (national["rep_pct"] - national["dem_pct"]).round(2).astype("float32")
+
+    popular_winner = np.where(national["rep_votes"] > national["dem_votes"], "rep", "dem")
+    majority = national["electoral_votes"] // 2 + 1
+    ec_winner = np.select([national["rep_ev"] >= majority, national["dem_ev"] >= majority], ["rep", "dem"], "none")
+    national["popular_winner"] = pd.Categorical(popular_winner, dtype=WINNER_DTYPE)
+    national["ec_winner"] = pd.Categorical(ec_winner, categories=["dem", "rep", "none"])
+    national["split"] = ec_winner != popular_winner
+
+    states = states.merge(
+        national[["year", "margin"]].rename(columns={"margin": "national_margin"}), on="year"
+    )
+    states["relative_margin"] = (states["margin"] - states["national_margin"]).round(2).astype("float32")
+
+    return (
+        states[STATE_COLUMNS].sort_values(["year", "fips"]).reset_index(drop=True),
+        national.sort_values("year").reset_index(drop=True),
+    )
+
+
+def build_electoral_college():
+    results = load_state_results()
+    results = results[(results["year"] >= FIRST_YEAR) & (results["year"] != 1970)]
+    electoral_votes = load_electoral_votes(years=sorted(results["year"].unique()))
+    states, national = compute_electoral_college(results, electoral_votes)
+    states.to_parquet(STATE_TABLE, index=False)
+    national.to_parquet(NATIONAL_TABLE, index=False)
+    return states, national
+
+
+def load_electoral_college(level="state"):
+    """Cached electoral college table at the "state" or "national" level."""
+    path = {"state": STATE_TABLE, "national": NATIONAL_TABLE}[level]
+    if any(_is_stale(path, source) for source in [STATE_RESULTS_JSON, ELECTORAL_VOTES_CSV]):
+        states, national = build_electoral_college()
+        return states if level == "state" else national
+    return pd.read_parquet(path)
+
+
+def main():
+    states, national = build_electoral_college()
+    export_records(export_frame(states, fips_width=STATE_FIPS_WIDTH), PROCESSED_DIR / "electoral_college_by_state.json")
+    export_records(export_frame(national), PROCESSED_DIR / "electoral_college_by_year.json")
+    print(
+        export_frame(national)[["year", "dem_ev", "rep_ev", "other_ev", "margin", "popular_winner", "ec_winner"]]
+        .to_string(index=False)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Writers for the processed JSON outputs, in the published layout and in smaller variants for web consumers.
+
+The published layout (a JSON array of records, indented four spaces) stays the default, byte for byte what
+to_json(orient="records", indent=4) wrote before. ELECTIONS_EXPORT (or the formats argument) adds variants
+beside it, all serialized by pandas' C encoder rather than json.dumps over Python dicts:
+
+    compact   path.min.json       the same records without indentation
+    ndjson    path.ndjson         one record per line, so a consumer can parse row by row
+    columns   path.columns.json   {"fips": [...], "year": [...], ...}: each key stored once
+    gz, br    path.*.gz/.br       gzip and brotli copies of every layout written (brotli needs the export extra)
+
+    ELECTIONS_EXPORT=ndjson,columns,gz,br python 00_process_results.py
+"""
+
+import gzip
+import json
+import os
+from pathlib import Path
+
+LAYOUTS = ("json", "compact", "ndjson", "columns")
+COMPRESSIONS = ("gz", "br")
+
+SUFFIXES = {"json": ".json", "compact": ".min.json", "ndjson": ".ndjson", "columns": ".columns.json"}
+
+
+def export_formats(value=None):
+    """Layouts and compressions requested by value (comma-separated) or ELECTIONS_EXPORT; json is always written."""
+    if value is None:
+        value = os.environ.get("ELECTIONS_EXPORT", "")
+    tokens = [token.strip() for token in value.split(",") if token.strip()]
+    unknown = [token for token in tokens if token not in LAYOUTS + COMPRESSIONS]
+    if unknown:
+        raise ValueError(f"unknown export format(s): {', '.join(unknown)}; choose from {', '.join(LAYOUTS + COMPRESSIONS)}")
+    layouts = ["json"] + [token for token in LAYOUTS[1:] if token in tokens]
+    compressions = [token for token in COMPRESSIONS if token in tokens]
+    return layouts, compressions
+
+
+def serialize(df, layout="json"):
+    """df as text in one of LAYOUTS."""
+    if layout == "json":
+        return df.to_json(orient="records", indent=4)
+    if layout == "compact":
+        return df.to_json(orient="records")
+    if layout == "ndjson":
+        return df.to_json(orient="records", lines=True)
+    if layout == "columns":
+        return "{" + ",".join(f"{json.dumps(str(col))}:{df[col].to_json(orient='values')}" for col in df.columns) + "}"
+    raise ValueError(f"unknown layout {layout!r}")
+
+
+def compress(data, method):
+    if method == "gz":
+        # mtime=0 keeps the output identical across runs
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if method == "br":
+        import brotli
+
+        return brotli.compress(data, quality=11)
+    raise ValueError(f"unknown compression {method!r}")
+
+
+def export_records(df, path, formats=None):
+    """
+    Write df as a JSON array of records to path, plus the variants in formats (see export_formats).
+
+    Returns the paths written.
+    """
+    path = Path(path)
+    stem = path.with_suffix("")
+    layouts, compressions = export_formats(formats)
+    written = []
+    for layout in layouts:
+        target = path if layout == "json" else stem.with_name(stem.name + SUFFIXES[layout])
+        data = serialize(df, layout).encode()
+        target.write_bytes(data)
+        written.append(target)
+        for method in compressions:
+            packed = target.with_name(f"{target.name}.{method}")
+            packed.write_bytes(compress(data, method))
+            written.append(packed)
+    return written
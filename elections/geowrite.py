@@ -0,0 +1,192 @@
+"""
+Output writers for the map scripts: vectorized GeoJSON, GeoParquet and PNG, atomic, in background threads.
+
+GeoJSON is assembled from two vectorized encoders instead of GDAL's feature-by-feature writer: shapely.to_geojson
+serializes every geometry in one call and pandas' C encoder serializes the property columns, and the features
+are joined as strings. The layout matches what to_file(driver="GeoJSON") writes (a named FeatureCollection with
+the CRS as an OGC URN unless it is WGS 84); property floats carry 15 significant digits rather than GDAL's 17.
+GeoParquet goes through pyarrow.
+
+BackgroundWriter overlaps a render loop with its I/O. The figure is drawn in the calling thread, since
+matplotlib isn't thread-safe, and handed over as an RGBA array. Pillow's PNG encoder and the file writes run in
+a small thread pool and release the GIL, so the next year's map draws while this year's files are written.
+At most max_pending writes are queued; submitting more blocks until one finishes, so memory stays bounded.
+Every file is written to a temporary file beside its target and renamed into place, so a reader or an
+interrupted run never sees a partial file.
+
+    with BackgroundWriter() as writer:
+        for year in years:
+            ...
+            png = writer.savefig(fig, map_path, bbox_inches="tight")
+            geo = writer.write_geojson(gdf, geojson_path)
+            writer.on_done(cache.record, [png, geo], key, map_path, geojson_path)
+"""
+
+import io
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+import shapely
+
+
+def atomic_write(path, write):
+    """Call write(file) on a temporary file beside path, then rename it to path."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _crs_member(crs, name):
+    header = {"type": "FeatureCollection", "name": name}
+    if crs is not None and crs.to_epsg() not in (None, 4326):
+        header["crs"] = {"type": "name", "properties": {"name": f"urn:ogc:def:crs:EPSG::{crs.to_epsg()}"}}
+    return header
+
+
+def geojson_bytes(gdf, name="features"):
+    """gdf as a GeoJSON FeatureCollection, encoded."""
+    geometries = shapely.to_geojson(gdf.geometry.to_numpy())
+    properties = gdf.drop(columns=gdf.geometry.name)
+    if len(properties.columns):
+        rows = properties.to_json(orient="records", lines=True, double_precision=15).splitlines()
+    else:
+        rows = ["{}"] * len(gdf)
+    features = ",\n".join(
+        f'{{"type":"Feature","properties":{row},"geometry":{"null" if geometry is None else geometry}}}'
+        for row, geometry in zip(rows, geometries)
+    )
+    header = json.dumps(_crs_member(gdf.crs, name))[:-1]
+    return f'{header},\n"features":[\n{features}\n]\n}}\n'.encode()
+
+
+def write_geojson(gdf, path):
+    atomic_write(path, lambda f: f.write(geojson_bytes(gdf, Path(path).stem)))
+
+
+def write_geoparquet(gdf, path):
+    atomic_write(path, lambda f: gdf.to_parquet(f, index=False))
+
+
+class _Capture(io.BytesIO):
+    """Target for savefig(format="raw") that keeps the renderer's (height, width, 4) buffer as an array."""
+
+    rgba = None
+
+    def write(self, data):
+        self.rgba = np.array(data, copy=True)
+        return self.rgba.nbytes
+
+
+def render_rgba(fig, **savefig_kwargs):
+    """fig drawn as savefig would draw it (tight bbox, dpi, facecolor), as a (height, width, 4) uint8 array."""
+    capture = _Capture()
+    fig.savefig(capture, format="raw", **savefig_kwargs)
+    return capture.rgba
+
+
+def write_png(rgba, path, dpi=None, metadata=None):
+    from PIL import Image
+    from PIL.PngImagePlugin import PngInfo
+
+    image = Image.fromarray(rgba, "RGBA")
+    info = PngInfo()
+    for name, value in (metadata or {}).items():
+        info.add_text(name, value)
+    options = {"dpi": (dpi, dpi)} if dpi else {}
+    atomic_write(path, lambda f: image.save(f, format="png", pnginfo=info, **options))
+
+
+class BackgroundWriter:
+    """Bounded thread pool for a render loop's file writes; see the module docstring."""
+
+    def __init__(self, max_workers=2, max_pending=4):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="writer")
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.pending = []
+        self.callbacks = []
+
+    def submit(self, fn, *args):
+        """Run fn(*args) in the pool, waiting for a free slot first; returns its future."""
+        self._run_callbacks()
+        self.slots.acquire()
+        try:
+            future = self.pool.submit(fn, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        self.pending.append(future)
+        return future
+
+    def savefig(self, fig, path, **savefig_kwargs):
+        """Draw fig now, close it, and encode and write the PNG in the background."""
+        import matplotlib
+        import matplotlib.pyplot as plt
+
+        dpi = savefig_kwargs.get("dpi", fig.dpi)
+        dpi = dpi if isinstance(dpi, (int, float)) else fig.dpi
+        rgba = render_rgba(fig, **savefig_kwargs)
+        plt.close(fig)
+        # The same Software tag savefig writes
+        metadata = {"Software": f"Matplotlib version{matplotlib.__version__}, https://matplotlib.org/"}
+        return self.submit(write_png, rgba, path, dpi, metadata)
+
+    def write_geojson(self, gdf, path):
+        return self.submit(write_geojson, gdf, path)
+
+    def write_geoparquet(self, gdf, path):
+        return self.submit(write_geoparquet, gdf, path)
+
+    def on_done(self, callback, futures, *args):
+        """
+        Call callback(*args) in this thread once every future has finished without error, from the next
+        submit or close. Used to record outputs in the render cache only after they are on disk.
+        """
+        self.callbacks.append((list(futures), callback, args))
+        self._run_callbacks()
+
+    def _run_callbacks(self, block=False):
+        waiting = []
+        for futures, callback, args in self.callbacks:
+            if block:
+                wait(futures)
+            if all(future.done() for future in futures):
+                # Re-raise a failed write here rather than losing it in the pool
+                for future in futures:
+                    future.result()
+                callback(*args)
+            else:
+                waiting.append((futures, callback, args))
+        self.callbacks = waiting
+        finished = [future for future in self.pending if future.done()]
+        self.pending = [future for future in self.pending if not future.done()]
+        for future in finished:
+            future.result()
+
+    def close(self):
+        """Wait for every write, run the remaining callbacks and raise the first write error, if any."""
+        try:
+            wait(self.pending)
+            for future in self.pending:
+                future.result()
+            self._run_callbacks(block=True)
+        finally:
+            self.pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,290 @@
+"""
+Election-night ingest: poll a results feed and keep county, state and national totals current.
+
+Feed updates carry each reporting county's cumulative counts (fips, votes_dem, votes_rep, votes_all). The
+aggregator turns them into deltas against what it already holds, adds the deltas to the county, state and
+national running sums in place, and recomputes shares and winners only for the counties and states that
+changed. Each cycle publishes a snapshot of the county and state tables, in the same schemas
+00_process_results.py writes, by writing a temporary file and renaming it over the old one, so readers
+never see a partial file.
+
+A directory of dropped JSON files or an HTTP endpoint returning the same JSON can stand in for the feed. A feed
+error (unreachable endpoint, HTTP 5xx, timeout, malformed batch) is logged and the cycle skipped; the next poll
+retries.
+
+    python -m elections.live --drop-dir feed/ --out-dir data/live
+    python -m elections.live --url http://127.0.0.1:9000/updates.json --interval 2
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import us
+
+from elections.data import PROCESSED_DIR
+from elections.schema import COUNTY_FIPS_WIDTH, to_key
+
+ROSTER_JSON = PROCESSED_DIR / "presidential_county_results_2024.json"
+
+
+class FileDropFeed:
+    """
+    Reads *.json files dropped into a directory, oldest name first, each exactly once.
+
+    Dot-prefixed names (a writer's temporary file) are skipped. A file that doesn't parse yet is taken to be
+    still being written: it is left unread, along with the files after it so updates stay in order, and read
+    again on the next poll.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.seen = set()
+
+    def poll(self):
+        updates = []
+        for path in sorted(self.directory.glob("*.json")):
+            if path.name in self.seen or path.name.startswith("."):
+                continue
+            try:
+                with path.open() as f:
+                    updates.extend(json.load(f))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                break
+            self.seen.add(path.name)
+        return updates
+
+
+class HttpFeed:
+    """Polls a URL, using ETag/If-None-Match so unchanged feeds cost a 304."""
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+        self.etag = None
+
+    def poll(self):
+        request = urllib.request.Request(self.url)
+        if self.etag:
+            request.add_header("If-None-Match", self.etag)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as resp:
+                updates = json.load(resp)
+                # Only once the body parsed, so a truncated response is fetched again rather than answered 304
+                self.etag = resp.headers.get("ETag")
+                return updates
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return []
+            raise
+
+
+def _winner(dem, rep):
+    return np.where(dem > rep, "dem", np.where(rep > dem, "rep", "tie"))
+
+
+def _pct(votes, total):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(total > 0, np.round(votes / total * 100, 2), 0.0)
+
+
+class LiveAggregator:
+    """Running county, state and national sums with incrementally refreshed shares and winners."""
+
+    def __init__(self, roster, year="2024"):
+        roster = roster.sort_values("fips").reset_index(drop=True)
+        self.year = year
+        self.fips = roster["fips"].to_numpy()
+        self.county_name = roster["county_name"].to_numpy()
+        self.row = {int(fips): i for i, fips in enumerate(self.fips)}
+        # Published records keep the zero-padded string FIPS of the processed files
+        self.fips_labels = [str(fips).zfill(COUNTY_FIPS_WIDTH) for fips in self.fips]
+
+        self.state_po, self.county_state = np.unique(roster["state_po"].to_numpy(), return_inverse=True)
+        # State FIPS and names as in presidential_election_results_by_state.json; codes us doesn't know keep None
+        states = [us.states.lookup(str(po)) for po in self.state_po]
+        self.state_fips = [state.fips if state else None for state in states]
+        self.state_names = [state.name if state else None for state in states]
+
+        # votes[:, 0..2] = dem, rep, all
+        self.county_votes = np.zeros((len(roster), 3), dtype=np.int64)
+        self.state_votes = np.zeros((len(self.state_po), 3), dtype=np.int64)
+        self.national_votes = np.zeros(3, dtype=np.int64)
+
+        # Pre-serialized records, refreshed only for rows that change
+        self.county_records = [None] * len(self.fips)
+        self.state_records = [None] * len(self.state_po)
+        self._refresh_counties(np.arange(len(self.fips)))
+        self._refresh_states(np.arange(len(self.state_po)))
+
+    @classmethod
+    def from_roster_file(cls, path=ROSTER_JSON):
+        roster = pd.read_json(path, dtype={"fips": str})[["fips", "county_name", "state_po"]]
+        roster["fips"] = to_key(roster["fips"])
+        return cls(roster)
+
+    def apply(self, updates):
+        """
+        Apply cumulative county counts; returns the number of counties that changed.
+
+        Later updates for the same county win; unknown FIPS codes are ignored.
+        """
+        latest = {}
+        for u in updates:
+            fips = int(u["fips"])
+            if fips in self.row:
+                latest[self.row[fips]] = (u["votes_dem"], u["votes_rep"], u["votes_all"])
+        if not latest:
+            return 0
+
+        rows = np.fromiter(latest.keys(), dtype=np.int64, count=len(latest))
+        new = np.array(list(latest.values()), dtype=np.int64)
+        delta = new - self.county_votes[rows]
+        changed = delta.any(axis=1)
+        rows, new, delta = rows[changed], new[changed], delta[changed]
+        if not len(rows):
+            return 0
+
+        self.county_votes[rows] = new
+        states = self.county_state[rows]
+        np.add.at(self.state_votes, states, delta)
+        self.national_votes += delta.sum(axis=0)
+
+        self._refresh_counties(rows)
+        self._refresh_states(np.unique(states))
+        return len(rows)
+
+    def _refresh_counties(self, rows):
+        dem, rep, total = self.county_votes[rows].T
+        dem_pct, rep_pct = _pct(dem, total), _pct(rep, total)
+        margin = np.round(rep_pct - dem_pct, 2)
+        winner = _winner(dem_pct, rep_pct)
+        for j, i in enumerate(rows):
+            self.county_records[i] = json.dumps(
+                {
+                    "fips": self.fips_labels[i],
+                    "county_name": self.county_name[i],
+                    "state_po": self.state_po[self.county_state[i]],
+                    "year": self.year,
+                    "votes_dem": int(dem[j]),
+                    "votes_rep": int(rep[j]),
+                    "votes_all": int(total[j]),
+                    "dem_pct": float(dem_pct[j]),
+                    "rep_pct": float(rep_pct[j]),
+                    "margin": float(margin[j]),
+                    "winner": str(winner[j]),
+                }
+            )
+
+    def _refresh_states(self, rows):
+        dem, rep, total = self.state_votes[rows].T
+        dem_pct, rep_pct = _pct(dem, total), _pct(rep, total)
+        for j, i in enumerate(rows):
+            self.state_records[i] = json.dumps(
+                {
+                    "fips": self.state_fips[i],
+                    "year": self.year,
+                    "total_votes": float(total[j]),
+                    "dem_votes": float(dem[j]),
+                    "rep_votes": float(rep[j]),
+                    "ind_votes": 0.0,
+                    "other_votes": 0.0,
+                    "dem_pct": float(dem_pct[j]),
+                    "rep_pct": float(rep_pct[j]),
+                    "ind_pct": 0.0,
+                    "other_pct": 0.0,
+                    "state": self.state_po[i],
+                    "state_name": self.state_names[i],
+                }
+            )
+
+    def national(self):
+        dem, rep, total = (int(v) for v in self.national_votes)
+        dem_pct, rep_pct = (float(_pct(np.array(v), np.array(total))) for v in (dem, rep))
+        return {
+            "year": self.year,
+            "votes_dem": dem,
+            "votes_rep": rep,
+            "votes_all": total,
+            "dem_pct": dem_pct,
+            "rep_pct": rep_pct,
+            "winner": str(_winner(dem, rep)),
+            "counties_reporting": int((self.county_votes[:, 2] > 0).sum()),
+            "counties": len(self.fips),
+        }
+
+    def publish(self, out_dir):
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        _atomic_write(out_dir / f"presidential_county_results_{self.year}_live.json", "[" + ",".join(self.county_records) + "]")
+        _atomic_write(out_dir / f"presidential_election_results_by_state_{self.year}_live.json", "[" + ",".join(self.state_records) + "]")
+        _atomic_write(out_dir / f"presidential_national_results_{self.year}_live.json", json.dumps(self.national()))
+
+
+def _atomic_write(path, text):
+    # Write beside the target so the rename stays on one filesystem and is atomic
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        # mkstemp creates owner-only files; snapshots are meant to be served
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+# A feed that is down, slow or sends a malformed batch; the cycle is skipped and the next poll retries
+FEED_ERRORS = (OSError, ValueError, KeyError, TypeError)
+
+
+def run(feed, aggregator, out_dir, interval=2.0, once=False):
+    aggregator.publish(out_dir)
+    while True:
+        started = time.perf_counter()
+        try:
+            # apply validates the whole batch before changing any totals
+            changed = aggregator.apply(feed.poll())
+        except FEED_ERRORS as e:
+            print(f"{time.strftime('%H:%M:%S')} feed error, retrying: {type(e).__name__}: {e}", file=sys.stderr)
+            changed = 0
+        if changed:
+            aggregator.publish(out_dir)
+            national = aggregator.national()
+            print(
+                f"{time.strftime('%H:%M:%S')} {changed} counties updated in "
+                f"{(time.perf_counter() - started) * 1000:.1f} ms; "
+                f"{national['counties_reporting']}/{national['counties']} reporting, "
+                f"D {national['dem_pct']}% R {national['rep_pct']}%"
+            )
+        if once:
+            return
+        time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--drop-dir", help="directory polled for *.json update files")
+    source.add_argument("--url", help="HTTP endpoint polled for updates")
+    parser.add_argument("--out-dir", default="data/live")
+    parser.add_argument("--roster", default=str(ROSTER_JSON), help="county list (fips, county_name, state_po)")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between polls")
+    parser.add_argument("--once", action="store_true", help="poll a single time and exit")
+    args = parser.parse_args(argv)
+
+    feed = FileDropFeed(args.drop_dir) if args.drop_dir else HttpFeed(args.url)
+    run(feed, LiveAggregator.from_roster_file(args.roster), args.out_dir, args.interval, args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Load test for the results API.
+
+Opens keep-alive connections from several threads against a running server and reports throughput
+and latency percentiles per route.
+
+    python -m elections.server &
+    python -m elections.loadtest --url http://127.0.0.1:8000 --threads 8 --seconds 10
+"""
+
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+
+def sample_targets(conn, n=500, seed=0):
+    """Build a realistic mix of request paths from the server's own index."""
+    rng = random.Random(seed)
+    conn.request("GET", "/years/2024/counties")
+    counties = json.loads(conn.getresponse().read())
+
+    fips = [row["fips"] for row in counties]
+    states = sorted({row["state_po"] for row in counties})
+    years = ["2000", "2004", "2008", "2012", "2016", "2020", "2024"]
+
+    targets = []
+    for _ in range(n):
+        kind = rng.choice(["county", "county_year", "state", "state_year", "shifts", "year_state"])
+        if kind == "county":
+            targets.append(("county", f"/counties/{rng.choice(fips)}"))
+        elif kind == "county_year":
+            targets.append(("county_year", f"/counties/{rng.choice(fips)}/{rng.choice(years)}"))
+        elif kind == "state":
+            targets.append(("state", f"/states/{rng.choice(states)}"))
+        elif kind == "state_year":
+            targets.append(("state_year", f"/states/{rng.choice(states)}/{rng.choice(years)}"))
+        elif kind == "year_state":
+            targets.append(("year_state", f"/years/{rng.choice(years)}/counties?state={rng.choice(states)}"))
+        else:
+            i = rng.randrange(len(years) - 1)
+            targets.append(("shifts", f"/shifts?from={years[i]}&to={years[i + 1]}&n={rng.choice([10, 25, 100])}"))
+    return targets
+
+
+def worker(host, port, targets, deadline, gzip, latencies, seed):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection(host, port)
+    headers = {"Accept-Encoding": "gzip"} if gzip else {}
+    while time.perf_counter() < deadline:
+        kind, path = rng.choice(targets)
+        start = time.perf_counter()
+        conn.request("GET", path, headers=headers)
+        conn.getresponse().read()
+        latencies.setdefault(kind, []).append(time.perf_counter() - start)
+    conn.close()
+
+
+def run(url, threads=8, seconds=10, gzip=True):
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port)
+    targets = sample_targets(conn)
+    conn.close()
+
+    per_thread = [{} for _ in range(threads)]
+    deadline = time.perf_counter() + seconds
+    pool = [
+        threading.Thread(target=worker, args=(parts.hostname, parts.port, targets, deadline, gzip, per_thread[i], i))
+        for i in range(threads)
+    ]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+    latencies = {}
+    for result in per_thread:
+        for kind, values in result.items():
+            latencies.setdefault(kind, []).extend(values)
+    total = sum(len(v) for v in latencies.values())
+
+    print(f"{total} requests in {seconds}s over {threads} connections: {total / seconds:,.0f} req/s")
+    print(f"{'route':<12} {'count':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}")
+    for kind, values in sorted(latencies.items()):
+        ms = np.array(values) * 1000
+        p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+        print(f"{kind:<12} {len(ms):>8} {p50:>8.3f} {p90:>8.3f} {p99:>8.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--no-gzip", action="store_true", help="do not send Accept-Encoding: gzip")
+    args = parser.parse_args(argv)
+    run(args.url, args.threads, args.seconds, gzip=not args.no_gzip)
+
+
+if __name__ == "__main__":
+    main()
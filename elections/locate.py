@@ -0,0 +1,147 @@
+"""
+Bulk point-to-county lookup: county FIPS (and results) for millions of longitude/latitude points.
+
+An STR-tree over the county polygons is built once and pickled next to the processed data. Points are located
+in batches: each batch becomes an array of shapely points, one tree query with the intersects predicate
+returns every (point, county) hit, tested against prepared polygons, and the hits are scattered back into a
+FIPS array. Points on a shared border go to the lower-numbered county; points outside every county get 0.
+Batches can be spread over processes, each holding one copy of the index.
+
+    from elections.locate import load_locator
+    locator = load_locator()
+    fips = locator.locate(lon, lat)
+    locator.attach(lon, lat, year=2024, columns=["margin", "winner"])
+
+    python -m elections.locate points.csv --year 2024 --columns margin winner --output located.csv
+"""
+
+import argparse
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from elections.data import PROCESSED_DIR, load_county_results
+from elections.schema import export_frame, to_key
+
+# County boundaries, as downloaded by the map scripts
+COUNTIES_URL = "https://stilesdata.com/gis/usa_counties_demos_generations.geojson"
+
+LOCATOR_PATH = PROCESSED_DIR / "county_locator.pkl"
+
+BATCH_SIZE = 500_000
+
+# Set in each worker process by _init_worker
+_worker_locator = None
+
+
+class CountyLocator:
+    """STR-tree over county polygons in longitude/latitude, with each polygon's FIPS code."""
+
+    def __init__(self, fips, geometries, source=None):
+        order = np.argsort(np.asarray(fips), kind="stable")
+        self.fips = np.asarray(fips, dtype=np.int32)[order]
+        self.geometries = np.asarray(geometries)[order]
+        self.source = source
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Prepared geometries don't survive pickling
+        shapely.prepare(self.geometries)
+
+    def save(self, path=LOCATOR_PATH):
+        with open(path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _locate_batch(self, lon, lat):
+        points = shapely.points(lon, lat)
+        point, county = self.tree.query(points, predicate="intersects")
+        # Lowest county position wins for points on a border; len(fips) marks no county
+        best = np.full(len(points), len(self.fips))
+        np.minimum.at(best, point, county)
+        return np.append(self.fips, 0)[best].astype(np.int32)
+
+    def locate(self, lon, lat, batch_size=BATCH_SIZE, processes=None):
+        """FIPS code of the county containing each point (0 outside every county), as int32."""
+        lon = np.asarray(lon, dtype="float64")
+        lat = np.asarray(lat, dtype="float64")
+        if lon.shape != lat.shape:
+            raise ValueError("lon and lat must have the same shape")
+        starts = range(0, len(lon), batch_size)
+        batches = [(lon[start : start + batch_size], lat[start : start + batch_size]) for start in starts]
+        if processes and processes > 1 and len(batches) > 1:
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(self,)) as pool:
+                located = list(pool.map(_locate_in_worker, batches))
+        else:
+            located = [self._locate_batch(*batch) for batch in batches]
+        return np.concatenate(located) if located else np.zeros(0, dtype=np.int32)
+
+    def attach(self, lon, lat, year, columns=("dem_pct", "rep_pct", "margin", "winner"), **kwargs):
+        """
+        Frame with the county FIPS of each point and that county's results in year, one row per point.
+
+        Points outside every county, or in counties without a result that year, get missing values.
+        kwargs go to locate.
+        """
+        fips = self.locate(lon, lat, **kwargs)
+        results = load_county_results(years=[year], columns=list(columns)).set_index("fips")[list(columns)]
+        located = results.reindex(fips).reset_index()
+        located.insert(1, "year", np.int32(year))
+        return located
+
+
+def _init_worker(locator):
+    global _worker_locator
+    _worker_locator = locator
+
+
+def _locate_in_worker(batch):
+    return _worker_locator._locate_batch(*batch)
+
+
+def build_locator(source=COUNTIES_URL, path=LOCATOR_PATH):
+    """Build the index from a county boundary file (any format geopandas reads) and save it."""
+    import geopandas as gpd
+
+    counties = gpd.read_file(source).rename(columns={"ID": "fips"}).to_crs("EPSG:4326")
+    locator = CountyLocator(to_key(counties["fips"]), counties.geometry.to_numpy(), source=str(source))
+    locator.save(path)
+    return locator
+
+
+def load_locator(source=COUNTIES_URL, path=LOCATOR_PATH):
+    """Load the saved index, building it if it is missing or was built from another boundary file."""
+    if path.exists():
+        with open(path, "rb") as f:
+            locator = pickle.load(f)
+        if locator.source == str(source):
+            return locator
+    return build_locator(source, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("points", help="CSV with longitude and latitude columns")
+    parser.add_argument("--lon", default="lon", help="longitude column")
+    parser.add_argument("--lat", default="lat", help="latitude column")
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument("--columns", nargs="*", default=["dem_pct", "rep_pct", "margin", "winner"])
+    parser.add_argument("--boundaries", default=COUNTIES_URL, help="county boundary file to index")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--output", default="located.csv")
+    args = parser.parse_args(argv)
+
+    points = pd.read_csv(args.points)
+    locator = load_locator(args.boundaries)
+    located = locator.attach(points[args.lon], points[args.lat], args.year, args.columns, processes=args.processes)
+    out = pd.concat([points.reset_index(drop=True), export_frame(located)], axis=1)
+    out.to_csv(args.output, index=False)
+    print(f"{(located['fips'] > 0).sum():,} of {len(points):,} points located, written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
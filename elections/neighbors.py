@@ -0,0 +1,111 @@
+"""
+Nearest-neighbor index of counties by vote trajectory and demographics.
+
+Each county is described by its margin (Republican minus Democratic share) in every election from 2000 to
+2024, its log population and its white non-Hispanic share in the latest census, all standardized so each
+feature counts equally. A KD-tree over those vectors answers "which counties moved like this one" without
+scanning the table. The index is pickled next to the processed data and rebuilt when the merged county
+file changes.
+
+    from elections.neighbors import load_index
+    index = load_index()
+    index.query(42049, k=10)
+    fips, neighbors, distances = index.all_neighbors(k=10)
+"""
+
+import pickle
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from elections.data import COUNTY_RESULTS_JSON, PROCESSED_DIR, _is_stale, load_county_results
+
+FEATURE_YEARS = [2000, 2004, 2008, 2012, 2016, 2020, 2024]
+
+INDEX_PATH = PROCESSED_DIR / "county_neighbors.pkl"
+
+
+def build_features(df=None):
+    """County x feature frame: margin_{year} for each election, log_population and white_alone_pct."""
+    if df is None:
+        df = load_county_results(columns=["margin", "population", "white_alone_pct"])
+    df = df[df["year"].isin(FEATURE_YEARS)]
+
+    margins = df.pivot(index="fips", columns="year", values="margin").reindex(columns=FEATURE_YEARS)
+    margins.columns = [f"margin_{year}" for year in margins.columns]
+
+    latest = df.sort_values("year").drop_duplicates("fips", keep="last").set_index("fips")
+    features = margins.join(
+        pd.DataFrame(
+            {
+                "log_population": np.log10(latest["population"].where(latest["population"] > 0)),
+                "white_alone_pct": latest["white_alone_pct"],
+            }
+        )
+    )
+    # Counties missing any election or census field can't be placed in the space
+    return features.dropna()
+
+
+class CountyIndex:
+    """KD-tree over standardized county features."""
+
+    def __init__(self, features):
+        self.columns = list(features.columns)
+        self.fips = features.index.to_numpy()
+        values = features.to_numpy(dtype="float64")
+        self.mean = values.mean(axis=0)
+        self.std = values.std(axis=0)
+        self.std[self.std == 0] = 1.0
+        self.matrix = (values - self.mean) / self.std
+        self.row = {int(fips): i for i, fips in enumerate(self.fips)}
+        self.tree = cKDTree(self.matrix)
+
+    def save(self, path=INDEX_PATH):
+        with open(path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def neighbors(self, fips, k=10):
+        """FIPS codes and distances of the k counties closest to fips, nearest first."""
+        distances, idx = self.tree.query(self.matrix[self.row[fips]], k=k + 1)
+        # Drop the county itself (distance zero); duplicates of its vector may come first
+        keep = idx != self.row[fips]
+        return self.fips[idx[keep][:k]], distances[keep][:k]
+
+    def query(self, fips, k=10):
+        fips_codes, distances = self.neighbors(int(fips), k)
+        return pd.DataFrame({"fips": fips_codes, "distance": distances})
+
+    def query_features(self, values, k=10):
+        """Nearest counties to an arbitrary feature vector (in self.columns order, unstandardized)."""
+        distances, idx = self.tree.query((np.asarray(values, dtype="float64") - self.mean) / self.std, k=k)
+        return pd.DataFrame({"fips": self.fips[np.atleast_1d(idx)], "distance": np.atleast_1d(distances)})
+
+    def all_neighbors(self, k=10, workers=-1):
+        """
+        k nearest neighbors of every county in one batch query.
+
+        Returns (fips, neighbor_fips, distances), the last two shaped (counties, k).
+        """
+        distances, idx = self.tree.query(self.matrix, k=k + 1, workers=workers)
+        # Each county is its own nearest point; when exact duplicates tie, move self out of the result
+        is_self = idx == np.arange(len(idx))[:, None]
+        order = np.argsort(is_self, axis=1, kind="stable")
+        idx = np.take_along_axis(idx, order, axis=1)[:, :k]
+        distances = np.take_along_axis(distances, order, axis=1)[:, :k]
+        return self.fips, self.fips[idx], distances
+
+
+def build_index(path=INDEX_PATH):
+    index = CountyIndex(build_features())
+    index.save(path)
+    return index
+
+
+def load_index(path=INDEX_PATH):
+    """Load the persisted index, rebuilding it if the merged county results are newer."""
+    if _is_stale(path, COUNTY_RESULTS_JSON):
+        return build_index(path)
+    with open(path, "rb") as f:
+        return pickle.load(f)
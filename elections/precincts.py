@@ -0,0 +1,350 @@
+"""
+Precinct-level ingest: stream MIT precinct returns and aggregate them to counties in bounded memory.
+
+MIT's precinct files (https://electionlab.mit.edu/data) run to several GB per cycle, so they are read in
+chunks. Each chunk's party and candidate labels are normalized through their categories rather than row by
+row, the chunk is appended to a precinct-level Parquet store partitioned by year and state, and its votes are
+folded into running county totals. Only one chunk and the county totals are ever in memory.
+
+The county totals are written in the same schema as presidential_county_results.json from
+00_process_results.py. votes_all counts every candidate's votes, including write-ins, but not the
+undervote, overvote and ballots-cast lines some states report.
+
+    python -m elections.precincts data/raw/PRESIDENT_precinct_general.csv
+    python -m elections.precincts data/raw/2016-precinct-president.csv --memory-ceiling 1GB
+
+With --memory-ceiling the command exits non-zero if the process's peak resident memory exceeds the limit,
+which makes it usable as a check on any input size. --check needs no input: it writes synthetic precinct files
+of 2 and 8 chunks, ingests each in a fresh process and exits non-zero unless the larger file's peak memory
+above the interpreter and library baseline stays within 25% of the smaller one's.
+
+    python -m elections.precincts --check
+"""
+
+import argparse
+import gc
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from elections.data import PROCESSED_DIR
+from elections.export import export_records
+from elections.schema import WINNER_DTYPE, apply_schema, export_frame, to_key
+
+PRECINCT_STORE = PROCESSED_DIR / "precinct_results.parquet"
+PRECINCT_COUNTY_JSON = PROCESSED_DIR / "presidential_county_results_precincts.json"
+
+CHUNK_ROWS = 500_000
+
+# Column names differ between cycles; map them onto one set
+COLUMN_ALIASES = {
+    "state_postal": "state_po",
+    "candidate_normalized": "candidate",
+}
+# The first of these present is the party; elsewhere, the first column aliasing a name wins
+PARTY_COLUMNS = ["party_simplified", "party", "party_detailed"]
+COLUMNS = ["year", "state_po", "county_fips", "county_name", "precinct", "mode", "candidate", "party", "votes"]
+
+PARTY_CLASS = pd.CategoricalDtype(["dem", "rep", "other"])
+PARTY_VARIANTS = {
+    "dem": ["DEMOCRAT", "DEMOCRATIC", "DEM", "D", "DEMOCRATIC-FARMER-LABOR", "DEMOCRATIC-NONPARTISAN LEAGUE"],
+    "rep": ["REPUBLICAN", "REP", "R", "GOP"],
+}
+PARTY_MAP = {variant: party for party, variants in PARTY_VARIANTS.items() for variant in variants}
+
+# Lines that report ballots rather than votes for a candidate
+NON_CANDIDATES = {"UNDERVOTES", "UNDERVOTE", "OVERVOTES", "OVERVOTE", "BALLOTS CAST", "REGISTERED VOTERS", "TOTAL VOTES"}
+
+
+def _normalize_labels(values):
+    return values.str.upper().str.strip().str.replace(r"\s+", " ", regex=True)
+
+
+def _recode(series, transform, dtype=None):
+    """
+    Apply transform to a categorical Series' categories and broadcast the result back through the codes,
+    so each distinct label is handled once however many rows carry it.
+    """
+    labels = transform(pd.Series(series.cat.categories, dtype="object")).to_numpy(dtype=object)
+    # Missing labels (code -1) pick up the None appended at the end
+    return pd.Categorical(np.append(labels, None)[series.cat.codes], dtype=dtype)
+
+
+def party_class(party):
+    return _recode(party, lambda labels: _normalize_labels(labels).map(PARTY_MAP).fillna("other"), PARTY_CLASS)
+
+
+def _source_columns(path):
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = {}
+    for column in header:
+        name = COLUMN_ALIASES.get(column, column)
+        if column in PARTY_COLUMNS:
+            name = "party"
+            if any(c in header for c in PARTY_COLUMNS[: PARTY_COLUMNS.index(column)]):
+                continue
+        if name in COLUMNS and name not in usecols.values():
+            usecols[column] = name
+    missing = {"year", "state_po", "county_fips", "candidate", "party", "votes"} - set(usecols.values())
+    if missing:
+        raise ValueError(f"{path} lacks {', '.join(sorted(missing))}")
+    return usecols
+
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Normalized precinct rows from one file, chunk_rows at a time."""
+    usecols = _source_columns(path)
+    # Labels repeat millions of times; the parser builds categories so they are normalized per distinct value
+    dtype = {column: "category" for column, name in usecols.items() if name not in ("year", "county_fips", "precinct", "votes")}
+    reader = pd.read_csv(
+        path,
+        usecols=list(usecols),
+        dtype={**dtype, "year": "str", "county_fips": "str", "precinct": "str", "votes": "str"},
+        chunksize=chunk_rows,
+    )
+    for chunk in reader:
+        chunk = chunk.rename(columns=usecols)
+        for column in ["county_name", "mode"]:
+            if column not in chunk:
+                chunk[column] = pd.Categorical([None] * len(chunk))
+        if "precinct" not in chunk:
+            chunk["precinct"] = None
+        # Statewide absentee and UOCAVA lines have no county; some files write FIPS as floats ("1001.0")
+        fips = chunk["county_fips"].str.extract(r"^(\d+)", expand=False)
+        candidate = _recode(chunk["candidate"], _normalize_labels)
+        keep = fips.notna().to_numpy() & ~pd.Series(candidate).isin(NON_CANDIDATES).to_numpy()
+        chunk, fips, candidate = chunk[keep], fips[keep], candidate[keep].remove_unused_categories()
+        yield pd.DataFrame(
+            {
+                "year": to_key(chunk["year"]),
+                "state_po": _recode(chunk["state_po"], lambda labels: labels.str.upper().str.strip()),
+                "county_fips": to_key(fips),
+                "county_name": _recode(chunk["county_name"], _normalize_labels),
+                "precinct": chunk["precinct"].to_numpy(),
+                "mode": _recode(chunk["mode"], _normalize_labels),
+                "candidate": candidate,
+                "party": party_class(chunk["party"]),
+                # Suppressed counts ("*") and blanks count as zero
+                "votes": pd.to_numeric(chunk["votes"], errors="coerce").fillna(0).astype("int64"),
+            }
+        )
+
+
+class CountyTotals:
+    """Running D/R/all vote totals per (year, county), folded in one chunk at a time."""
+
+    def __init__(self):
+        self.votes = None
+        self.labels = {}
+
+    def add(self, chunk):
+        sums = (
+            chunk.groupby(["year", "county_fips", "party"], observed=True)["votes"]
+            .sum()
+            .unstack("party", fill_value=0)
+            .reindex(columns=PARTY_CLASS.categories, fill_value=0)
+        )
+        self.votes = sums if self.votes is None else self.votes.add(sums, fill_value=0).astype("int64")
+        # One county name and state per county, from its first precinct
+        firsts = chunk.drop_duplicates(["year", "county_fips"])
+        for year, fips, name, state in zip(firsts["year"], firsts["county_fips"], firsts["county_name"], firsts["state_po"]):
+            self.labels.setdefault((year, fips), (name, state))
+
+    def results(self):
+        """County results in the schema 00_process_results.py writes."""
+        votes = self.votes.reset_index()
+        names, states = zip(*(self.labels[key] for key in zip(votes["year"], votes["county_fips"])))
+        df = pd.DataFrame(
+            {
+                "fips": votes["county_fips"],
+                "county_name": names,
+                "state_po": states,
+                "year": votes["year"],
+                "votes_dem": votes["dem"],
+                "votes_rep": votes["rep"],
+                "votes_all": votes["dem"] + votes["rep"] + votes["other"],
+            }
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            df["dem_pct"] = (df["votes_dem"] / df["votes_all"] * 100).round(2)
+            df["rep_pct"] = (df["votes_rep"] / df["votes_all"] * 100).round(2)
+        df["margin"] = df["rep_pct"] - df["dem_pct"]
+        df["winner"] = pd.Categorical(
+            np.select([df["dem_pct"] > df["rep_pct"], df["dem_pct"] < df["rep_pct"]], ["dem", "rep"], "tie"),
+            dtype=WINNER_DTYPE,
+        )
+        return apply_schema(df).sort_values(["fips", "county_name", "state_po", "year"]).reset_index(drop=True)
+
+
+def _append_to_store(chunk, store, part):
+    table = pa.Table.from_pandas(chunk, preserve_index=False)
+    ds.write_dataset(
+        table,
+        store,
+        format="parquet",
+        partitioning=["year", "state_po"],
+        partitioning_flavor="hive",
+        basename_template=f"part-{part:05d}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        use_threads=False,
+    )
+
+
+def ingest(paths, store=PRECINCT_STORE, chunk_rows=CHUNK_ROWS):
+    """Stream precinct files into the precinct store and return their county totals."""
+    totals = CountyTotals()
+    replaced = set()
+    part = 0
+    for path in paths:
+        for chunk in read_chunks(path, chunk_rows):
+            # A year being re-ingested replaces what the store held for it
+            for year in set(chunk["year"].unique()) - replaced:
+                shutil.rmtree(Path(store) / f"year={year}", ignore_errors=True)
+                replaced.add(year)
+            _append_to_store(chunk, store, part)
+            totals.add(chunk)
+            part += 1
+    # Collect the dataset writer's reference cycles now rather than at interpreter exit
+    gc.collect()
+    return totals.results()
+
+
+def load_precinct_results(years=None, states=None, columns=None, store=PRECINCT_STORE):
+    """Precinct rows from the store, filtered at read time."""
+    filters = []
+    if years is not None:
+        filters.append(ds.field("year").isin([int(y) for y in np.atleast_1d(years)]))
+    if states is not None:
+        filters.append(ds.field("state_po").isin(list(np.atleast_1d(states))))
+    dataset = ds.dataset(store, format="parquet", partitioning="hive")
+    expression = None
+    for f in filters:
+        expression = f if expression is None else expression & f
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+
+def _parse_size(text):
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([KMG]?)B?", text.strip().upper())
+    if not match:
+        raise argparse.ArgumentTypeError(f"not a size: {text}")
+    return float(match.group(1)) * 1024 ** " KMG".index(match.group(2) or " ")
+
+
+def peak_memory():
+    """Peak resident set size of this process, in bytes (ru_maxrss is KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+STATES_FOR_CHECK = ["AL", "CA", "GA", "IL", "MI", "NY", "OH", "PA", "TX", "WI"]
+
+
+def synthetic_precincts(path, rows, counties=3000, seed=0, block_rows=100_000):
+    """
+    Write a precinct CSV of rows rows in the 2020 file's layout: one line per candidate and precinct, each
+    precinct's lines split across the same few thousand counties. Written a block at a time, in bounded memory.
+    """
+    rng = np.random.default_rng(seed)
+    candidates = pd.DataFrame(
+        {
+            "candidate": ["JOSEPH R BIDEN", "DONALD J TRUMP", "JO JORGENSEN", "UNDERVOTES"],
+            "party_simplified": ["DEMOCRAT", "REPUBLICAN", "LIBERTARIAN", None],
+        }
+    )
+    fips = np.sort(rng.choice(np.arange(1001, 56046), counties, replace=False))
+    for start in range(0, rows, block_rows):
+        n = min(block_rows, rows - start)
+        line = np.arange(start, start + n)
+        county = fips[(line // len(candidates)) % counties]
+        block = pd.DataFrame(
+            {
+                "year": 2020,
+                "state_po": np.array(STATES_FOR_CHECK)[county // 1000 % len(STATES_FOR_CHECK)],
+                "county_fips": county,
+                "county_name": "COUNTY " + pd.Series(county).astype(str),
+                "precinct": "P-" + pd.Series(line // len(candidates)).astype(str),
+                "mode": "TOTAL",
+                "votes": rng.integers(0, 900, n),
+            }
+        )
+        block = pd.concat([block, candidates.iloc[line % len(candidates)].reset_index(drop=True)], axis=1)
+        block.to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+
+
+_MEASURE = """
+import sys
+from elections.precincts import ingest, peak_memory
+if len(sys.argv) > 1:
+    ingest([sys.argv[1]], sys.argv[2], int(sys.argv[3]))
+print(peak_memory())
+"""
+
+
+def _peak_in_fresh_process(*args):
+    """Peak memory of a fresh interpreter that imports this module and, given a file, ingests it."""
+    out = subprocess.run([sys.executable, "-c", _MEASURE, *map(str, args)], capture_output=True, text=True, check=True)
+    return int(out.stdout.split()[-1])
+
+
+def check_memory(chunk_rows=CHUNK_ROWS, chunks=(2, 8), slack=1.25):
+    """
+    Peak memory of ingesting synthetic files of chunks[0] and chunks[1] chunks, each above the baseline of an
+    interpreter with the libraries loaded, in bytes. Raises AssertionError if the larger file's exceeds the
+    smaller one's by more than slack: streaming memory grows with the chunk size, not the file size.
+    """
+    baseline = _peak_in_fresh_process()
+    peaks = []
+    with tempfile.TemporaryDirectory() as scratch:
+        for n in chunks:
+            path = Path(scratch) / f"precincts_{n}.csv"
+            synthetic_precincts(path, n * chunk_rows)
+            peaks.append(_peak_in_fresh_process(path, Path(scratch) / f"store_{n}", chunk_rows) - baseline)
+            path.unlink()
+    small, large = peaks
+    assert large <= small * slack, (
+        f"ingesting {chunks[1]} chunks peaked {large / 2**20:.0f} MB above baseline, "
+        f"more than {slack:g}x the {small / 2**20:.0f} MB of {chunks[0]} chunks"
+    )
+    return baseline, peaks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="MIT precinct CSV files")
+    parser.add_argument("--out", default=str(PRECINCT_COUNTY_JSON), help="county results JSON")
+    parser.add_argument("--store", default=str(PRECINCT_STORE), help="precinct Parquet store")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--memory-ceiling", type=_parse_size, help="fail if peak memory exceeds this, e.g. 1GB")
+    parser.add_argument("--check", action="store_true", help="check that memory stays flat on synthetic input, then exit")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        baseline, (small, large) = check_memory(args.chunk_rows)
+        print(
+            f"Peak memory above the {baseline / 2**20:.0f} MB baseline: {small / 2**20:.0f} MB for 2 chunks of "
+            f"{args.chunk_rows:,} rows, {large / 2**20:.0f} MB for 8: ok"
+        )
+        return
+    if not args.paths:
+        parser.error("give precinct files to ingest, or --check")
+
+    counties = ingest(args.paths, args.store, args.chunk_rows)
+    export_records(export_frame(counties).round(2), args.out)
+
+    peak = peak_memory()
+    print(f"{len(counties)} county results from {len(args.paths)} file(s); peak memory {peak / 2**20:.0f} MB")
+    if args.memory_ceiling and peak > args.memory_ceiling:
+        print(f"peak memory exceeded the {args.memory_ceiling / 2**20:.0f} MB ceiling", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
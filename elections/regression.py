@@ -0,0 +1,215 @@
+"""
+County margin shift regressed on demographics, for every pair of election years, every state and the nation.
+
+Each model is a weighted least-squares fit of a county's shift in margin (Republican minus Democratic share, in
+points, from the earlier year to the later) on log10 population and white non-Hispanic share, both as of the
+earlier year, weighted by the earlier year's total votes:
+
+    shift = intercept + b1 * log10(population) + b2 * white_alone_pct
+
+50 states and DC plus the nation over 21 year pairs is over a thousand models of a few dozen to a few thousand
+counties each. They are fit together: one einsum builds every county's weighted cross-products, a segmented sum
+collects them into each model's normal equations, and one batched inversion solves them all, in a few tens of
+milliseconds. Models with fewer counties than coefficients plus one, or with collinear predictors, are NaN.
+
+The earlier year's counties are carried into the later year's codes with the FIPS crosswalk before the shift
+is taken, so a renamed, merged or split county stays in every pair spanning the change; its margin and
+predictors are recomputed from the carried vote and population counts.
+
+    python -m elections.regression
+    from elections.regression import shift_regressions
+    shift_regressions(weights="none")
+"""
+
+import argparse
+import time
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from elections.crosswalk import load_crosswalk
+from elections.data import PROCESSED_DIR, load_county_results
+from elections.export import export_records
+from elections.schema import export_frame
+
+REGRESSIONS_JSON = PROCESSED_DIR / "county_shift_regressions.json"
+
+TERMS = ["intercept", "log_population", "white_alone_pct"]
+NATION = "US"
+
+# Carried across county code changes; margin and white_alone_pct are recomputed from them
+COUNTS = ["votes_dem", "votes_rep", "votes_all", "population", "white_alone"]
+
+
+def fit_groups(group, X, y, w, n_groups):
+    """
+    Weighted least squares of y on X within each group, all groups at once.
+
+    group holds each observation's model (0 .. n_groups - 1), X is (observations, terms), y and w are
+    (observations,). Returns coefficients and standard errors (n_groups, terms), the number of observations
+    with positive weight, and the weighted R^2, each NaN for groups that can't be fit.
+    """
+    p = X.shape[1]
+    order = np.argsort(group, kind="stable")
+    group, X, y, w = group[order], X[order], y[order], w[order]
+    starts = np.searchsorted(group, np.arange(n_groups))
+    present = np.bincount(group, minlength=n_groups) > 0
+
+    def per_group(values):
+        """Sums of values (observations, ...) within each group."""
+        sums = np.zeros((n_groups,) + values.shape[1:])
+        sums[present] = np.add.reduceat(values, starts[present], axis=0)
+        return sums
+
+    # Normal equations X'WX b = X'Wy for every group from per-observation cross-products
+    xtwx = per_group(np.einsum("np,nq,n->npq", X, X, w))
+    xtwy = per_group(np.einsum("np,n,n->np", X, y, w))
+    n = per_group((w > 0).astype("float64"))
+    fit = present & (n > p) & (np.linalg.matrix_rank(xtwx) == p)
+
+    inverse = np.full_like(xtwx, np.nan)
+    inverse[fit] = np.linalg.inv(xtwx[fit])
+    coef = np.einsum("gpq,gq->gp", inverse, xtwy)
+
+    # Residual variance and weighted R^2 from each observation's fitted value
+    residual = y - np.einsum("np,np->n", X, coef[group])
+    rss = per_group(w * residual**2)
+    sw, swy, swy2 = per_group(w), per_group(w * y), per_group(w * y**2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tss = swy2 - swy**2 / sw
+        sigma2 = rss / (n - p)
+        std_error = np.sqrt(sigma2[:, None] * np.einsum("gpp->gp", inverse))
+        r2 = 1 - rss / tss
+    coef[~fit] = np.nan
+    std_error[~fit] = np.nan
+    r2[~fit] = np.nan
+    return coef, std_error, n, r2
+
+
+def carry_forward(rows, crosswalk, source_year, target_year):
+    """
+    One year's rows (indexed by fips) in target_year's county codes. Counties that received a changed code's
+    counts get them summed, with margin and white_alone_pct recomputed; the others keep their values.
+    """
+    counts = rows.assign(white_alone=rows["white_alone_pct"] * rows["population"] / 100).reset_index()
+    projected = crosswalk.project_frame(counts, COUNTS, source_year, target_year).set_index("fips")
+    remapped = projected[projected["remapped"]]
+    if remapped.empty:
+        return rows
+    # A county's state from any county with the same state FIPS
+    state_of = rows["state_po"].groupby(rows.index // 1000, observed=True).first()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        changed = pd.DataFrame(
+            {
+                "state_po": state_of.reindex(remapped.index // 1000).to_numpy(),
+                "margin": (remapped["votes_rep"] - remapped["votes_dem"]) / remapped["votes_all"] * 100,
+                "population": remapped["population"],
+                "white_alone_pct": remapped["white_alone"] / remapped["population"] * 100,
+                "votes_all": remapped["votes_all"],
+            },
+            index=remapped.index,
+        )
+    kept = rows.loc[projected.index[~projected["remapped"]], changed.columns]
+    return pd.concat([kept, changed]).sort_index()
+
+
+def shift_observations(df, weights="votes"):
+    """
+    One row per county and pair of years it has results for: state, years, shift, predictors and weight.
+
+    The earlier year is carried into the later year's county codes first (carry_forward), so df needs
+    votes_dem, votes_rep, votes_all, population, white_alone_pct, margin and state_po.
+    weights: "votes" (earlier year's total votes), "population" (earlier year's) or "none".
+    """
+    years = sorted(df["year"].unique())
+    by_year = {year: df[df["year"] == year].set_index("fips") for year in years}
+    crosswalk = load_crosswalk()
+    frames = []
+    for start, end in combinations(years, 2):
+        before, after = carry_forward(by_year[start], crosswalk, int(start), int(end)), by_year[end]
+        both = before.index.intersection(after.index)
+        b = before.loc[both]
+        frames.append(
+            pd.DataFrame(
+                {
+                    "fips": both,
+                    "state_po": b["state_po"].astype(str).to_numpy(),
+                    "year_from": start,
+                    "year_to": end,
+                    "shift": after.loc[both, "margin"].to_numpy("float64") - b["margin"].to_numpy("float64"),
+                    "log_population": np.log10(b["population"].where(b["population"] > 0)).to_numpy("float64"),
+                    "white_alone_pct": b["white_alone_pct"].to_numpy("float64"),
+                    "weight": {
+                        "votes": b["votes_all"].to_numpy("float64"),
+                        "population": b["population"].to_numpy("float64"),
+                        "none": np.ones(len(both)),
+                    }[weights],
+                }
+            )
+        )
+    obs = pd.concat(frames, ignore_index=True)
+    return obs.dropna(subset=["shift", "log_population", "white_alone_pct", "weight"])
+
+
+def shift_regressions(df=None, weights="votes"):
+    """
+    Tidy table of every model: geography (state postal code or US), year_from, year_to, term, estimate,
+    std_error, t, n (counties) and r2.
+    """
+    if df is None:
+        df = load_county_results(
+            columns=["state_po", "margin", "population", "white_alone_pct", "votes_dem", "votes_rep", "votes_all"]
+        )
+    obs = shift_observations(df, weights)
+
+    # Each county enters its state's model for the pair and the national one
+    pairs = obs[["year_from", "year_to"]].drop_duplicates().sort_values(["year_from", "year_to"]).to_numpy()
+    geos = sorted(obs["state_po"].unique()) + [NATION]
+    pair_index = np.searchsorted(pairs[:, 0] * 10_000 + pairs[:, 1], (obs["year_from"] * 10_000 + obs["year_to"]).to_numpy())
+    state_index = np.searchsorted(geos[:-1], obs["state_po"].to_numpy())
+    group = np.concatenate([pair_index * len(geos) + state_index, pair_index * len(geos) + len(geos) - 1])
+
+    X = np.column_stack([np.ones(len(obs)), obs["log_population"], obs["white_alone_pct"]])
+    coef, std_error, n, r2 = fit_groups(
+        group, np.tile(X, (2, 1)), np.tile(obs["shift"].to_numpy(), 2), np.tile(obs["weight"].to_numpy(), 2),
+        len(pairs) * len(geos),
+    )
+
+    models = len(pairs) * len(geos)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = coef / std_error
+    table = pd.DataFrame(
+        {
+            "geography": np.repeat(np.tile(geos, len(pairs)), len(TERMS)),
+            "year_from": np.repeat(pairs[:, 0], len(geos) * len(TERMS)).astype("int32"),
+            "year_to": np.repeat(pairs[:, 1], len(geos) * len(TERMS)).astype("int32"),
+            "term": np.tile(TERMS, models),
+            "estimate": coef.ravel(),
+            "std_error": std_error.ravel(),
+            "t": t.ravel(),
+            "n": np.repeat(n, len(TERMS)).astype("int32"),
+            "r2": np.repeat(r2, len(TERMS)),
+        }
+    )
+    return table[table["n"] > 0].reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", choices=["votes", "population", "none"], default="votes")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    table = shift_regressions(weights=args.weights)
+    took = time.perf_counter() - started
+    export_records(export_frame(table).round(4), REGRESSIONS_JSON)
+
+    models = table.drop_duplicates(["geography", "year_from", "year_to"])
+    print(f"{len(models)} models ({models['r2'].notna().sum()} fit) in {took * 1000:.0f} ms, saved to {REGRESSIONS_JSON}")
+    national = table[(table["geography"] == NATION) & (table["year_to"] == table["year_from"] + 4)]
+    print(national.pivot(index=["year_from", "year_to"], columns="term", values="estimate")[TERMS].round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
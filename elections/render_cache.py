@@ -0,0 +1,96 @@
+"""
+Skip re-rendering maps whose inputs have not changed.
+
+Each figure is keyed by a fingerprint of the rows it draws, its style constants (ramps, breaks, radii), its
+output parameters, the source of the script drawing it and the matplotlib version. The key each output file was
+last written with is kept in visuals/.render_cache.json. A script checks the cache before drawing a figure and
+records the figure after saving it, so a data update that touches one election year redraws only that year's maps.
+
+    cache = RenderCache(__file__)
+    key = cache.key(year_rows, {"breaks": breaks, "ramp": ramp}, {"dpi": 300})
+    if not cache.fresh(key, path):
+        ...
+        plt.savefig(path, dpi=300)
+        cache.record(key, path)
+
+Run a script with --force, run `elections render --force`, or set ELECTIONS_FORCE_RENDER=1 to redraw everything.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MANIFEST = Path("visuals") / ".render_cache.json"
+
+
+def _update(digest, part):
+    if isinstance(part, pd.DataFrame):
+        for column in part.columns:
+            digest.update(str(column).encode())
+            _update(digest, part[column])
+    elif isinstance(part, pd.Series):
+        digest.update(str(part.dtype).encode())
+        # Geometries are hashed by their WKB; everything else by value, categoricals by label rather than code
+        values = part.to_wkb() if part.dtype.name == "geometry" else part
+        digest.update(pd.util.hash_pandas_object(values, index=False).to_numpy().tobytes())
+    elif isinstance(part, bytes):
+        digest.update(part)
+    elif isinstance(part, np.ndarray):
+        digest.update(str(part.dtype).encode())
+        digest.update(np.ascontiguousarray(part).tobytes())
+    else:
+        digest.update(json.dumps(part, sort_keys=True, default=str).encode())
+
+
+def fingerprint(*parts):
+    """Hex digest of frames, series, arrays, bytes and JSON-able values (dicts of style constants, paths, numbers)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(type(part).__name__.encode())
+        _update(digest, part)
+    return digest.hexdigest()
+
+
+def _forced():
+    return "--force" in sys.argv[1:] or os.environ.get("ELECTIONS_FORCE_RENDER", "") not in ("", "0")
+
+
+class RenderCache:
+    """Output path -> key of the inputs it was last rendered from, for one script."""
+
+    def __init__(self, script, manifest=MANIFEST, force=None):
+        import matplotlib
+
+        self.manifest = Path(manifest)
+        self.force = _forced() if force is None else force
+        # Edits to a script's titles, layout or colors change every figure it draws
+        self.salt = fingerprint(Path(script).read_bytes(), matplotlib.__version__)
+        try:
+            self.keys = json.loads(self.manifest.read_text())
+        except (FileNotFoundError, ValueError):
+            self.keys = {}
+
+    def key(self, *parts):
+        return fingerprint(self.salt, *parts)
+
+    def fresh(self, key, *outputs):
+        """True if every output exists and was last written from inputs with this key."""
+        if self.force:
+            return False
+        return all(Path(path).exists() and self.keys.get(str(path)) == key for path in outputs)
+
+    def record(self, key, *outputs):
+        for path in outputs:
+            self.keys[str(path)] = key
+        self.manifest.parent.mkdir(parents=True, exist_ok=True)
+        # Write and rename, so an interrupted run never leaves a truncated manifest
+        fd, tmp = tempfile.mkstemp(dir=self.manifest.parent, prefix=".render_cache.")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.keys, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.manifest)
@@ -0,0 +1,62 @@
+"""
+Canonical in-memory schema for the county and state tables.
+
+FIPS codes and years are int32 keys, state, party and winner labels are categoricals with fixed categories
+(so frames from different sources concatenate and merge without falling back to object), and shares are
+float32. Zero-padded string FIPS and string years only reappear when a frame is exported.
+"""
+
+import pandas as pd
+import us
+
+STATE_PO = sorted({state.abbr for state in us.states.STATES} | {"DC"})
+
+STATE_DTYPE = pd.CategoricalDtype(STATE_PO)
+WINNER_DTYPE = pd.CategoricalDtype(["dem", "rep", "tie", "other"])
+PARTY_DTYPE = pd.CategoricalDtype(["DEMOCRAT", "REPUBLICAN"])
+
+KEY_COLUMNS = ["fips", "year"]
+SHARE_COLUMNS = ["dem_pct", "rep_pct", "ind_pct", "other_pct", "margin", "white_alone_pct"]
+
+# Zero-padded width of exported FIPS codes
+COUNTY_FIPS_WIDTH = 5
+STATE_FIPS_WIDTH = 2
+
+
+def to_key(values):
+    """int32 keys from string ("01001", "1001") or numeric FIPS codes and years."""
+    return pd.to_numeric(values).astype("int32")
+
+
+def apply_schema(df):
+    """Cast whichever canonical columns a county or state frame has."""
+    df = df.copy()
+    for col in KEY_COLUMNS:
+        if col in df.columns and df[col].notna().all():
+            df[col] = to_key(df[col])
+    if "state_po" in df.columns:
+        df["state_po"] = df["state_po"].astype(str).astype(STATE_DTYPE)
+    if "winner" in df.columns:
+        df["winner"] = df["winner"].astype(str).astype(WINNER_DTYPE)
+    if "party" in df.columns:
+        df["party"] = df["party"].astype(PARTY_DTYPE)
+    for col in SHARE_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("float32")
+    return df
+
+
+def export_frame(df, fips_width=COUNTY_FIPS_WIDTH):
+    """Back to the published representation: zero-padded string FIPS, string years, plain strings, float64."""
+    df = df.copy()
+    for col in df.columns:
+        if col == "fips" and df[col].dtype.kind in "iu":
+            df[col] = df[col].astype(str).str.zfill(fips_width)
+        elif col == "year" and df[col].dtype.kind in "iu":
+            df[col] = df[col].astype(str)
+        elif isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(str)
+        elif df[col].dtype == "float32":
+            # float32 shares hold at most two decimals; round away the binary widening noise
+            df[col] = df[col].astype("float64").round(4)
+    return df
@@ -0,0 +1,263 @@
+"""
+Read-only HTTP API over the processed county and state results.
+
+Both datasets are loaded once at startup into dictionaries keyed by FIPS, state and year, so every
+query is a dictionary lookup or one vectorized pass over a county x year margin matrix. Rendered responses are kept in an LRU
+cache together with their gzip body and ETag; the gzip body is tagged with the ETag plus "-gz", since it is a
+separate representation, and every response varies on Accept-Encoding. Unknown paths get 404 and unusable query parameters 400; neither is
+cached.
+
+    python -m elections.server --port 8000
+
+Routes:
+    /counties/{fips}                       one county, every year
+    /counties/{fips}/{year}                one county-year
+    /years/{year}/counties?state=PA        every county in a year, optionally one state
+    /states/{state}                        one state (postal code or FIPS), every year
+    /states/{state}/{year}                 one state-year
+    /shifts?from=2020&to=2024&n=10         counties with the largest margin shift
+            &direction=rep|dem|abs&state=PA
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from elections.data import load_county_results, load_state_results
+from elections.schema import STATE_FIPS_WIDTH, export_frame
+
+# Responses smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
+
+
+class BadRequest(ValueError):
+    """A query parameter that can't be used; answered with 400."""
+
+
+def _int_param(query, name, default):
+    try:
+        return int(query.get(name, default))
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer") from None
+
+
+def _records(df):
+    # JSON-safe records: NaN becomes null
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+class ResultsIndex:
+    """In-memory indexes over the county and state results."""
+
+    def __init__(self, counties, states):
+        # Responses use the published representation (zero-padded FIPS, string years)
+        counties = export_frame(counties.sort_values(["fips", "year"]))
+        states = export_frame(states.sort_values(["fips", "year"]), fips_width=STATE_FIPS_WIDTH)
+
+        self.county_history = {}
+        self.county_year = {}
+        self.year_counties = {}
+        for row in _records(counties):
+            self.county_history.setdefault(row["fips"], []).append(row)
+            self.county_year[(row["fips"], row["year"])] = row
+            self.year_counties.setdefault(row["year"], []).append(row)
+
+        self.state_history = {}
+        self.state_year = {}
+        self.state_fips = {}
+        for row in _records(states):
+            self.state_history.setdefault(row["state_po"], []).append(row)
+            self.state_year[(row["state_po"], row["year"])] = row
+            self.state_fips[row["fips"]] = row["state_po"]
+
+        # County x year margin matrix for shift queries
+        margins = counties.pivot(index="fips", columns="year", values="margin")
+        self.shift_fips = margins.index.to_numpy()
+        self.shift_states = (
+            counties.drop_duplicates("fips").set_index("fips")["state_po"].reindex(margins.index).to_numpy()
+        )
+        self.shift_years = {year: i for i, year in enumerate(margins.columns)}
+        self.margins = margins.to_numpy(dtype="float64")
+
+    @classmethod
+    def load(cls):
+        return cls(load_county_results(), load_state_results())
+
+    def state_key(self, state):
+        state = state.upper()
+        return self.state_fips.get(state.zfill(2), state)
+
+    def shifts(self, year_from, year_to, n=10, direction="abs", state=None):
+        if year_from not in self.shift_years or year_to not in self.shift_years:
+            return None
+        diff = self.margins[:, self.shift_years[year_to]] - self.margins[:, self.shift_years[year_from]]
+        keep = ~np.isnan(diff)
+        if state is not None:
+            keep &= self.shift_states == self.state_key(state)
+        # Positive margin shifts are toward the Republican, negative toward the Democrat
+        score = {"rep": diff, "dem": -diff, "abs": np.abs(diff)}[direction]
+        score = np.where(keep, score, -np.inf)
+        n = max(0, min(n, int(keep.sum())))
+        top = np.argpartition(-score, n - 1)[:n] if n else np.array([], dtype=int)
+        top = top[np.argsort(-score[top], kind="stable")]
+        return [
+            {
+                "fips": self.shift_fips[i],
+                "state_po": self.shift_states[i],
+                f"margin_{year_from}": float(self.margins[i, self.shift_years[year_from]]),
+                f"margin_{year_to}": float(self.margins[i, self.shift_years[year_to]]),
+                "margin_diff": round(float(diff[i]), 2),
+            }
+            for i in top
+        ]
+
+    def route(self, path, query):
+        parts = [p for p in path.split("/") if p]
+        match parts:
+            case ["counties", fips]:
+                return self.county_history.get(fips.zfill(5))
+            case ["counties", fips, year]:
+                return self.county_year.get((fips.zfill(5), year))
+            case ["years", year, "counties"]:
+                rows = self.year_counties.get(year)
+                if rows is not None and "state" in query:
+                    state = self.state_key(query["state"])
+                    rows = [r for r in rows if r["state_po"] == state]
+                return rows
+            case ["states", state]:
+                return self.state_history.get(self.state_key(state))
+            case ["states", state, year]:
+                return self.state_year.get((self.state_key(state), year))
+            case ["shifts"]:
+                direction = query.get("direction", "abs")
+                if direction not in ("rep", "dem", "abs"):
+                    raise BadRequest("direction must be rep, dem or abs")
+                return self.shifts(
+                    query.get("from", "2020"),
+                    query.get("to", "2024"),
+                    n=_int_param(query, "n", 10),
+                    direction=direction,
+                    state=query.get("state"),
+                )
+        return None
+
+
+class ResponseCache:
+    """Thread-safe LRU of rendered responses: (status, body, gzip body, etag)."""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+def render(index, target):
+    url = urlsplit(target)
+    query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+    try:
+        payload = index.route(url.path, query)
+    except BadRequest as e:
+        return 400, json.dumps({"error": str(e)}).encode(), None, None
+    except ValueError:
+        payload = None
+    if payload is None:
+        return 404, b'{"error": "not found"}', None, None
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+    gzipped = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None
+    return 200, body, gzipped, etag
+
+
+def make_handler(index, cache):
+    class ResultsHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; without this, delayed ACKs add ~40 ms per request
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            entry = cache.get(self.path)
+            if entry is None:
+                entry = render(index, self.path)
+                # Only successful responses are cached, so arbitrary bad URLs can't fill the cache
+                if entry[0] == 200:
+                    cache.put(self.path, entry)
+            status, body, gzipped, etag = entry
+
+            encoding = None
+            if gzipped is not None and "gzip" in self.headers.get("Accept-Encoding", ""):
+                body = gzipped
+                encoding = "gzip"
+                # Each encoding is its own representation, so a cache holding one can't revalidate the other
+                etag = etag[:-1] + '-gz"'
+
+            if etag is not None and etag in self.headers.get("If-None-Match", "").replace(" ", "").split(","):
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Vary", "Accept-Encoding")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "public, max-age=300" if status == 200 else "no-store")
+            self.send_header("Vary", "Accept-Encoding")
+            if etag is not None:
+                self.send_header("ETag", etag)
+            if encoding is not None:
+                self.send_header("Content-Encoding", encoding)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Access logging dominates request time under load
+            pass
+
+    return ResultsHandler
+
+
+def serve(host="127.0.0.1", port=8000, cache_size=4096):
+    index = ResultsIndex.load()
+    server = ThreadingHTTPServer((host, port), make_handler(index, ResponseCache(cache_size)))
+    print(f"Serving {len(index.county_history)} counties and {len(index.state_history)} states on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cache-size", type=int, default=4096, help="number of responses kept in the LRU cache")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.cache_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Monte Carlo uniform-swing simulations on the statewide results.
+
+Each simulation shifts every state's base-year margin (Republican minus Democratic share, in points) by a
+national swing, a swing shared by the state's Census region and an independent state swing, all normally
+distributed. States go to whichever party leads after the swing and electoral votes are tallied from the
+bundled apportionment table. Simulations run as (simulations x states) arrays in chunks, so memory stays
+bounded, and the chunks can be spread over processes.
+
+    python -m elections.simulate --base-year 2024 --simulations 1000000 --processes 4
+
+Maine's and Nebraska's district electors and third-party candidates are not modeled; each state's electors
+go to whichever major party leads there.
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from elections.data import load_electoral_votes, load_state_results
+from elections.regions import CENSUS_REGIONS, REGIONS
+
+
+def base_margins(base_year, ev_year=None):
+    """Base-year margins joined to the electoral votes in effect for ev_year (defaults to base_year)."""
+    results = load_state_results(years=[base_year], columns=["state_po", "dem_pct", "rep_pct"])
+    ev = load_electoral_votes(years=[ev_year or base_year])[["state_po", "electoral_votes"]]
+    states = results.merge(ev, on="state_po", how="inner").sort_values("fips").reset_index(drop=True)
+    states["margin"] = states["rep_pct"] - states["dem_pct"]
+    states["region"] = states["state_po"].astype(str).map(CENSUS_REGIONS)
+    return states[["fips", "state_po", "region", "electoral_votes", "margin"]]
+
+
+def _simulate_chunk(margin, ev, region_idx, n, national_sd, regional_sd, state_sd, seed):
+    rng = np.random.default_rng(seed)
+    n_states = len(margin)
+    majority = ev.sum() // 2 + 1
+
+    national = rng.standard_normal((n, 1), dtype=np.float32) * national_sd
+    regional = rng.standard_normal((n, len(REGIONS)), dtype=np.float32) * regional_sd
+    state = rng.standard_normal((n, n_states), dtype=np.float32) * state_sd
+    sims = margin + national + regional[:, region_idx] + state
+
+    rep_states = sims > 0
+    rep_ev = rep_states.astype(np.int32) @ ev
+    total_ev = ev.sum()
+    dem_ev = total_ev - rep_ev
+
+    # Tipping point: order states from the winner's best to worst margin and find where the winner's
+    # running electoral-vote total first reaches a majority
+    winner_sign = np.where(rep_ev >= majority, 1.0, -1.0).astype(np.float32)
+    order = np.argsort(-(sims * winner_sign[:, None]), axis=1)
+    running = np.cumsum(ev[order], axis=1)
+    tipping = np.take_along_axis(order, np.argmax(running >= majority, axis=1)[:, None], axis=1)[:, 0]
+    decided = (rep_ev >= majority) | (dem_ev >= majority)
+
+    return {
+        "n": n,
+        "rep_wins": int((rep_ev >= majority).sum()),
+        "dem_wins": int((dem_ev >= majority).sum()),
+        "rep_state_wins": rep_states.sum(axis=0),
+        "tipping_counts": np.bincount(tipping[decided], minlength=n_states),
+        "rep_ev_counts": np.bincount(rep_ev, minlength=total_ev + 1),
+    }
+
+
+def _run_chunk(args):
+    return _simulate_chunk(*args)
+
+
+def simulate(
+    base_year=2024,
+    simulations=100_000,
+    national_sd=3.0,
+    regional_sd=1.5,
+    state_sd=3.0,
+    ev_year=None,
+    chunk_size=100_000,
+    processes=None,
+    seed=0,
+):
+    """
+    Run uniform-swing simulations from base_year's state margins.
+
+    Swing standard deviations are in margin points. Returns a dict with a one-row "summary" frame,
+    a per-state "states" frame (Republican win and tipping-point probabilities) and the
+    "electoral_votes" distribution of Republican electoral votes.
+    """
+    states = base_margins(base_year, ev_year)
+    margin = states["margin"].to_numpy(np.float32)
+    ev = states["electoral_votes"].to_numpy(np.int32)
+    region_idx = states["region"].map(REGIONS.index).to_numpy()
+
+    sizes = [chunk_size] * (simulations // chunk_size)
+    if simulations % chunk_size:
+        sizes.append(simulations % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(margin, ev, region_idx, n, national_sd, regional_sd, state_sd, s) for n, s in zip(sizes, seeds)]
+
+    if processes and processes > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            chunks = list(pool.map(_run_chunk, jobs))
+    else:
+        chunks = [_run_chunk(job) for job in jobs]
+
+    rep_wins = sum(c["rep_wins"] for c in chunks)
+    dem_wins = sum(c["dem_wins"] for c in chunks)
+    rep_ev_counts = np.sum([c["rep_ev_counts"] for c in chunks], axis=0)
+    rep_ev_values = np.arange(len(rep_ev_counts))
+
+    summary = pd.DataFrame(
+        [
+            {
+                "base_year": int(base_year),
+                "simulations": simulations,
+                "rep_win_prob": rep_wins / simulations,
+                "dem_win_prob": dem_wins / simulations,
+                "tie_prob": 1 - (rep_wins + dem_wins) / simulations,
+                "rep_ev_mean": float((rep_ev_values * rep_ev_counts).sum() / simulations),
+            }
+        ]
+    )
+
+    states = states.copy()
+    states["rep_win_prob"] = np.sum([c["rep_state_wins"] for c in chunks], axis=0) / simulations
+    states["tipping_point_prob"] = np.sum([c["tipping_counts"] for c in chunks], axis=0) / simulations
+
+    return {
+        "summary": summary,
+        "states": states.sort_values("tipping_point_prob", ascending=False).reset_index(drop=True),
+        "electoral_votes": pd.Series(rep_ev_counts / simulations, index=rep_ev_values, name="rep_ev_prob"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-year", type=int, default=2024)
+    parser.add_argument("--ev-year", type=int, default=None, help="election year whose apportionment to use")
+    parser.add_argument("--simulations", type=int, default=100_000)
+    parser.add_argument("--national-sd", type=float, default=3.0)
+    parser.add_argument("--regional-sd", type=float, default=1.5)
+    parser.add_argument("--state-sd", type=float, default=3.0)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    result = simulate(
+        base_year=args.base_year,
+        simulations=args.simulations,
+        national_sd=args.national_sd,
+        regional_sd=args.regional_sd,
+        state_sd=args.state_sd,
+        ev_year=args.ev_year,
+        chunk_size=args.chunk_size,
+        processes=args.processes,
+        seed=args.seed,
+    )
+    print(result["summary"].to_string(index=False))
+    print()
+    print(result["states"].head(10).round(3).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
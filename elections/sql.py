@@ -0,0 +1,292 @@
+"""
+DuckDB backend for the processing stages.
+
+With ELECTIONS_BACKEND=duckdb, 00_process_results.py, 02_apply_population_results.py and
+04_analyze_results.py run their filters, groupbys, pivots and joins as DuckDB queries instead of pandas.
+The queries scan the raw CSV, the population JSON and the year-partitioned Parquet store directly, use every
+core, and spill to disk past ELECTIONS_DUCKDB_MEMORY (DuckDB defaults to 80% of RAM), so precinct-scale input never has
+to fit in a DataFrame. Only the county-level results come back into pandas, and the scripts write them with
+the same export code as the pandas path, so the two backends produce byte-identical files.
+
+    python -m elections.sql
+
+copies the inputs to scratch directories, runs the three scripts under both backends, compares every output
+byte for byte and prints the timings. With --check it runs on the small fixture in data/fixtures/backends
+instead (a few counties in every year, with vote modes, ties, rows without a county and stale county codes),
+so parity can be checked in seconds without the raw data; either way it exits non-zero when outputs differ.
+
+    python -m elections.sql --check
+"""
+
+import argparse
+import filecmp
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from elections.data import COUNTY_RESULTS_STORE, _ensure_county_store
+from elections.schema import apply_schema
+
+BACKEND = os.environ.get("ELECTIONS_BACKEND", "pandas")
+
+# Census whose population is attached to each election year
+CENSUS_FOR_YEAR = {2000: 2000, 2004: 2000, 2008: 2010, 2012: 2010, 2016: 2010, 2020: 2020, 2024: 2020}
+
+
+def connect(threads=None, memory_limit=None):
+    import duckdb
+
+    con = duckdb.connect()
+    con.execute(f"SET threads = {threads or os.cpu_count()}")
+    memory_limit = memory_limit or os.environ.get("ELECTIONS_DUCKDB_MEMORY")
+    if memory_limit:
+        con.execute(f"SET memory_limit = '{memory_limit}'")
+    con.execute(f"SET temp_directory = '{tempfile.gettempdir()}/elections_duckdb'")
+    return con
+
+
+def _like_pandas(df):
+    # DuckDB hands back nullable Int64; pandas would have produced float64 with NaN, or int64 without gaps
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.Int64Dtype):
+            df[col] = df[col].astype("float64") if df[col].isna().any() else df[col].astype("int64")
+    return df
+
+
+def county_votes(con, raw_csv):
+    """
+    Democratic, Republican and total votes per county and year from the raw MIT file.
+
+    Same rows, order and dtypes as the pandas aggregation and pivot in 00_process_results.py.
+    """
+    df = con.execute(
+        """
+        WITH src AS (
+            SELECT
+                CAST(year AS INTEGER) AS year,
+                state,
+                state_po,
+                county_name,
+                CAST(county_fips AS INTEGER) AS fips,
+                replace(replace(candidate, 'JOSEPH R BIDEN JR', 'JOE BIDEN'), 'J TRUMP', 'TRUMP') AS candidate,
+                party,
+                candidatevotes,
+                totalvotes
+            FROM read_csv(?, header = true, types = {'county_fips': 'VARCHAR', 'year': 'VARCHAR', 'version': 'VARCHAR'})
+            WHERE party IN ('DEMOCRAT', 'REPUBLICAN') AND totalvotes > 0 AND county_fips IS NOT NULL
+        ),
+        -- Sum vote modes (early, provisional, election day, ...) per candidate
+        by_candidate AS (
+            SELECT year, state_po, county_name, fips, party, sum(candidatevotes) AS votes, avg(totalvotes) AS total
+            FROM src
+            WHERE state IS NOT NULL AND state_po IS NOT NULL AND county_name IS NOT NULL AND candidate IS NOT NULL
+            GROUP BY year, state, state_po, county_name, fips, candidate, party
+        )
+        SELECT
+            fips,
+            county_name,
+            state_po,
+            year,
+            -- The pandas pivot shares one float block between vote counts and the averaged totals
+            CAST(sum(votes) FILTER (WHERE party = 'DEMOCRAT') AS DOUBLE) AS votes_dem,
+            CAST(sum(votes) FILTER (WHERE party = 'REPUBLICAN') AS DOUBLE) AS votes_rep,
+            any_value(total) FILTER (WHERE party = 'DEMOCRAT') AS votes_all
+        FROM by_candidate
+        GROUP BY fips, county_name, state_po, year
+        ORDER BY fips, county_name, state_po, year
+        """,
+        [str(raw_csv)],
+    ).df()
+    return apply_schema(_like_pandas(df))
+
+
+def attach_population(con, election_data, population_paths):
+    """
+    Attach each county's census population to its election rows, like merge_population in
+    02_apply_population_results.py: one row per (year, fips), the last duplicate kept, years without a census
+    mapping dropped.
+    """
+    con.register("election", election_data.reset_index(names="_row"))
+    census = pd.DataFrame(list(CENSUS_FOR_YEAR.items()), columns=["year", "census_year"])
+    con.register("census", census)
+    columns = ", ".join(f"e.{col}" for col in election_data.columns)
+    df = con.execute(
+        f"""
+        WITH population AS (
+            SELECT
+                CAST(fips AS INTEGER) AS fips,
+                CAST(year AS INTEGER) AS census_year,
+                CAST(population AS BIGINT) AS population,
+                CAST(white_alone AS BIGINT) AS white_alone,
+                CAST(white_alone_pct AS DOUBLE) AS white_alone_pct
+            FROM read_json(?, columns = {{
+                'fips': 'VARCHAR', 'year': 'VARCHAR', 'population': 'VARCHAR',
+                'white_alone': 'VARCHAR', 'white_alone_pct': 'DOUBLE'
+            }})
+        ),
+        deduplicated AS (
+            SELECT * FROM election
+            QUALIFY row_number() OVER (PARTITION BY year, fips ORDER BY _row DESC) = 1
+        )
+        SELECT {columns}, p.population, p.white_alone, p.white_alone_pct
+        FROM deduplicated e
+        JOIN census c ON c.year = e.year
+        LEFT JOIN population p ON p.fips = e.fips AND p.census_year = c.census_year
+        ORDER BY e.year, e.fips
+        """,
+        [[str(path) for path in population_paths]],
+    ).df()
+    con.unregister("election")
+    con.unregister("census")
+    return apply_schema(_like_pandas(df))
+
+
+def election_metrics(con, store=COUNTY_RESULTS_STORE):
+    """Per-year county and population split by winning party, as 04_analyze_results.py computes it."""
+    _ensure_county_store()
+    df = con.execute(
+        """
+        WITH counties AS (
+            SELECT
+                CAST(year AS BIGINT) AS year,
+                -- Ties go to the Democrat, as in the pandas path
+                coalesce(votes_rep > votes_dem, false) AS rep,
+                population,
+                CAST(white_alone_pct AS DOUBLE) * population AS white_alone
+            FROM read_parquet(?, hive_partitioning = true)
+        ),
+        totals AS (
+            SELECT
+                year,
+                count(*) FILTER (WHERE rep) AS num_r_counties,
+                count(*) FILTER (WHERE NOT rep) AS num_d_counties,
+                coalesce(sum(population) FILTER (WHERE rep), 0) AS pop_r_counties,
+                coalesce(sum(population) FILTER (WHERE NOT rep), 0) AS pop_d_counties,
+                coalesce(sum(population), 0) AS total_population,
+                sum(white_alone) FILTER (WHERE rep) AS white_r,
+                sum(white_alone) FILTER (WHERE NOT rep) AS white_d
+            FROM counties
+            GROUP BY year
+        )
+        SELECT
+            year,
+            num_r_counties,
+            num_d_counties,
+            num_r_counties / (num_r_counties + num_d_counties) AS share_r_counties,
+            num_d_counties / (num_r_counties + num_d_counties) AS share_d_counties,
+            pop_r_counties,
+            pop_d_counties,
+            pop_r_counties / total_population AS share_r_population,
+            pop_d_counties / total_population AS share_d_population,
+            white_r / pop_r_counties AS pct_white_r_counties,
+            white_d / pop_d_counties AS pct_white_d_counties
+        FROM totals
+        ORDER BY year
+        """,
+        [f"{store}/**/*.parquet"],
+    ).df()
+    # Round the way the pandas path does: Python round() for the county shares, numpy for the rest
+    for col in ["share_r_counties", "share_d_counties"]:
+        df[col] = [round(value, 2) for value in df[col]]
+    rest = ["pop_r_counties", "pop_d_counties", "share_r_population", "share_d_population",
+            "pct_white_r_counties", "pct_white_d_counties"]
+    df[rest] = df[rest].round(2)
+    return _like_pandas(df)
+
+
+# Inputs each scratch directory needs, relative to the data directory, and the files the scripts write
+COMPARE_INPUTS = [
+    "raw/countypres_2000-2020.csv",
+    "processed/presidential_county_results_2024.json",
+    "processed/county_population_census_2000.json",
+    "processed/county_population_census_2010.json",
+    "processed/county_population_census_2020.json",
+]
+COMPARE_SCRIPTS = ["00_process_results.py", "02_apply_population_results.py", "04_analyze_results.py"]
+COMPARE_OUTPUTS = [
+    "processed/presidential_county_results.json",
+    "processed/presidential_county_change_2016_2020.json",
+    "processed/presidential_election_results_by_state_2024.json",
+    "processed/presidential_county_results_with_population.json",
+    "processed/election_metrics_by_year.json",
+]
+
+
+# Small inputs in the same layout, for --check
+FIXTURE_DIR = Path(__file__).resolve().parent.parent / "data" / "fixtures" / "backends"
+
+
+def _scratch_copy(data_dir, workdir):
+    for rel in COMPARE_INPUTS:
+        source = Path(data_dir) / rel
+        if source.exists():
+            target = workdir / "data" / rel
+            target.parent.mkdir(parents=True, exist_ok=True)
+            # The raw file can be large; the scripts only read it
+            os.symlink(source.resolve(), target)
+
+
+def compare_backends(data_dir="data", repeat=1, require_outputs=False):
+    """
+    Run the scripts under both backends in scratch copies; returns {script: {backend: seconds}}, mismatches.
+
+    With require_outputs, an output neither backend wrote is a mismatch too (the fixture has every input).
+    """
+    root = Path(__file__).resolve().parent.parent
+    timings = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        workdirs = {}
+        for backend in ["pandas", "duckdb"]:
+            workdir = workdirs[backend] = Path(scratch) / backend
+            _scratch_copy(data_dir, workdir)
+            env = {
+                **os.environ,
+                "ELECTIONS_BACKEND": backend,
+                "ELECTIONS_DATA_DIR": str(workdir / "data"),
+                "PYTHONPATH": os.pathsep.join(filter(None, [str(root), os.environ.get("PYTHONPATH")])),
+            }
+            for script in COMPARE_SCRIPTS:
+                best = float("inf")
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    subprocess.run(
+                        [sys.executable, str(root / script)], cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL
+                    )
+                    best = min(best, time.perf_counter() - started)
+                timings.setdefault(script, {})[backend] = best
+        mismatches = []
+        for rel in COMPARE_OUTPUTS:
+            pandas_out, duckdb_out = (workdirs[backend] / "data" / rel for backend in ["pandas", "duckdb"])
+            if pandas_out.exists() != duckdb_out.exists() or require_outputs and not pandas_out.exists():
+                mismatches.append(rel)
+            elif pandas_out.exists() and not filecmp.cmp(pandas_out, duckdb_out, shallow=False):
+                mismatches.append(rel)
+        shutil.rmtree(Path(tempfile.gettempdir()) / "elections_duckdb", ignore_errors=True)
+    return timings, mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default=os.environ.get("ELECTIONS_DATA_DIR", "data"))
+    parser.add_argument("--repeat", type=int, default=1, help="runs per script and backend; the best is reported")
+    parser.add_argument("--check", action="store_true", help=f"compare on the fixture in {FIXTURE_DIR.relative_to(FIXTURE_DIR.parents[2])}")
+    args = parser.parse_args(argv)
+
+    timings, mismatches = compare_backends(FIXTURE_DIR if args.check else args.data_dir, args.repeat, require_outputs=args.check)
+    print(f"{'script':<36}{'pandas':>10}{'duckdb':>10}")
+    for script, took in timings.items():
+        print(f"{script:<36}{took['pandas']:>9.2f}s{took['duckdb']:>9.2f}s")
+    if mismatches:
+        print("outputs differ: " + ", ".join(mismatches))
+        sys.exit(1)
+    print("outputs identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Memory-mapped (county x year x field) array of the merged county results, shared by every process that opens it.
+
+The numeric fields of the merged county file (votes, shares, margin, population, white_alone_pct) are stored as
+one dense float32 array in .npy format, with sorted FIPS and year indexes beside it. Opening the store maps the
+file rather than reading it: it takes well under a millisecond, nothing is parsed or copied, and every process
+that opens the same store shares the operating system's page cache instead of holding its own copy of the
+frame. Worker processes are handed the store's path, not the data. Counties missing in a year are NaN. Saves are
+swapped in whole (CountyTensor.save), so readers never see a store half written.
+
+02_apply_population_results.py builds the store; load_tensor rebuilds it if the merged county file is newer.
+
+    from elections.tensor import load_tensor
+    tensor = load_tensor()
+    tensor.get(42049, 2024, "margin")
+    tensor.field("margin")              # (counties, years) view, no copy
+    tensor.year(2024)                   # (counties, fields) view
+
+    python -m elections.tensor --benchmark --processes 4
+    python -m elections.tensor --check  # exits non-zero if saving doesn't keep the version before
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from elections.data import COUNTY_RESULTS_JSON, PROCESSED_DIR, _is_stale, load_county_results
+
+TENSOR_DIR = PROCESSED_DIR / "county_tensor"
+
+FIELDS = ["votes_dem", "votes_rep", "votes_all", "dem_pct", "rep_pct", "margin", "population", "white_alone_pct"]
+
+
+class CountyTensor:
+    """values[county, year, field] with dict indexes for each axis; values may be a read-only memmap."""
+
+    def __init__(self, fips, years, fields, values):
+        self.fips = np.asarray(fips)
+        self.years = np.asarray(years)
+        self.fields = list(fields)
+        self.values = values
+        self.field_index = {name: k for k, name in enumerate(self.fields)}
+
+    @classmethod
+    def from_frame(cls, df, fields=FIELDS):
+        """Dense array of df's fields; (year, fips) pairs must be unique."""
+        fips = np.unique(df["fips"].to_numpy())
+        years = np.unique(df["year"].to_numpy())
+        values = np.full((len(fips), len(years), len(fields)), np.nan, dtype=np.float32)
+        values[np.searchsorted(fips, df["fips"].to_numpy()), np.searchsorted(years, df["year"].to_numpy())] = (
+            df[fields].to_numpy("float32")
+        )
+        return cls(fips.astype(np.int32), years.astype(np.int32), fields, values)
+
+    @classmethod
+    def open(cls, path=TENSOR_DIR):
+        """Map a saved store read-only."""
+        # Resolved once, so every file comes from the same save even if another one swaps the link meanwhile
+        path = Path(path).resolve()
+        fields = json.loads((path / "fields.json").read_text())
+        return cls(
+            np.load(path / "fips.npy"),
+            np.load(path / "years.npy"),
+            fields,
+            np.load(path / "values.npy", mmap_mode="r"),
+        )
+
+    def save(self, path=TENSOR_DIR):
+        """
+        Write the store to a new directory beside path and swap path (a symlink to it) over in one rename.
+
+        A process opening the store sees the old files or the new ones, never a mix. The directory of the store
+        before is kept for anyone who resolved the link just before the swap; older ones are removed.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Absolute, so the versions compare equal to previous (resolved through the link) when pruning
+        path = path.parent.resolve() / path.name
+        version = Path(tempfile.mkdtemp(dir=path.parent, prefix=f".{path.name}."))
+        os.chmod(version, 0o755)
+        np.save(version / "fips.npy", self.fips)
+        np.save(version / "years.npy", self.years)
+        (version / "fields.json").write_text(json.dumps(self.fields))
+        np.save(version / "values.npy", np.ascontiguousarray(self.values))
+
+        previous = path.resolve() if path.is_symlink() else None
+        if path.is_dir() and not path.is_symlink():
+            # A store written in place, before saves were swapped in
+            shutil.rmtree(path)
+        link = version.with_name(version.name + ".link")
+        os.symlink(version.name, link)
+        os.replace(link, path)
+        for stale in path.parent.glob(f".{path.name}.*"):
+            if stale.is_dir() and stale not in (version, previous):
+                shutil.rmtree(stale, ignore_errors=True)
+
+    def rows(self, fips):
+        """Positions of fips codes on the county axis; KeyError for codes not in the store."""
+        fips = np.atleast_1d(np.asarray(fips, dtype=self.fips.dtype))
+        rows = np.searchsorted(self.fips, fips).clip(max=len(self.fips) - 1)
+        missing = self.fips[rows] != fips
+        if missing.any():
+            raise KeyError(f"county fips not in store: {fips[missing][:5].tolist()}")
+        return rows
+
+    def columns(self, years):
+        years = np.atleast_1d(np.asarray(years, dtype=self.years.dtype))
+        cols = np.searchsorted(self.years, years).clip(max=len(self.years) - 1)
+        missing = self.years[cols] != years
+        if missing.any():
+            raise KeyError(f"years not in store: {years[missing].tolist()}")
+        return cols
+
+    def get(self, fips, year, field):
+        return float(self.values[self.rows(fips)[0], self.columns(year)[0], self.field_index[field]])
+
+    def field(self, name):
+        """(counties, years) view of one field."""
+        return self.values[:, :, self.field_index[name]]
+
+    def year(self, year):
+        """(counties, fields) view of one year."""
+        return self.values[:, self.columns(year)[0], :]
+
+    def select(self, fips=None, years=None, fields=None):
+        """Block of the array for the given codes, years and fields (all of an axis when None); a copy."""
+        rows = self.rows(fips) if fips is not None else slice(None)
+        cols = self.columns(years) if years is not None else slice(None)
+        ks = [self.field_index[name] for name in fields] if fields is not None else slice(None)
+        block = self.values[rows][:, cols][:, :, ks]
+        return np.asarray(block)
+
+    def to_frame(self, years=None, fields=None):
+        """Long frame (fips, year, fields...) of the counties present in each year."""
+        cols = self.columns(years) if years is not None else np.arange(len(self.years))
+        fields = list(fields) if fields is not None else self.fields
+        block = self.select(years=self.years[cols], fields=fields).transpose(1, 0, 2).reshape(-1, len(fields))
+        frame = pd.DataFrame(block, columns=fields)
+        frame.insert(0, "year", np.repeat(self.years[cols], len(self.fips)))
+        frame.insert(0, "fips", np.tile(self.fips, len(cols)))
+        # A county is absent from a year when it has no votes there
+        present = ~np.isnan(self.select(years=self.years[cols], fields=["votes_all"]).T.ravel())
+        return frame[present].reset_index(drop=True)
+
+
+def build_tensor(df=None, path=TENSOR_DIR):
+    """Build the store from the merged county results (or df) and save it."""
+    if df is None:
+        df = load_county_results(columns=FIELDS)
+    tensor = CountyTensor.from_frame(df)
+    tensor.save(path)
+    return tensor
+
+
+def load_tensor(path=TENSOR_DIR):
+    """Map the store, rebuilding it first if the merged county results are newer."""
+    if _is_stale(Path(path) / "values.npy", COUNTY_RESULTS_JSON):
+        build_tensor(path=path)
+    return CountyTensor.open(path)
+
+
+def _private_kb():
+    """Memory this process holds privately (heap and dirty pages), in KB; peak RSS where /proc is unavailable."""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            return sum(int(line.split()[1]) for line in f if line.startswith(("Private_Dirty", "Private_Hugetlb")))
+    except OSError:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _worker(args):
+    """Open the county data one way and compute each year's mean county margin; returns (ms, KB of private memory added)."""
+    source, path = args
+    before = _private_kb()
+    started = time.perf_counter()
+    if source == "tensor":
+        margins = np.nanmean(CountyTensor.open(path).field("margin"), axis=0)
+    else:
+        df = load_county_results(columns=FIELDS)
+        margins = df.groupby("year")["margin"].mean().to_numpy()
+    took = (time.perf_counter() - started) * 1000
+    del margins
+    return took, _private_kb() - before
+
+
+def benchmark(path=TENSOR_DIR, processes=4):
+    """Per-worker open time and private memory of the mapped store against loading the county frame."""
+    load_tensor(path)
+    rows = []
+    for source in ["tensor", "frame"]:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(_worker, [(source, path)] * processes))
+        ms, kb = np.array(results, dtype="float64").T
+        rows.append(
+            {"source": source, "processes": processes, "ms_per_worker": ms.mean(), "private_mb_per_worker": kb.mean() / 1024}
+        )
+    return pd.DataFrame(rows)
+
+
+def check_saves():
+    """
+    Save a small store three times in a scratch directory and check each save's versions: the store opens to
+    the latest, a store mapped before a save stays readable and the version before is pruned only on the next
+    save. Raises AssertionError on the first failure.
+    """
+    with tempfile.TemporaryDirectory() as scratch:
+        # Relative, like TENSOR_DIR
+        path = Path(os.path.relpath(Path(scratch) / "county_tensor"))
+        versions, mapped = [], []
+        for k in range(3):
+            CountyTensor([1001, 1003], [2024], ["margin"], np.full((2, 1, 1), k, dtype=np.float32)).save(path)
+            versions.append(path.resolve())
+            mapped.append(CountyTensor.open(path))
+            assert float(mapped[-1].values.sum()) == 2 * k, f"save {k}: store doesn't open to the latest values"
+            if k:
+                assert versions[k - 1].is_dir(), f"save {k}: the version before was removed"
+                assert float(mapped[k - 1].values.sum()) == 2 * (k - 1), f"save {k}: a mapped store changed"
+            if k > 1:
+                assert not versions[k - 2].exists(), f"save {k}: an older version was kept"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--benchmark", action="store_true", help="compare workers opening the store with loading the frame")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--check", action="store_true", help="check that saves swap versions in safely, then exit")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        check_saves()
+        print("County tensor saves: ok")
+        return
+
+    tensor = build_tensor()
+    print(f"County tensor saved to {TENSOR_DIR}: {len(tensor.fips)} counties x {len(tensor.years)} years x {len(tensor.fields)} fields")
+    if args.benchmark:
+        print(benchmark(processes=args.processes).round(2).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Integrity checks over the merged county results, run as a pipeline stage after 02_apply_population_results.py.
+
+Every check is a column expression over the full table (or one grouped sum), so the whole suite runs in
+milliseconds and can follow every refresh:
+
+- votes are non-negative and Democratic plus Republican votes don't exceed the total
+- each (year, fips) appears once
+- shares and margins match the votes they were computed from, and the winner matches the shares
+- every county code in a year's results is in its census (carried into that year's codes), census counties
+  without a result are reported, and every county has a population
+- county votes summed by state agree with the statewide results scraped by 07_fetch_state_results.py (an
+  error for states with every county reporting, a warning for the rest)
+
+Failures of error checks make the command exit with status 1, which stops `elections` before the next stage;
+warnings are reported only. --warn-only (or ELECTIONS_VALIDATE=warn) reports errors without failing. The report is written as JSON with the failing rows' keys as examples.
+
+    python -m elections.validate
+    elections validate
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from elections.crosswalk import load_crosswalk
+from elections.data import PROCESSED_DIR, load_county_results, load_state_results
+from elections.schema import to_key
+from elections.sql import CENSUS_FOR_YEAR
+
+REPORT_JSON = PROCESSED_DIR / "validation_report.json"
+
+# Shares are stored to two decimals, and 2024's come from three-decimal proportions
+SHARE_TOLERANCE = 0.06
+# Relative difference allowed between summed county votes and the statewide scrape
+STATE_TOLERANCE = 0.005
+# Maine counts overseas and military ballots statewide only, about 1.2% of its 2024 vote
+STATE_TOLERANCES = {"ME": 0.015}
+EXAMPLES = 10
+
+# Result codes that aren't counties: Alaska reports by state house district (some district codes collide
+# with borough codes) and Kansas City, Missouri reports apart from the counties it spans
+ALASKA = 2
+KANSAS_CITY = 2938000
+# Census counties that never have a result of their own: Kalawao County, Hawaii, votes with Maui County
+NO_RESULT = [15005]
+
+
+def _non_county(fips):
+    fips = np.asarray(fips)
+    return (fips // 1000 == ALASKA) | (fips == KANSAS_CITY)
+
+
+def _result(name, severity, failed, keys, total, detail=""):
+    """One check's entry in the report; failed is a boolean mask over keys (a frame of identifying columns)."""
+    failed = np.asarray(failed, dtype=bool)
+    examples = keys[failed].head(EXAMPLES)
+    return {
+        "check": name,
+        "severity": severity,
+        "passed": not failed.any(),
+        "failures": int(failed.sum()),
+        "checked": int(total),
+        "detail": detail,
+        "examples": json.loads(examples.to_json(orient="records")),
+    }
+
+
+def check_counties(df, share_tolerance=SHARE_TOLERANCE):
+    """Row-level checks on the county table."""
+    keys = df[["year", "fips"]]
+    dem, rep, total = (df[col].to_numpy("float64") for col in ["votes_dem", "votes_rep", "votes_all"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dem_share = dem / total * 100
+        rep_share = rep / total * 100
+    dem_pct, rep_pct, margin = (df[col].to_numpy("float64") for col in ["dem_pct", "rep_pct", "margin"])
+    counted = total > 0
+    winner = df["winner"].astype(str).to_numpy()
+    expected_winner = np.where(dem_pct > rep_pct, "dem", np.where(rep_pct > dem_pct, "rep", "tie"))
+
+    return [
+        _result("votes_non_negative", "error", (dem < 0) | (rep < 0) | (total < 0), keys, len(df)),
+        _result("party_votes_within_total", "error", dem + rep > total, keys, len(df), "votes_dem + votes_rep <= votes_all"),
+        _result("unique_county_year", "error", df.duplicated(["year", "fips"], keep=False), keys, len(df)),
+        _result(
+            "shares_match_votes", "error",
+            counted & ((np.abs(dem_pct - dem_share) > share_tolerance) | (np.abs(rep_pct - rep_share) > share_tolerance)),
+            keys, counted.sum(), f"dem_pct and rep_pct within {share_tolerance} points of the vote counts",
+        ),
+        _result("margin_matches_shares", "error", np.abs(margin - (rep_pct - dem_pct)) > share_tolerance, keys, len(df)),
+        _result("winner_matches_shares", "error", winner != expected_winner, keys, len(df)),
+        _result("population_present", "warning", df["population"].isna().to_numpy(), keys, len(df)),
+    ]
+
+
+def _census_codes(census_codes, census_year, year):
+    """A census's county codes carried into an election year's codes through the crosswalk."""
+    return load_crosswalk().matrix(census_codes, census_year, year)[1]
+
+
+def _coverage(df, census):
+    """
+    Per election year with its census loaded: the year, its census year, the result codes that are counties
+    and the census codes (carried into the year's codes) expected to have a result, in the states the year's
+    results cover (not Puerto Rico or the other territories in the census files).
+    """
+    for year, census_year in CENSUS_FOR_YEAR.items():
+        counties = df.loc[df["year"] == year, "fips"].to_numpy()
+        if not len(counties) or census_year not in census:
+            continue
+        codes = _census_codes(census[census_year], census_year, year)
+        codes = codes[np.isin(codes // 1000, counties // 1000) & ~_non_county(codes) & ~np.isin(codes, NO_RESULT)]
+        yield year, census_year, counties[~_non_county(counties)], codes
+
+
+def check_census_coverage(df, census):
+    """
+    Each election year's county codes against its census (see _coverage): results without a census county (an
+    error, since they get no population) and census counties without a result.
+    """
+    results = []
+    for year, census_year, counties, codes in _coverage(df, census):
+        extra = pd.DataFrame({"year": year, "fips": counties[~np.isin(counties, codes)]})
+        missing = pd.DataFrame({"year": year, "fips": codes[~np.isin(codes, counties)]})
+        detail = f"county codes against the {census_year} census"
+        results.append(
+            _result(f"results_in_census_{year}", "error", np.ones(len(extra), dtype=bool), extra, len(counties), detail)
+        )
+        results.append(
+            _result(f"census_coverage_{year}", "warning", np.ones(len(missing), dtype=bool), missing, len(codes), detail)
+        )
+    return results
+
+
+def check_state_totals(df, states, census, tolerance=STATE_TOLERANCE):
+    """
+    County votes summed by state and year against the statewide scrape, for the years both cover.
+
+    A state whose counties all have results that year is an error if it is off; a state missing counties, or
+    in a year without its census loaded, can't be expected to add up and is only a warning.
+    """
+    summed = df.groupby(["year", "state_po"], observed=True)[["votes_dem", "votes_rep"]].sum().reset_index()
+    merged = summed.merge(states[["year", "state_po", "dem_votes", "rep_votes"]], on=["year", "state_po"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        off_dem = np.abs(merged["votes_dem"] - merged["dem_votes"]) / merged["dem_votes"]
+        off_rep = np.abs(merged["votes_rep"] - merged["rep_votes"]) / merged["rep_votes"]
+    limit = merged["state_po"].astype(str).map(STATE_TOLERANCES).fillna(tolerance)
+    off = ((off_dem > limit) | (off_rep > limit)).to_numpy()
+
+    # Complete state-years: every census county of the state has a result
+    complete = set()
+    for year, _, counties, codes in _coverage(df, census):
+        short = np.unique(codes[~np.isin(codes, counties)] // 1000)
+        complete.update((year, int(state)) for state in np.setdiff1d(np.unique(counties // 1000), short))
+    state_fips = (df["fips"] // 1000).groupby(df["state_po"], observed=True).min()
+    is_complete = np.array(
+        [(int(year), int(state_fips.get(state, -1))) in complete for year, state in zip(merged["year"], merged["state_po"])],
+        dtype=bool,
+    )
+    keys = merged[["year", "state_po"]]
+    detail = f"summed county votes within {tolerance:.1%} of 07_fetch_state_results.py (Maine {STATE_TOLERANCES['ME']:.1%})"
+    return [
+        _result(
+            "state_totals_match_scrape", "error", off[is_complete], keys[is_complete], is_complete.sum(),
+            detail + ", states with every county reporting",
+        ),
+        _result(
+            "state_totals_match_scrape_partial", "warning", off[~is_complete], keys[~is_complete], (~is_complete).sum(),
+            detail + ", states missing counties",
+        ),
+    ]
+
+
+def _read_census(census_year):
+    path = PROCESSED_DIR / f"county_population_census_{census_year}.json"
+    if not path.exists():
+        return None
+    return to_key(pd.read_json(path, dtype={"fips": str})["fips"]).to_numpy()
+
+
+def validate(df=None, states=None, census=None):
+    """Run every check; returns the report as a dict."""
+    started = time.perf_counter()
+    if df is None:
+        df = load_county_results()
+    if states is None:
+        states = load_state_results(columns=["state_po", "dem_votes", "rep_votes"])
+    if census is None:
+        census = {year: codes for year in sorted(set(CENSUS_FOR_YEAR.values())) if (codes := _read_census(year)) is not None}
+
+    checks = check_counties(df) + check_census_coverage(df, census) + check_state_totals(df, states, census)
+    errors = sum(not c["passed"] and c["severity"] == "error" for c in checks)
+    warnings = sum(not c["passed"] and c["severity"] == "warning" for c in checks)
+    return {
+        "rows": len(df),
+        "errors": errors,
+        "warnings": warnings,
+        "seconds": round(time.perf_counter() - started, 4),
+        "checks": checks,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--report", default=str(REPORT_JSON), help="where to write the JSON report")
+    parser.add_argument(
+        "--warn-only",
+        action="store_true",
+        default=os.environ.get("ELECTIONS_VALIDATE") == "warn",
+        help="exit 0 even if error checks fail",
+    )
+    args = parser.parse_args(argv)
+
+    report = validate()
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for check in report["checks"]:
+        status = "ok" if check["passed"] else check["severity"].upper()
+        print(f"{status:<8}{check['check']:<32}{check['failures']:>7} / {check['checked']}")
+    print(f"{report['rows']} rows, {report['errors']} errors, {report['warnings']} warnings in {report['seconds'] * 1000:.0f} ms")
+    if report["errors"] and not args.warn_only:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
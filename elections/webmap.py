@@ -0,0 +1,346 @@
+"""
+Self-contained interactive county map: one HTML file with a year slider, drawn on a canvas.
+
+County geometry is simplified as a coverage (shared borders stay shared), quantized to a 16-bit grid,
+delta-encoded within each ring (ring starts are stored whole) and stored once. Each year's attributes are typed-array columns in the same county order
+(sorted by FIPS): shares in hundredths of a point as Uint16 and total votes as Uint32. Every array is packed into
+one gzip-compressed, base64-encoded buffer inside the page, beside a small JSON manifest of offsets. The browser
+decompresses the buffer once (DecompressionStream), views the arrays in place, builds one Path2D per county and
+only refills those paths when the year changes; nothing is fetched.
+
+    from elections.webmap import write_webmap
+    write_webmap("visuals/map.html", counties.geometry, counties["fips"], labels, results, tolerance=500)
+"""
+
+import base64
+import gzip
+import html
+import json
+from pathlib import Path
+
+import numpy as np
+import shapely
+
+# Missing values in the Uint16 share columns
+MISSING = 65535
+
+# Typed-array constructor for each dtype in the buffer (little-endian, as in every browser in use)
+TYPED_ARRAYS = {
+    "int8": "Int8Array", "uint8": "Uint8Array", "int16": "Int16Array", "uint16": "Uint16Array",
+    "int32": "Int32Array", "uint32": "Uint32Array", "float32": "Float32Array",
+}
+
+
+def _smallest_int(values):
+    values = np.asarray(values)
+    for dtype in ("int16", "int32"):
+        info = np.iinfo(dtype)
+        if not len(values) or (values.min() >= info.min and values.max() <= info.max):
+            return values.astype(dtype)
+    raise ValueError("values don't fit in int32")
+
+
+def quantizer(geometries, bits=16):
+    """Origin and scale mapping the geometries' bounds onto a square 2**bits grid, y pointing down as on a canvas."""
+    xmin, ymin, xmax, ymax = shapely.total_bounds(np.asarray(geometries))
+    scale = (2**bits - 1) / max(xmax - xmin, ymax - ymin)
+    return {"xmin": float(xmin), "ymax": float(ymax), "scale": float(scale),
+            "width": round((xmax - xmin) * scale), "height": round((ymax - ymin) * scale)}
+
+
+def encode_polygons(geometries, grid, tolerance=0.0):
+    """
+    (Multi)polygons as delta-encoded grid coordinates, grouped into rings and then features.
+
+    Returns starts (rings, 2) each ring's first point, absolute, coords (points - rings, 2) every other point's
+    delta from the one before it in its ring, rings (ring start offsets into the points, plus the end) and
+    features (feature start offsets into the rings, plus the end). Deltas never cross rings, so they stay
+    small enough for Int16 even where consecutive rings are far apart. Holes are
+    ordinary rings; the client fills with the even-odd rule. tolerance (in map units) simplifies the geometries
+    together so neighbors keep a shared border.
+    """
+    geometries = np.asarray(geometries)
+    if tolerance:
+        geometries = shapely.coverage_simplify(geometries, tolerance)
+    polygons, feature = shapely.get_parts(geometries, return_index=True)
+    rings, polygon = shapely.get_rings(polygons, return_index=True)
+    xy, ring = shapely.get_coordinates(rings, return_index=True)
+
+    q = np.column_stack(
+        [np.round((xy[:, 0] - grid["xmin"]) * grid["scale"]), np.round((grid["ymax"] - xy[:, 1]) * grid["scale"])]
+    ).astype(np.int64)
+    # Drop each ring's closing point and points that fall on the same grid cell as the one before
+    start = np.r_[True, ring[1:] != ring[:-1]]
+    end = np.r_[ring[1:] != ring[:-1], True]
+    repeat = np.r_[False, (q[1:] == q[:-1]).all(axis=1)] & ~start
+    keep = ~end & ~repeat
+    q, ring = q[keep], ring[keep]
+
+    # Rings left with fewer than three points have no area at this resolution
+    lengths = np.bincount(ring, minlength=len(rings))
+    kept_rings = lengths >= 3
+    points = kept_rings[ring]
+    q, lengths = q[points], lengths[kept_rings]
+    ring_feature = feature[polygon][kept_rings]
+
+    ring_offsets = np.r_[0, np.cumsum(lengths)].astype(np.uint32)
+    feature_offsets = np.r_[0, np.cumsum(np.bincount(ring_feature, minlength=len(geometries)))].astype(np.uint32)
+    first = np.zeros(len(q), dtype=bool)
+    first[ring_offsets[:-1]] = True
+    deltas = np.diff(q, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))[~first]
+    return {
+        "starts": q[first].ravel().astype(np.int32),
+        "coords": _smallest_int(deltas.ravel()),
+        "rings": ring_offsets,
+        "features": feature_offsets,
+    }
+
+
+def encode_shares(values):
+    """Percentages as Uint16 hundredths of a point, MISSING where NaN."""
+    values = np.asarray(values, dtype="float64")
+    encoded = np.where(np.isnan(values), MISSING, np.round(np.nan_to_num(values) * 100).clip(0, MISSING - 1))
+    return encoded.astype(np.uint16)
+
+
+def year_columns(results, fips, years):
+    """Per-year dem_pct, rep_pct and votes_all arrays in the order of fips; counties without a result are missing."""
+    columns = {}
+    for year in years:
+        rows = results[results["year"] == year].set_index("fips").reindex(fips)
+        columns[f"dem_pct_{year}"] = encode_shares(rows["dem_pct"])
+        columns[f"rep_pct_{year}"] = encode_shares(rows["rep_pct"])
+        columns[f"votes_all_{year}"] = np.nan_to_num(rows["votes_all"].to_numpy("float64")).astype(np.uint32)
+    return columns
+
+
+def pack(arrays):
+    """One buffer of the arrays, each 8-byte aligned, and the manifest the client reads them back with."""
+    chunks, manifest, offset = [], [], 0
+    for name, values in arrays.items():
+        values = np.ascontiguousarray(values)
+        data = values.astype(values.dtype.newbyteorder("<")).tobytes()
+        manifest.append({"name": name, "type": TYPED_ARRAYS[values.dtype.name], "offset": offset, "length": len(values)})
+        padding = -len(data) % 8
+        chunks.append(data + b"\0" * padding)
+        offset += len(data) + padding
+    return b"".join(chunks), manifest
+
+
+def build_webmap(geometries, fips, labels, results, outlines=None, tolerance=0.0, title="", source=""):
+    """
+    The HTML page as a string.
+
+    geometries, fips and labels describe the counties in one projected CRS; results has fips, year, dem_pct,
+    rep_pct and votes_all. outlines (e.g. state boundaries) are drawn on top. Counties are sorted by FIPS.
+    """
+    order = np.argsort(np.asarray(fips), kind="stable")
+    geometries = np.asarray(geometries)[order]
+    fips = np.asarray(fips)[order]
+    labels = [labels[i] for i in order]
+    years = sorted(int(year) for year in results["year"].unique())
+
+    grid = quantizer(geometries if outlines is None else np.concatenate([geometries, np.asarray(outlines)]))
+    arrays = {f"county_{name}": values for name, values in encode_polygons(geometries, grid, tolerance).items()}
+    if outlines is not None:
+        arrays.update({f"outline_{name}": values for name, values in encode_polygons(outlines, grid, tolerance).items()})
+    arrays["fips"] = fips.astype(np.int32)
+    arrays.update(year_columns(results, fips, years))
+
+    buffer, manifest = pack(arrays)
+    meta = {
+        "title": title,
+        "source": source,
+        "years": years,
+        "labels": labels,
+        "width": grid["width"],
+        "height": grid["height"],
+        "missing": MISSING,
+        "arrays": manifest,
+    }
+    data = base64.b64encode(gzip.compress(buffer, compresslevel=9, mtime=0)).decode("ascii")
+    # </ can't appear inside a script element
+    meta_json = json.dumps(meta, separators=(",", ":")).replace("</", "<\\/")
+    return TEMPLATE.replace("__TITLE__", html.escape(title)).replace("__META__", meta_json).replace("__DATA__", data)
+
+
+def write_webmap(path, geometries, fips, labels, results, **kwargs):
+    """Write build_webmap's page to path; returns its size in bytes."""
+    page = build_webmap(geometries, fips, labels, results, **kwargs).encode()
+    Path(path).write_bytes(page)
+    return len(page)
+
+
+TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>__TITLE__</title>
+<style>
+  body { font-family: Roboto, Helvetica, Arial, sans-serif; margin: 16px; color: #222; }
+  h1 { font-size: 20px; margin: 0 0 8px; }
+  .controls { display: flex; align-items: center; gap: 12px; margin-bottom: 8px; }
+  .controls input { width: 320px; }
+  .year { font-weight: bold; font-size: 18px; min-width: 3em; }
+  .legend { display: flex; gap: 24px; font-size: 12px; margin-bottom: 8px; }
+  .legend span { display: inline-block; width: 24px; height: 10px; }
+  #map { position: relative; max-width: 1200px; }
+  canvas { width: 100%; display: block; }
+  #tip { position: absolute; pointer-events: none; background: #fff; border: 1px solid #ccc; padding: 4px 6px;
+         font-size: 12px; display: none; white-space: nowrap; }
+  .source { font-size: 11px; color: #666; }
+</style>
+</head>
+<body>
+<h1>__TITLE__</h1>
+<div class="controls">
+  <button id="play" type="button">Play</button>
+  <input id="slider" type="range" min="0" step="1">
+  <span class="year" id="year"></span>
+</div>
+<div class="legend" id="legend"></div>
+<div id="map"><canvas id="canvas"></canvas><div id="tip"></div></div>
+<p class="source" id="source"></p>
+<script id="meta" type="application/json">__META__</script>
+<script id="data" type="application/octet-stream">__DATA__</script>
+<script>
+(async function () {
+  const meta = JSON.parse(document.getElementById("meta").textContent);
+  const BREAKS = [50, 55, 60, 65, 70, 80];
+  const REP = ["#ffe5de", "#f8c9bd", "#f49e8e", "#e97061", "#d7493e", "#b92b28", "#8f0f0f"];
+  const DEM = ["#e4f3fb", "#c7e6fb", "#9bc8f7", "#6da0d9", "#427ab6", "#215b93", "#0a3f6d"];
+  const TIE = "#bbbbbb", NONE = "#eeeeee";
+
+  // One gzip buffer holds every array; decompress it once and view each array in place
+  const packed = await fetch("data:application/octet-stream;base64," + document.getElementById("data").textContent.trim());
+  const buffer = await new Response(packed.body.pipeThrough(new DecompressionStream("gzip"))).arrayBuffer();
+  const a = {};
+  for (const m of meta.arrays) a[m.name] = new self[m.type](buffer, m.offset, m.length);
+
+  function paths(prefix, scale) {
+    const starts = a[prefix + "_starts"], coords = a[prefix + "_coords"];
+    const rings = a[prefix + "_rings"], features = a[prefix + "_features"];
+    const out = [];
+    let p = 0;
+    for (let f = 0; f + 1 < features.length; f++) {
+      const path = new Path2D();
+      for (let r = features[f]; r < features[f + 1]; r++) {
+        let x = starts[2 * r], y = starts[2 * r + 1];
+        path.moveTo(x * scale, y * scale);
+        for (let i = rings[r] + 1; i < rings[r + 1]; i++, p++) {
+          x += coords[2 * p]; y += coords[2 * p + 1];
+          path.lineTo(x * scale, y * scale);
+        }
+        path.closePath();
+      }
+      out.push(path);
+    }
+    return out;
+  }
+
+  function shade(ramp, pct) {
+    let k = 0;
+    while (k < BREAKS.length && pct > BREAKS[k]) k++;
+    return ramp[k];
+  }
+
+  // Fill colors per year, computed the first time a year is shown
+  const colors = {};
+  function yearColors(year) {
+    if (colors[year]) return colors[year];
+    const dem = a["dem_pct_" + year], rep = a["rep_pct_" + year];
+    const out = new Array(dem.length);
+    for (let i = 0; i < dem.length; i++) {
+      if (dem[i] === meta.missing || rep[i] === meta.missing) out[i] = NONE;
+      else if (dem[i] > rep[i]) out[i] = shade(DEM, dem[i] / 100);
+      else if (rep[i] > dem[i]) out[i] = shade(REP, rep[i] / 100);
+      else out[i] = TIE;
+    }
+    return (colors[year] = out);
+  }
+
+  const canvas = document.getElementById("canvas"), ctx = canvas.getContext("2d");
+  const slider = document.getElementById("slider"), label = document.getElementById("year");
+  const tip = document.getElementById("tip");
+  let counties = [], outlines = [], pixels = 1, year = meta.years[meta.years.length - 1];
+
+  function layout() {
+    const ratio = window.devicePixelRatio || 1;
+    const width = canvas.clientWidth;
+    pixels = width / meta.width;
+    canvas.width = Math.round(width * ratio);
+    canvas.height = Math.round(meta.height * pixels * ratio);
+    canvas.style.height = meta.height * pixels + "px";
+    ctx.setTransform(ratio, 0, 0, ratio, 0, 0);
+    counties = paths("county", pixels);
+    outlines = a.outline_coords ? paths("outline", pixels) : [];
+    draw();
+  }
+
+  function draw() {
+    const fill = yearColors(year);
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    ctx.lineWidth = 0.3;
+    ctx.strokeStyle = "#ffffff";
+    for (let i = 0; i < counties.length; i++) {
+      ctx.fillStyle = fill[i];
+      ctx.fill(counties[i], "evenodd");
+      ctx.stroke(counties[i]);
+    }
+    ctx.lineWidth = 0.8;
+    for (const path of outlines) ctx.stroke(path);
+    label.textContent = year;
+  }
+
+  function show(index) {
+    slider.value = index;
+    year = meta.years[index];
+    draw();
+  }
+
+  canvas.addEventListener("mousemove", function (event) {
+    const box = canvas.getBoundingClientRect();
+    const x = event.clientX - box.left, y = event.clientY - box.top;
+    const ratio = window.devicePixelRatio || 1;
+    const i = counties.findIndex(function (path) { return ctx.isPointInPath(path, x * ratio, y * ratio, "evenodd"); });
+    if (i < 0) { tip.style.display = "none"; return; }
+    const dem = a["dem_pct_" + year][i], rep = a["rep_pct_" + year][i];
+    const votes = a["votes_all_" + year][i];
+    // Labels come from the data, so they go in as text
+    const name = document.createElement("b");
+    name.textContent = meta.labels[i];
+    const lines = dem === meta.missing
+      ? ["No result"]
+      : ["Dem " + (dem / 100).toFixed(1) + "% \\u00b7 Rep " + (rep / 100).toFixed(1) + "%", votes.toLocaleString() + " votes"];
+    tip.replaceChildren(name);
+    for (const line of lines) tip.append(document.createElement("br"), line);
+    tip.style.left = x + 12 + "px";
+    tip.style.top = y + 12 + "px";
+    tip.style.display = "block";
+  });
+  canvas.addEventListener("mouseleave", function () { tip.style.display = "none"; });
+
+  let timer = null;
+  document.getElementById("play").addEventListener("click", function () {
+    if (timer) { clearInterval(timer); timer = null; this.textContent = "Play"; return; }
+    this.textContent = "Pause";
+    timer = setInterval(function () { show((Number(slider.value) + 1) % meta.years.length); }, 1000);
+  });
+  slider.max = meta.years.length - 1;
+  slider.addEventListener("input", function () { show(Number(slider.value)); });
+
+  document.getElementById("legend").innerHTML = [["Republican", REP], ["Democratic", DEM]].map(function (entry) {
+    return "<div>" + entry[0] + " % " + entry[1].map(function (c) { return '<span style="background:' + c + '"></span>'; }).join("") +
+      "<br>&le;50 &nbsp; 55 &nbsp; 60 &nbsp; 65 &nbsp; 70 &nbsp; 80 &nbsp; 80+</div>";
+  }).join("");
+  document.getElementById("source").textContent = meta.source;
+
+  window.addEventListener("resize", layout);
+  slider.value = meta.years.length - 1;
+  layout();
+})();
+</script>
+</body>
+</html>
+"""